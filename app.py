@@ -1,12 +1,77 @@
 import sys
+import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from loguru import logger
+from starlette.datastructures import Headers
 from starlette.middleware.cors import CORSMiddleware
 
+from routing.v1.history import router as history_router
+from routing.v1.jobs import router as jobs_router
 from routing.v1.main import router as main_router
 
 from configs.Environment import get_environment_variables
+from ml.registry import load_models, plan_models
+from services.jobs import get_job_queue
+from services.metrics import (
+    get_metrics,
+    request_plan,
+    request_profile,
+    request_timings,
+    server_timing,
+)
+from services.pool import shutdown_process_pool, warm_up_process_pool
+
+
+env = get_environment_variables()
+
+
+class LimitRequestSize:
+    """
+    Rejects oversized request bodies with 413: from the Content-Length header
+    before the body is read, and while the body is received otherwise, e.g.
+    for chunked uploads, before it is spooled in full. The limit is
+    ML_MAX_UPLOAD_BYTES, or ML_MAX_BATCH_UPLOAD_BYTES for batch requests that
+    carry many scenes; every file is checked again by `validate_upload_size()`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = (
+            env.ML_MAX_BATCH_UPLOAD_BYTES
+            if scope["path"].endswith("/batch")
+            else env.ML_MAX_UPLOAD_BYTES
+        )
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(
+                status_code=413, content={"detail": "Request body is too large."}
+            )
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised into the form parser of the route, which answers
+                    # with the status of an HTTPException.
+                    raise HTTPException(
+                        status_code=413, detail="Request body is too large."
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
 
 
 app = FastAPI(openapi_url="/core/openapi.json", docs_url="/core/docs")
@@ -19,9 +84,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(LimitRequestSize)
+
 app.include_router(main_router)
+app.include_router(jobs_router)
+app.include_router(history_router)
+
+
+@app.middleware("http")
+async def measure_request(request: Request, call_next):
+    # The stages run for this request add their durations to `timings`, see
+    # `Metrics.observe_stage()`. In DEBUG, "X-Profile: 1" profiles its jobs.
+    timings = {}
+    request_timings.set(timings)
+    request_profile.set(env.DEBUG and request.headers.get("x-profile") == "1")
+
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    # The route template, not the raw path, keeps the label set small.
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    get_metrics().observe_request(request.method, path, response.status_code, elapsed)
+
+    # Streamed bodies (NDJSON and packed /fire_points) are encoded after the
+    # headers are sent: their "serialize" stage only reaches the metrics, and
+    # `elapsed` is the time to the first byte.
+    if env.ML_SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing(timings, elapsed)
+
+    return response
+
+
+@app.middleware("http")
+async def plan_request_models(request: Request, call_next):
+    # Picks the model that serves the request, from the traffic split or the
+    # "X-Model" header, and the shadow models that score along with it.
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+
+    try:
+        models = load_models()
+    except (OSError, ValueError):
+        # A broken model set is a server error, not a bad request.
+        logger.exception("cannot load the model set")
+        return JSONResponse(
+            status_code=500, content={"detail": "The model set cannot be loaded."}
+        )
+
+    try:
+        plan = plan_models(models, request.headers.get("x-model"))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    request_plan.set(plan)
+
+    response = await call_next(request)
+    response.headers["X-Model"] = plan.served.name
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        get_metrics().render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.on_event("startup")
+async def warm_up_ml_workers():
+    await warm_up_process_pool()
+    await get_job_queue().start()
+
+
+@app.on_event("shutdown")
+async def shutdown_ml_workers():
+    await get_job_queue().stop()
+    shutdown_process_pool()
 
-env = get_environment_variables()
 
 if not env.DEBUG:
     logger.remove()
@@ -0,0 +1,58 @@
+"""
+Compares running many small tiles that share one weather CSV one by one
+(`generate_fire_detections` per tile, CSV processed every time) with
+`batch_fire_detections` (CSV processed once, one predict_proba call for
+all tiles), and checks that the detections are identical.
+
+Usage:
+    python -m benchmarks.batch [--tiles 32] [--size 256]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.pipeline import batch_fire_detections, generate_fire_detections
+from ml.processing import process_csv
+from ml.registry import get_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tiles", type=int, default=32)
+    parser.add_argument("--size", type=int, default=256)
+    args = parser.parse_args()
+
+    csv_info = synthetic_csv()
+    get_model()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            write_synthetic_tiff(
+                os.path.join(tmp, f"{i}.tiff"), args.size, args.size, seed=i
+            )
+            for i in range(args.tiles)
+        ]
+
+        start = time.perf_counter()
+        single = [generate_fire_detections(csv_info, path) for path in paths]
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = batch_fire_detections(process_csv(csv_info), paths)
+        batch_time = time.perf_counter() - start
+
+    for expected, actual in zip(single, batched):
+        assert np.array_equal(expected, actual), "batching changes the detections"
+
+    print(f"{args.tiles} tiles of {args.size}x{args.size}")
+    print(f"{'one by one, s':>14} {'batched, s':>11}")
+    print(f"{single_time:>14.2f} {batch_time:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
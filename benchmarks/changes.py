@@ -0,0 +1,128 @@
+"""
+Cost of monitoring a footprint that is acquired again and again: scoring
+every scene in full with `generate_fire_detections` against the change
+detection mode of `detect_fire_changes`, which keeps the previous
+probabilities on disk and only scores the pixels whose bands changed.
+
+The second scene is the first one with a band of rows replaced by another
+fire scene, `--changed` of the scene. Reports the time and the response
+size of both modes and checks that the changes turn the previous fire
+pixels into the ones a full run finds.
+
+Usage:
+    python -m benchmarks.changes [--size 2048] [--changed 0.01 0.1 0.5] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import rasterio
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from convertors.fire_points import encode_geojson
+from ml.changes import EXTINGUISHED, changes_collection
+from ml.pipeline import detect_fire_changes, generate_fire_detections
+
+
+def best_of(func, repeat, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def pixel_set(detections):
+    return {tuple(xy) for xy in detections[:, :2].tolist()}
+
+
+def write_changed_scene(path, base, other, changed):
+    with rasterio.open(base) as src:
+        profile = src.profile
+        data = src.read()
+    with rasterio.open(other) as src:
+        rows = int(src.height * changed)
+        data[:, :rows] = src.read(window=((0, rows), (0, src.width)))
+
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+    return path
+
+
+def incremental(csv_info, base, scene, store):
+    # The state after `base`, then the update with `scene`, timed.
+    shutil.rmtree(store, ignore_errors=True)
+    detect_fire_changes(csv_info, base, store)
+    start = time.perf_counter()
+    detections, stats = detect_fire_changes(csv_info, scene, store)
+    return time.perf_counter() - start, detections, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--fire-fraction", type=float, default=0.01)
+    parser.add_argument("--changed", type=float, nargs="+", default=[0.01, 0.1, 0.5])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    csv_info = synthetic_csv()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = write_synthetic_tiff(
+            os.path.join(tmp, "base.tiff"),
+            args.size,
+            args.size,
+            fire_fraction=args.fire_fraction,
+        )
+        other = write_synthetic_tiff(
+            os.path.join(tmp, "other.tiff"),
+            args.size,
+            args.size,
+            seed=1,
+            fire_fraction=args.fire_fraction,
+        )
+        store = os.path.join(tmp, "changes")
+        previous = pixel_set(generate_fire_detections(csv_info, base))
+
+        print(
+            f"{'changed':>8} {'full, s':>8} {'changes, s':>11} {'speedup':>8} "
+            f"{'full, KB':>9} {'changes, KB':>12} {'rescored':>9}"
+        )
+        for changed in args.changed:
+            scene = write_changed_scene(
+                os.path.join(tmp, f"scene_{changed}.tiff"), base, other, changed
+            )
+
+            full_time, full = best_of(
+                generate_fire_detections, args.repeat, csv_info, scene
+            )
+            full_bytes = sum(len(chunk) for chunk in encode_geojson(full))
+
+            change_time, detections, stats = min(
+                (incremental(csv_info, base, scene, store) for _ in range(args.repeat)),
+                key=lambda result: result[0],
+            )
+            change_bytes = len(json.dumps(changes_collection(detections)))
+
+            extinguished = detections[:, 3] == EXTINGUISHED
+            current = (previous | pixel_set(detections[~extinguished])) - pixel_set(
+                detections[extinguished]
+            )
+            assert current == pixel_set(full), "the changes disagree with a full run"
+
+            print(
+                f"{changed:>8.0%} {full_time:>8.3f} {change_time:>11.3f} "
+                f"{full_time / change_time:>7.1f}x {full_bytes / 1024:>9.1f} "
+                f"{change_bytes / 1024:>12.1f} {stats['rescored_fraction']:>9.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
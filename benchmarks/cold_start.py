@@ -0,0 +1,75 @@
+"""
+Measures cold-start costs in a fresh interpreter: importing the pipeline,
+loading the model on first use, the first prediction and a warm prediction.
+
+Usage:
+    python -m benchmarks.cold_start [--size 512]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json, sys, time
+
+start = time.perf_counter()
+import ml.pipeline
+import_time = time.perf_counter() - start
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.registry import get_model
+
+path = write_synthetic_tiff(sys.argv[1], int(sys.argv[2]), int(sys.argv[2]))
+csv_info = synthetic_csv()
+
+start = time.perf_counter()
+get_model()
+load_time = time.perf_counter() - start
+
+start = time.perf_counter()
+ml.pipeline.generate_fire_points(csv_info, path)
+first_time = time.perf_counter() - start
+
+start = time.perf_counter()
+ml.pipeline.generate_fire_points(csv_info, path)
+warm_time = time.perf_counter() - start
+
+print(json.dumps({
+    "import_pipeline_s": import_time,
+    "model_load_s": load_time,
+    "first_prediction_s": first_time,
+    "warm_prediction_s": warm_time,
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                PROBE,
+                os.path.join(tmp, "scene.tiff"),
+                str(args.size),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    for name, value in result.items():
+        print(f"{name:>20} {value:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
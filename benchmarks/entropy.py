@@ -0,0 +1,71 @@
+"""
+Times the sliding-window histogram `local_entropy` on large bands against
+the per-pixel `generic_filter(band, entropy, size=5)` it replaces, with the
+`entropy` function of the original ml/utils. The per-pixel filter is only
+run on a small crop and its full-size time is extrapolated; the parity of
+both is checked by tests/entropy_test.py.
+
+Usage:
+    python -m benchmarks.entropy [--sizes 1000 4000 10000] [--crop 200]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ml.constants import ENTROPY_WINDOW
+from ml.utils import local_entropy
+
+
+def entropy(values):
+    # The texture feature of the original `calculate_additional_features`.
+    values = values.flatten()
+    h, _ = np.histogram(values, bins=20)
+    h = h / h.sum()
+    return -np.sum(h * np.log2(h + (h == 0)))
+
+
+def generic_entropy(band, size=ENTROPY_WINDOW):
+    # `generic_filter(band, entropy, size=size)`: `entropy` of the mirrored
+    # neighbourhood of every pixel, one Python call per pixel.
+    padded = np.pad(band, size // 2, mode="symmetric")
+    windows = sliding_window_view(padded, (size, size))
+    return np.array(
+        [[entropy(window) for window in row] for row in windows], dtype=np.float64
+    )
+
+
+def synthetic_band(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 4000, size=(size, size)).astype("uint16")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 10000])
+    parser.add_argument("--crop", type=int, default=200)
+    args = parser.parse_args()
+
+    crop = synthetic_band(args.crop)
+    value_range = (0, 3999)
+
+    start = time.perf_counter()
+    generic_entropy(crop)
+    filter_time_per_pixel = (time.perf_counter() - start) / crop.size
+
+    print(f"{'size':>6} {'generic_filter, s':>18} {'local_entropy, s':>17}")
+    for size in args.sizes:
+        band = synthetic_band(size)
+
+        start = time.perf_counter()
+        local_entropy(band, value_range=value_range)
+        elapsed = time.perf_counter() - start
+
+        print(f"{size:>6} {filter_time_per_pixel * band.size:>17.0f}* {elapsed:>17.2f}")
+    print("* extrapolated from the crop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compares the DataFrame-based feature assembly that `generate_fire_points`
+used to do (np.tile + pd.concat + reindex) with `assemble_features`.
+Records peak memory and per-stage timings, and checks that the model
+probabilities are identical.
+
+Usage:
+    python -m benchmarks.features [--sizes 512 1024 2048]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.features import assemble_features
+from ml.processing import load_and_preprocess_tiff, process_csv
+from ml.registry import get_model
+
+
+def dataframe_features(pixel_data, csv_mean_data, feature_names):
+    csv_data_expanded = pd.DataFrame(
+        np.tile(csv_mean_data.values, (len(pixel_data), 1)), columns=csv_mean_data.index
+    )
+    df = pd.concat([pixel_data, csv_data_expanded], axis=1)
+
+    missing_columns = [col for col in feature_names if col not in df.columns]
+
+    for col in missing_columns:
+        df[col] = np.nan
+
+    return df.reindex(columns=feature_names)
+
+
+def run_stages(assemble, pixel_data, csv_mean_data):
+    loaded_model = get_model()
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    features = assemble(pixel_data, csv_mean_data, loaded_model.feature_names_)
+    assemble_time = time.perf_counter() - start
+    _, assemble_peak = tracemalloc.get_traced_memory()
+
+    start = time.perf_counter()
+    pred_proba = loaded_model.predict_proba(features)[:, 1]
+    predict_time = time.perf_counter() - start
+
+    tracemalloc.stop()
+    return assemble_time, assemble_peak, predict_time, pred_proba
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    args = parser.parse_args()
+
+    csv_mean_data = process_csv(synthetic_csv())
+
+    print(
+        f"{'size':>6} {'path':>10} {'assemble, s':>12} "
+        f"{'assemble, MB':>13} {'predict, s':>11}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = write_synthetic_tiff(os.path.join(tmp, f"{size}.tiff"), size, size)
+            pixel_data = load_and_preprocess_tiff(
+                path, r_band=1, g_band=2, b_band=3, ik_band=4, mask_band=5
+            )
+
+            results = {}
+            for name, assemble in (
+                ("dataframe", dataframe_features),
+                ("float32", assemble_features),
+            ):
+                assemble_time, peak, predict_time, pred_proba = run_stages(
+                    assemble, pixel_data, csv_mean_data
+                )
+                results[name] = pred_proba
+                print(
+                    f"{size:>6} {name:>10} {assemble_time:>12.3f} "
+                    f"{peak / 2**20:>13.1f} {predict_time:>11.3f}"
+                )
+
+            assert np.array_equal(results["dataframe"], results["float32"]), (
+                "float32 feature matrix changes the model probabilities"
+            )
+
+
+if __name__ == "__main__":
+    main()
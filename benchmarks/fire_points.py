@@ -0,0 +1,88 @@
+"""
+Compares the per-pixel loop that `generate_fire_points` used to run with the
+vectorized `extract_fire_coords` path across different fire densities.
+
+Usage:
+    python -m benchmarks.fire_points [--size 2000] [--repeat 3]
+"""
+
+import argparse
+import time
+
+import geojson
+import numpy as np
+from rasterio.transform import from_origin
+
+from ml.constants import THRESHOLD
+from ml.pipeline import coords_to_points
+from ml.utils import extract_fire_coords, pixel_to_coord
+
+DENSITIES = (0.0, 0.001, 0.01, 0.1, 0.5)
+
+
+def loop_fire_points(pred_proba, transform, threshold):
+    geojson_points = []
+
+    for row in range(pred_proba.shape[0]):
+        for col in range(pred_proba.shape[1]):
+            if pred_proba[row, col] > threshold:
+                x, y = pixel_to_coord(row, col, transform)
+                geojson_points.append(geojson.Point([x, y]))
+
+    return geojson_points
+
+
+def vectorized_fire_points(pred_proba, transform, threshold):
+    return coords_to_points(extract_fire_coords(pred_proba, transform, threshold))
+
+
+def synthetic_proba(size, density, seed=0):
+    rng = np.random.default_rng(seed)
+    pred_proba = rng.uniform(0, THRESHOLD, size=(size, size))
+    fire = rng.random((size, size)) < density
+    pred_proba[fire] = rng.uniform(THRESHOLD + 1e-6, 1, size=int(fire.sum()))
+    return pred_proba
+
+
+def best_of(func, repeat, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    transform = from_origin(600000.0, 6200000.0, 10.0, 10.0)
+
+    print(
+        f"{'density':>8} {'points':>10} {'loop, s':>10} {'vector, s':>10} {'speedup':>8}"
+    )
+    for density in DENSITIES:
+        pred_proba = synthetic_proba(args.size, density)
+
+        loop_time, expected = best_of(
+            loop_fire_points, 1, pred_proba, transform, THRESHOLD
+        )
+        vector_time, actual = best_of(
+            vectorized_fire_points, args.repeat, pred_proba, transform, THRESHOLD
+        )
+
+        assert actual == expected, "vectorized output differs from the loop output"
+
+        speedup = loop_time / vector_time if vector_time else float("inf")
+        print(
+            f"{density:>8} {len(actual):>10} {loop_time:>10.3f} "
+            f"{vector_time:>10.3f} {speedup:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
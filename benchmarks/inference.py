@@ -0,0 +1,126 @@
+"""
+Parity and throughput of the inference backends. The reference is the
+previous path: `predict_proba` on a pandas DataFrame of the features. For
+every backend and thread count it reports the largest probability
+difference, the pixels classified differently at THRESHOLD and the
+throughput in pixels per second per core. tests/inference_test.py checks
+that no pixel is classified differently.
+
+The "onnx" backend needs the packages of the onnx extra
+(poetry install -E onnx) and is skipped without them.
+
+Usage:
+    python -m benchmarks.inference [--size 1024] [--threads 1 2 4] [--repeat 3]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.constants import MODEL_PATH, PREDICT_BATCH_ROWS, THRESHOLD
+from ml.features import assemble_features
+from ml.inference import CatBoostBackend, OnnxBackend, export_onnx
+from ml.processing import load_and_preprocess_tiff, process_csv
+from ml.registry import get_model
+
+
+def reference_proba(model, features):
+    frame = pd.DataFrame(features, columns=model.feature_names_)
+    return np.concatenate(
+        [
+            model.predict_proba(frame.iloc[start : start + PREDICT_BATCH_ROWS])[:, 1]
+            for start in range(0, len(frame), PREDICT_BATCH_ROWS)
+        ]
+    )
+
+
+def backend_proba(backend, features):
+    return np.concatenate(
+        [
+            backend.predict_proba(features[start : start + PREDICT_BATCH_ROWS])
+            for start in range(0, len(features), PREDICT_BATCH_ROWS)
+        ]
+    )
+
+
+def best_of(func, repeat, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def backends(model, onnx_path, thread_counts):
+    for thread_count in thread_counts:
+        yield thread_count, CatBoostBackend(model, thread_count)
+
+    try:
+        export_onnx(model, onnx_path)
+    except ImportError as exc:
+        print(f"onnx backend skipped: {exc}")
+        return
+    for thread_count in thread_counts:
+        yield thread_count, OnnxBackend(onnx_path, model.feature_names_, thread_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--fire-fraction", type=float, default=0.01)
+    parser.add_argument(
+        "--threads", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1})
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model = get_model(MODEL_PATH)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_tiff(
+            os.path.join(tmp, "scene.tiff"),
+            args.size,
+            args.size,
+            fire_fraction=args.fire_fraction,
+        )
+        pixel_data = load_and_preprocess_tiff(
+            path, r_band=1, g_band=2, b_band=3, ik_band=4, mask_band=5
+        )
+        features = assemble_features(
+            pixel_data, process_csv(synthetic_csv()), model.feature_names_
+        )
+
+        reference_time, expected = best_of(
+            reference_proba, args.repeat, model, features
+        )
+        fires = int((expected > THRESHOLD).sum())
+        print(
+            f"{len(features)} pixels, {fires} above THRESHOLD, DataFrame reference "
+            f"{len(features) / reference_time:.4g} pixels/s"
+        )
+
+        print(
+            f"{'backend':>9} {'threads':>8} {'time, s':>8} {'pixels/s/core':>14} "
+            f"{'max diff':>9} {'flipped':>8}"
+        )
+        for thread_count, backend in backends(
+            model, os.path.join(tmp, "model.onnx"), args.threads
+        ):
+            elapsed, actual = best_of(backend_proba, args.repeat, backend, features)
+            flipped = int(((actual > THRESHOLD) != (expected > THRESHOLD)).sum())
+            print(
+                f"{backend.name:>9} {thread_count:>8} {elapsed:>8.3f} "
+                f"{len(features) / elapsed / thread_count:>14.4g} "
+                f"{np.abs(actual - expected).max():>9.2e} {flipped:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Runs `generate_fire_detections` on scenes of the same size with a growing
+nodata border, to check that the time scales with the number of valid
+pixels rather than with the raster area.
+
+Usage:
+    python -m benchmarks.masking [--size 2048] [--valid 1.0 0.7 0.3]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.pipeline import generate_fire_detections
+from ml.registry import get_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--valid", type=float, nargs="+", default=[1.0, 0.7, 0.3])
+    args = parser.parse_args()
+
+    csv_info = synthetic_csv()
+    get_model()
+
+    print(f"{'valid':>6} {'time, s':>8} {'valid Mpx/s':>12} {'detections':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        full = None
+        for valid_fraction in args.valid:
+            path = write_synthetic_tiff(
+                os.path.join(tmp, f"{valid_fraction}.tiff"),
+                args.size,
+                args.size,
+                valid_fraction=valid_fraction,
+            )
+
+            start = time.perf_counter()
+            detections = generate_fire_detections(csv_info, path)
+            elapsed = time.perf_counter() - start
+
+            valid_pixels = int(args.size * valid_fraction) * args.size
+            print(
+                f"{valid_fraction:>6.2f} {elapsed:>8.2f} "
+                f"{valid_pixels / elapsed / 1e6:>12.2f} {len(detections):>11}"
+            )
+
+            # Detections inside the valid part are the same as without the border.
+            if full is None:
+                full = detections
+            else:
+                assert len(detections) == 0 or np.array_equal(
+                    full[full[:, 1] >= detections[:, 1].min()], detections
+                )
+
+
+if __name__ == "__main__":
+    main()
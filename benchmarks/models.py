@@ -0,0 +1,93 @@
+"""
+Cost of evaluating a candidate model next to the served one. Compares the
+served model alone, the served model with the candidate as a shadow model
+in the same pass (the features are computed once), and the two models run
+as separate pipelines, as a second deployment would. The candidate is a
+copy of the production model, so both score the same trees.
+
+Usage:
+    python -m benchmarks.models [--size 2048] [--repeat 3]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.constants import MODEL_PATH
+from ml.pipeline import generate_fire_detections
+from ml.profiling import model_recording
+from ml.registry import ModelSpec, ScoringPlan, get_backend, scoring
+
+
+def best_of(func, repeat, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(plans, csv_info, path):
+    results = []
+    for plan in plans:
+        with scoring(plan):
+            results.append(generate_fire_detections(csv_info, path))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--fire-fraction", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    csv_info = synthetic_csv()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_tiff(
+            os.path.join(tmp, "scene.tiff"),
+            args.size,
+            args.size,
+            fire_fraction=args.fire_fraction,
+        )
+        candidate_path = shutil.copy(MODEL_PATH, os.path.join(tmp, "candidate"))
+
+        served = ModelSpec("default", MODEL_PATH)
+        candidate = ModelSpec("candidate", candidate_path)
+        for spec in (served, candidate):
+            get_backend(spec.path)
+
+        cases = (
+            ("served only", [ScoringPlan(served)]),
+            ("served + shadow", [ScoringPlan(served, (candidate,))]),
+            ("two pipelines", [ScoringPlan(served), ScoringPlan(candidate)]),
+        )
+
+        print(f"{'case':>16} {'time, s':>8} {'overhead':>9}")
+        reference = None
+        for label, plans in cases:
+            with model_recording() as records:
+                elapsed, results = best_of(run, args.repeat, plans, csv_info, path)
+            if reference is None:
+                reference = elapsed
+            for detections in results[1:]:
+                np.testing.assert_array_equal(detections, results[0])
+            if label == "served + shadow":
+                shadow = [record for record in records if record[2] == "shadow"]
+                assert all(record[6] == record[4] for record in shadow), (
+                    "the shadow copy disagrees with the served model"
+                )
+
+            print(f"{label:>16} {elapsed:>8.3f} {elapsed / reference - 1:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Serialization time and payload size of the /fire_points response formats
+for synthetic detections of different sizes.
+
+Usage:
+    python -m benchmarks.output_formats [--counts 1000 100000 1000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from convertors.fire_points import ENCODERS
+
+
+def synthetic_detections(count, seed=0):
+    rng = np.random.default_rng(seed)
+    detections = np.empty((count, 3))
+    detections[:, 0] = 500005.0 + 10.0 * rng.integers(0, 10000, count)
+    detections[:, 1] = 6000005.0 - 10.0 * rng.integers(0, 10000, count)
+    detections[:, 2] = rng.uniform(0.5, 1.0, count)
+    return detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[1000, 100000, 1000000]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'points':>9} {'format':>36} {'encode, s':>10} {'size, MB':>9} {'B/point':>8}"
+    )
+    for count in args.counts:
+        detections = synthetic_detections(count)
+        for media_type, encode in ENCODERS.items():
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in encode(detections))
+            elapsed = time.perf_counter() - start
+            print(
+                f"{count:>9} {media_type:>36} {elapsed:>10.3f} "
+                f"{size / 2**20:>9.2f} {size / count:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
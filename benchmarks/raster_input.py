@@ -0,0 +1,98 @@
+"""
+Compares the per-request raster input cost of the old path (copy the upload
+into a BytesIO, read the four bands one by one, then open the image again
+and decode band 1 for the shape) with `RasterSource` and a single
+multi-band read, on DEFLATE and LZW compressed GeoTIFFs.
+
+Usage:
+    python -m benchmarks.raster_input [--sizes 1024 2048] [--repeat 3]
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import rasterio
+
+from benchmarks.synthetic import write_synthetic_tiff
+from ml.raster import RasterSource
+
+COMPRESSIONS = ("deflate", "lzw")
+
+
+def bytesio_input(upload):
+    tiff_image = io.BytesIO(upload.read())
+
+    with rasterio.open(tiff_image) as src:
+        bands = [src.read(band) for band in (1, 2, 3, 4)]
+
+    with rasterio.open(tiff_image) as src:
+        original_shape = src.read(1).shape
+        transform = src.transform
+
+    return np.stack(bands), original_shape, transform
+
+
+def raster_source_input(upload):
+    with RasterSource.from_file(upload, spool_bytes=256 * 1024 * 1024) as tiff_image:
+        with tiff_image.open() as src:
+            bands = src.read([1, 2, 3, 4])
+        return bands, tiff_image.shape, tiff_image.transform
+
+
+def measure(func, path, repeat):
+    timings = []
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        with open(path, "rb") as upload:
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = func(upload)
+            timings.append(time.perf_counter() - start)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>6} {'compress':>8} {'bytesio, s':>11} {'bytesio, MB':>12} "
+        f"{'source, s':>10} {'source, MB':>11}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            for compress in COMPRESSIONS:
+                path = write_synthetic_tiff(
+                    os.path.join(tmp, f"{size}_{compress}.tiff"),
+                    size,
+                    size,
+                    compress=compress,
+                )
+
+                old_time, old_peak, expected = measure(bytesio_input, path, args.repeat)
+                new_time, new_peak, actual = measure(
+                    raster_source_input, path, args.repeat
+                )
+
+                assert np.array_equal(expected[0], actual[0])
+                assert expected[1:] == actual[1:]
+
+                print(
+                    f"{size:>6} {compress:>8} {old_time:>11.3f} "
+                    f"{old_peak / 2**20:>12.1f} {new_time:>10.3f} "
+                    f"{new_peak / 2**20:>11.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Recall/speed evaluation of the two-stage screening mode. Every scene is
+run once at full resolution (`generate_fire_detections`) and then with
+`screen_fire_detections` for each combination of block size, samples per
+block side and coarse threshold. Recall is the share of the full-resolution
+detections the screened run still finds (screening never adds detections).
+
+Scenes are the given TIFF files, ml/tests/test.tiff if it exists, or
+synthetic fire scenes (vegetation background with small fire clusters).
+
+Usage:
+    python -m benchmarks.screening [--tiff scene.tiff ...] [--thresholds 0.01 0.05 0.2]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.pipeline import generate_fire_detections, screen_fire_detections
+from ml.registry import get_model
+
+TEST_TIFF = "ml/tests/test.tiff"
+
+
+def evaluate(csv_info, path, args):
+    start = time.perf_counter()
+    full = generate_fire_detections(csv_info, path)
+    full_time = time.perf_counter() - start
+
+    print(f"{os.path.basename(path)}: {len(full)} detections in {full_time:.2f} s")
+    print(
+        f"{'block':>6} {'samples':>8} {'threshold':>10} {'recall':>7} "
+        f"{'skipped':>8} {'time, s':>8} {'speedup':>8}"
+    )
+    for block_size in args.block_sizes:
+        for samples in args.samples:
+            for threshold in args.thresholds:
+                start = time.perf_counter()
+                detections, screening = screen_fire_detections(
+                    csv_info, path, threshold, block_size=block_size, samples=samples
+                )
+                elapsed = time.perf_counter() - start
+
+                recall = len(detections) / len(full) if len(full) else 1.0
+                print(
+                    f"{block_size:>6} {samples:>8} {threshold:>10.3f} {recall:>7.3f} "
+                    f"{screening['skipped_fraction']:>8.1%} {elapsed:>8.2f} "
+                    f"{full_time / elapsed:>7.1f}x"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tiff", nargs="+")
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument(
+        "--fire-fractions", type=float, nargs="+", default=[0.001, 0.01]
+    )
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--samples", type=int, nargs="+", default=[4, 8])
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0.01, 0.05, 0.2]
+    )
+    args = parser.parse_args()
+
+    csv_info = synthetic_csv()
+    get_model()
+
+    paths = args.tiff or ([TEST_TIFF] if os.path.exists(TEST_TIFF) else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        if not paths:
+            paths = [
+                write_synthetic_tiff(
+                    os.path.join(tmp, f"fire-{fire_fraction}.tiff"),
+                    args.size,
+                    args.size,
+                    fire_fraction=fire_fraction,
+                )
+                for fire_fraction in args.fire_fractions
+            ]
+
+        for path in paths:
+            evaluate(csv_info, path, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compares the per-index NumPy expressions that `calculate_additional_features`
+used to evaluate with the float32 in-place kernel, on tile-sized band arrays.
+Times every index of the old expressions separately, the whole old and new
+computation, and reports the largest relative error of every index; the
+tolerance itself is checked by tests/spectral_test.py.
+
+Usage:
+    python -m benchmarks.spectral [--sizes 256 512 1024 2048] [--dtypes uint16 float32]
+"""
+
+import argparse
+import time
+from functools import partial
+
+import numpy as np
+
+from ml.utils import SPECTRAL_INDICES, calculate_additional_features
+
+# The smallest magnitude the relative error is taken against.
+ATOL = 1e-6
+
+LEGACY_INDICES = {
+    "ndvi": lambda red, green, blue, nir: (nir - red) / (1e-3 + nir + red),
+    "evi": lambda red, green, blue, nir: (
+        2.5 * (nir - red) / (1e-3 + nir + 6 * red - 7.5 * blue + 1)
+    ),
+    "savi": lambda red, green, blue, nir: ((nir - red) / (nir + red + 0.5)) * 1.5,
+    "ndwi": lambda red, green, blue, nir: (green - nir) / (1e-3 + green + nir),
+    "sr": lambda red, green, blue, nir: nir / (1e-3 + red),
+    "gndvi": lambda red, green, blue, nir: (nir - green) / (1e-3 + nir + green),
+}
+
+
+def synthetic_bands(size, dtype, seed=0, high=4000):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, high, size=(4, size, size)).astype(dtype)
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--dtypes", nargs="+", default=["uint16", "float32"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>6} {'dtype':>8} {'index':>7} {'legacy, ms':>11} {'max rel err':>12}"
+    )
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for dtype in args.dtypes:
+            for size in args.sizes:
+                bands = synthetic_bands(size, dtype)
+                out = np.empty((len(SPECTRAL_INDICES), size, size), dtype=np.float32)
+
+                kernel_time, indices = best_of(
+                    partial(calculate_additional_features, *bands, out=out),
+                    args.repeat,
+                )
+
+                # Float bands are checked against float64, the legacy float32
+                # EVI denominator itself cancels out to zero on some pixels.
+                reference = bands if bands.dtype.kind in "iu" else bands.astype("f8")
+
+                legacy_total = 0.0
+                for name, value in zip(SPECTRAL_INDICES, indices):
+                    legacy_time, _ = best_of(
+                        partial(LEGACY_INDICES[name], *bands), args.repeat
+                    )
+                    legacy_total += legacy_time
+
+                    expected = LEGACY_INDICES[name](*reference)
+                    rel_err = np.max(
+                        np.abs(value - expected) / np.maximum(np.abs(expected), ATOL)
+                    )
+                    print(
+                        f"{size:>6} {dtype:>8} {name:>7} "
+                        f"{legacy_time * 1e3:>11.2f} {rel_err:>12.2e}"
+                    )
+
+                print(
+                    f"{size:>6} {dtype:>8} {'total':>7} {legacy_total * 1e3:>11.2f}"
+                    f"   kernel {kernel_time * 1e3:.2f} ms"
+                    f" ({legacy_total / kernel_time:.1f}x)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares peak memory and latency of the whole-image `generate_fire_points`
+path with the tiled `stream_fire_points` path on synthetic GeoTIFFs.
+
+Usage:
+    python -m benchmarks.streaming [--sizes 512 1024 2048] [--tile-size 512]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import synthetic_csv, write_synthetic_tiff
+from ml.pipeline import generate_fire_points, stream_fire_points
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    parser.add_argument("--tile-size", type=int, default=512)
+    args = parser.parse_args()
+
+    csv_info = synthetic_csv()
+
+    print(
+        f"{'size':>6} {'whole, s':>9} {'whole, MB':>10} "
+        f"{'tiled, s':>9} {'tiled, MB':>10} {'points':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = write_synthetic_tiff(os.path.join(tmp, f"{size}.tiff"), size, size)
+
+            whole_time, whole_peak, expected = measure(
+                generate_fire_points, csv_info, path
+            )
+            tiled_time, tiled_peak, actual = measure(
+                lambda path=path: list(
+                    stream_fire_points(csv_info, path, args.tile_size)
+                )
+            )
+
+            assert sorted(map(tuple, (p["coordinates"] for p in actual))) == sorted(
+                map(tuple, (p["coordinates"] for p in expected))
+            ), "tiled output differs from the whole-image output"
+
+            print(
+                f"{size:>6} {whole_time:>9.2f} {whole_peak / 2**20:>10.1f} "
+                f"{tiled_time:>9.2f} {tiled_peak / 2**20:>10.1f} {len(actual):>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
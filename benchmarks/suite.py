@@ -0,0 +1,335 @@
+"""
+Reproducible benchmark suite. Synthesizes GeoTIFF scenes of different size,
+dtype, compression, tiling and fire density plus a weather CSV, and times
+`load_and_preprocess_tiff`, reading the CSV into `process_csv`,
+`generate_fire_points` and POST /api/v1/ml/fire_points end to end.
+
+Every case reports the median latency over --repeat runs (after a warm-up
+run), the throughput (pixels per second, CSV rows per second for
+`process_csv`) and the peak of the traced Python/numpy allocations of one
+more run; for the endpoint that is the API process side (upload spooling,
+validation, serialization), the peak RSS of the worker processes is
+reported once for the whole run.
+
+The endpoint runs in-process with the result cache disabled. It needs the
+settings of configs/.env (no database connection is made), use --no-http
+without them.
+
+Results can be saved as a JSON baseline. With --compare, a case whose
+median latency or peak memory grew by more than --tolerance compared with
+the baseline is flagged and the run exits with status 1. Baselines are only
+comparable on the same machine.
+
+Usage:
+    python -m benchmarks.suite [--preset quick|full] [--repeat 3] [--save baseline.json]
+    python -m benchmarks.suite --compare baseline.json [--tolerance 0.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import write_synthetic_csv, write_synthetic_tiff
+from ml.pipeline import generate_fire_points
+from ml.processing import load_and_preprocess_tiff, process_csv
+from ml.registry import get_model, model_version
+from ml.weather import WeatherHistory
+
+BASELINE_VERSION = 1
+
+# Scene parameters default to SCENE, see `write_synthetic_tiff()`.
+SCENE = {
+    "dtype": "uint16",
+    "compress": None,
+    "tiled": True,
+    "block_size": 256,
+    "fire_fraction": 0.001,
+}
+
+SCENARIOS = {
+    "quick": [
+        {"name": "u16-1024", "size": 1024},
+        {"name": "u16-1024-deflate", "size": 1024, "compress": "deflate"},
+        {
+            "name": "u16-1024-lzw-strips",
+            "size": 1024,
+            "compress": "lzw",
+            "tiled": False,
+        },
+        {"name": "f32-1024", "size": 1024, "dtype": "float32"},
+        {"name": "u16-1024-fire-5%", "size": 1024, "fire_fraction": 0.05},
+    ],
+    "full": [
+        {"name": "u16-2048", "size": 2048},
+        {"name": "u16-2048-deflate", "size": 2048, "compress": "deflate"},
+        {
+            "name": "u16-2048-lzw-strips",
+            "size": 2048,
+            "compress": "lzw",
+            "tiled": False,
+        },
+        {
+            "name": "u8-2048-deflate",
+            "size": 2048,
+            "dtype": "uint8",
+            "compress": "deflate",
+        },
+        {"name": "f32-2048", "size": 2048, "dtype": "float32"},
+        {"name": "u16-2048-fire-5%", "size": 2048, "fire_fraction": 0.05},
+        {"name": "u16-4096-deflate", "size": 4096, "compress": "deflate"},
+    ],
+}
+
+# Compared with the baseline: a larger value is a regression.
+COMPARED = ("median_s", "peak_memory_bytes")
+
+
+def write_scene(directory, scenario):
+    scene = {**SCENE, **scenario}
+    return write_synthetic_tiff(
+        os.path.join(directory, f"{scene['name']}.tiff"),
+        scene["size"],
+        scene["size"],
+        dtype=scene["dtype"],
+        compress=scene["compress"],
+        fire_fraction=scene["fire_fraction"],
+        tiled=scene["tiled"],
+        block_size=scene["block_size"],
+    )
+
+
+def read_csv(csv_path):
+    # The parsing of an upload from a station the API has not seen yet.
+    history = WeatherHistory()
+    with open(csv_path, "rb") as file:
+        history.update(file)
+    return history.frame
+
+
+def http_client():
+    # Every run has to go through the pipeline, not return a cached response.
+    os.environ["ML_CACHE_MEMORY_BYTES"] = "0"
+    os.environ["ML_CACHE_DIR"] = ""
+
+    from fastapi.testclient import TestClient
+
+    from app import app
+
+    return TestClient(app)
+
+
+def post_fire_points(client, tiff_path, csv_path):
+    with open(tiff_path, "rb") as tiff_file, open(csv_path, "rb") as csv_file:
+        response = client.post(
+            "/api/v1/ml/fire_points",
+            files={
+                "csv_file": ("weather.csv", csv_file, "text/csv"),
+                "tiff_file": ("scene.tiff", tiff_file, "image/tiff"),
+            },
+        )
+    response.raise_for_status()
+    return response
+
+
+def cases(tiff_path, csv_path, client):
+    """
+    The benchmarked calls as {case: (function, unit)}.
+    """
+    csv_info = read_csv(csv_path)
+    calls = {
+        "load_and_preprocess_tiff": (
+            lambda: load_and_preprocess_tiff(
+                tiff_path, r_band=1, g_band=2, b_band=3, ik_band=4, mask_band=5
+            ),
+            "pixels",
+        ),
+        "process_csv": (lambda: process_csv(read_csv(csv_path)), "rows"),
+        "generate_fire_points": (
+            lambda: generate_fire_points(csv_info, tiff_path),
+            "pixels",
+        ),
+    }
+    if client is not None:
+        calls["http_fire_points"] = (
+            lambda: post_fire_points(client, tiff_path, csv_path),
+            "pixels",
+        )
+    return calls
+
+
+def measure(func, repeat):
+    func()  # warm-up: page cache, lazy imports, model and worker start
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return statistics.median(timings), min(timings), peak
+
+
+def run(args, client):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_synthetic_csv(os.path.join(tmp, "weather.csv"), args.csv_rows)
+
+        for scenario in SCENARIOS[args.preset]:
+            tiff_path = write_scene(tmp, scenario)
+            units = {"pixels": scenario["size"] ** 2, "rows": args.csv_rows}
+
+            for case, (func, unit) in cases(tiff_path, csv_path, client).items():
+                median, best, peak = measure(func, args.repeat)
+                result = {
+                    "scenario": scenario["name"],
+                    "case": case,
+                    "unit": unit,
+                    "items": units[unit],
+                    "median_s": median,
+                    "min_s": best,
+                    "throughput": units[unit] / median,
+                    "peak_memory_bytes": peak,
+                }
+                results.append(result)
+                print_result(result)
+
+    return results
+
+
+def print_header():
+    print(
+        f"{'scenario':>22} {'case':>25} {'median, s':>10} {'min, s':>8} "
+        f"{'throughput/s':>13} {'peak, MB':>9}"
+    )
+
+
+def print_result(result):
+    print(
+        f"{result['scenario']:>22} {result['case']:>25} {result['median_s']:>10.3f} "
+        f"{result['min_s']:>8.3f} {result['throughput']:>13.4g} "
+        f"{result['peak_memory_bytes'] / 2**20:>9.1f}"
+    )
+
+
+def environment():
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "model_version": model_version(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the change of every compared metric against the baseline and
+    returns the list of regressions (relative growth above `tolerance`).
+    """
+    previous = {(item["scenario"], item["case"]): item for item in baseline["results"]}
+    regressions = []
+
+    print(
+        f"{'scenario':>22} {'case':>25} {'metric':>18} {'baseline':>10} {'now':>10} {'change':>8}"
+    )
+    for result in results:
+        base = previous.get((result["scenario"], result["case"]))
+        if base is None:
+            continue
+
+        for metric in COMPARED:
+            if not base.get(metric):
+                continue
+            change = result[metric] / base[metric] - 1
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressions.append((result["scenario"], result["case"], metric, change))
+            print(
+                f"{result['scenario']:>22} {result['case']:>25} {metric:>18} "
+                f"{base[metric]:>10.4g} {result[metric]:>10.4g} {change:>+8.1%}{flag}"
+            )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--preset", choices=SCENARIOS, default="quick")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--csv-rows", type=int, default=3650)
+    parser.add_argument("--no-http", action="store_true")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("version") != BASELINE_VERSION:
+            sys.exit(f"{args.compare}: unsupported baseline version")
+        # The same scenes as the baseline, so that every case has a match.
+        args.preset = baseline["preset"]
+        args.csv_rows = baseline["csv_rows"]
+
+    get_model()
+
+    client = None if args.no_http else http_client()
+    print_header()
+    if client is None:
+        results = run(args, None)
+        worker_peak_rss = None
+    else:
+        from services.metrics import get_metrics
+
+        with client:
+            results = run(args, client)
+        worker_peak_rss = get_metrics().worker_peak_rss
+        print(f"worker peak RSS: {worker_peak_rss / 2**20:.1f} MB")
+
+    report = {
+        "version": BASELINE_VERSION,
+        "preset": args.preset,
+        "repeat": args.repeat,
+        "csv_rows": args.csv_rows,
+        "environment": environment(),
+        "worker_peak_rss_bytes": worker_peak_rss,
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"results written to {args.save}")
+
+    if baseline is not None:
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if baseline["environment"].get("model_version") != model_version():
+            print("note: the baseline was recorded with another model version")
+        if regressions:
+            sys.exit(f"{len(regressions)} regression(s) above {args.tolerance:.0%}")
+        print(f"no regressions above {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
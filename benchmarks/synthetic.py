@@ -0,0 +1,132 @@
+"""
+Synthetic inputs for the benchmarks: multi-band GeoTIFFs and weather CSVs.
+"""
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import from_origin
+
+CSV_PATH = "ml/tests/test.csv"
+
+# Band profiles (red, green, blue, nir) the model scores as background
+# vegetation and as fire; noise is added around them per pixel.
+BACKGROUND_BANDS = (500, 800, 400, 3000)
+FIRE_BANDS = (805, 1435, 1456, 3531)
+
+
+def write_synthetic_tiff(
+    path,
+    height,
+    width,
+    count=4,
+    dtype="uint16",
+    compress=None,
+    seed=0,
+    valid_fraction=1.0,
+    fire_fraction=None,
+    fire_cluster=8,
+    tiled=True,
+    block_size=256,
+):
+    rng = np.random.default_rng(seed)
+    if fire_fraction is None:
+        data = rng.integers(0, 4000, size=(count, height, width))
+    else:
+        data = fire_scene(rng, count, height, width, fire_fraction, fire_cluster)
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        data = np.clip(data, 0, np.iinfo(dtype).max)
+    data = data.astype(dtype)
+
+    profile = {"compress": compress} if compress else {}
+    if tiled:
+        profile.update(tiled=True, blockxsize=block_size, blockysize=block_size)
+    else:
+        # Strips of `block_size` rows, the GDAL default layout is one row.
+        profile["blockysize"] = block_size
+
+    if valid_fraction < 1.0:
+        # Nodata (0) below the valid part of the scene, like a footprint border.
+        valid_rows = int(height * valid_fraction)
+        data[:, :valid_rows][data[:, :valid_rows] == 0] = 1
+        data[:, valid_rows:] = 0
+        profile["nodata"] = 0
+
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=count,
+        dtype=dtype,
+        crs="EPSG:32637",
+        transform=from_origin(500000.0, 6000000.0, 10.0, 10.0),
+        **profile,
+    ) as dst:
+        dst.write(data)
+
+    return path
+
+
+def fire_scene(rng, count, height, width, fire_fraction, fire_cluster):
+    """
+    A vegetation background with square fire clusters of `fire_cluster`
+    pixels placed at random until about `fire_fraction` of the scene burns.
+    Bands past the fourth are background noise.
+    """
+    profile = np.full((count, 1, 1), 1000.0)
+    profile[:4, 0, 0] = BACKGROUND_BANDS
+    data = profile * (1 + 0.1 * rng.standard_normal((count, height, width)))
+
+    fire = np.zeros((height, width), dtype=bool)
+    clusters = round(fire_fraction * height * width / fire_cluster**2)
+    for _ in range(clusters):
+        row = rng.integers(0, max(1, height - fire_cluster + 1))
+        col = rng.integers(0, max(1, width - fire_cluster + 1))
+        fire[row : row + fire_cluster, col : col + fire_cluster] = True
+
+    fire_profile = np.asarray(FIRE_BANDS, dtype=float)[:, None]
+    noise = 1 + 0.05 * rng.standard_normal((4, int(fire.sum())))
+    data[:4, fire] = fire_profile * noise
+
+    return np.clip(data, 1, 65535)
+
+
+def synthetic_csv():
+    return pd.read_csv(CSV_PATH)
+
+
+def write_synthetic_csv(path, rows, seed=0, start="2019-03-11", freq="D"):
+    """
+    A weather history of `rows` observations every `freq` with the columns
+    of CSV_PATH: seasonal temperatures, occasional precipitation and wind.
+    """
+    rng = np.random.default_rng(seed)
+    columns = pd.read_csv(CSV_PATH, nrows=0).columns
+
+    times = pd.date_range(start, periods=rows, freq=freq)
+    day = (times - times[0]) / pd.Timedelta(days=1)
+    mean = (
+        5 + 15 * np.sin(2 * np.pi * (day - 100) / 365) + 3 * rng.standard_normal(rows)
+    )
+    spread = rng.uniform(2, 8, rows)
+    rain = np.where(rng.random(rows) < 0.3, rng.exponential(4, rows), 0.0)
+    wind = rng.uniform(0, 8, rows)
+
+    weather = pd.DataFrame(
+        {
+            columns[0]: times.strftime("%Y-%m-%d" if freq == "D" else "%Y-%m-%d %H:%M"),
+            columns[1]: mean.round(1),
+            columns[2]: (mean - spread).round(1),
+            columns[3]: (mean + spread).round(1),
+            columns[4]: rain.round(1),
+            columns[5]: rng.integers(0, 360, rows),
+            columns[6]: wind.round(1),
+            columns[7]: (wind + rng.uniform(0, 6, rows)).round(1),
+            columns[8]: (1013 + 8 * rng.standard_normal(rows)).round(1),
+        }
+    )
+    weather.to_csv(path, index=False)
+
+    return path
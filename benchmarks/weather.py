@@ -0,0 +1,93 @@
+"""
+Weather feature cost for long station histories: parsing the CSV and
+aggregating it, as for a station seen for the first time, against updating
+a cached `WeatherHistory` with a CSV that appends one observation. Checks
+that both give the same features, for the default windows (the last rows
+only) and for time windows.
+
+Usage:
+    python -m benchmarks.weather [--rows 1000 10000 100000] [--freq h] [--repeat 5]
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import write_synthetic_csv
+from ml.constants import WEATHER_WINDOWS
+from ml.weather import WeatherHistory, weather_features
+
+TIME_WINDOWS = WEATHER_WINDOWS + (
+    ("24h", "sum", "{column}_sum_24h"),
+    ("7d", "max", "{column}_max_7d"),
+    ("30d", "trend", "{column}_trend_30d"),
+)
+
+
+def full_features(data, windows):
+    history = WeatherHistory(windows)
+    history.update(io.BytesIO(data))
+    return weather_features(history.frame, windows)
+
+
+def appended_features(history, data, windows):
+    assert history.update(io.BytesIO(data)), "the upload was not parsed as an append"
+    return weather_features(history.frame, windows)
+
+
+def best_of(func, repeat, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--freq", default="h", help="observation interval")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'rows':>8} {'windows':>8} {'full, ms':>9} {'append, ms':>11} {'speedup':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = write_synthetic_csv(
+                os.path.join(tmp, f"{rows}.csv"), rows, freq=args.freq
+            )
+            with open(path, "rb") as file:
+                data = file.read()
+            # Everything but the last row, as uploaded the time before.
+            previous = data[: data.rindex(b"\n", 0, len(data) - 1) + 1]
+
+            for label, windows in (("rows", WEATHER_WINDOWS), ("time", TIME_WINDOWS)):
+                full_time, expected = best_of(full_features, args.repeat, data, windows)
+
+                timings = []
+                for _ in range(args.repeat):
+                    history = WeatherHistory(windows)
+                    history.update(io.BytesIO(previous))
+                    elapsed, actual = best_of(
+                        appended_features, 1, history, data, windows
+                    )
+                    timings.append(elapsed)
+                append_time = min(timings)
+
+                pd.testing.assert_series_equal(actual, expected)
+                print(
+                    f"{rows:>8} {label:>8} {full_time * 1000:>9.2f} "
+                    f"{append_time * 1000:>11.2f} {full_time / append_time:>7.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
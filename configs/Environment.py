@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -10,6 +11,28 @@ class EnvironmentSettings(BaseSettings):
     POSTGRES_HOST: str
     POSTGRES_PORT: str
     DEBUG: bool
+    ML_WORKERS: int = 0
+    ML_SPLIT_PIXELS: int = 0
+    ML_RASTER_SPOOL_BYTES: int = 64 * 1024 * 1024
+    ML_MAX_UPLOAD_BYTES: int = 4 * 1024 * 1024 * 1024
+    ML_MAX_BATCH_UPLOAD_BYTES: int = 32 * 1024 * 1024 * 1024
+    ML_JOBS_DIR: str = "jobs"
+    ML_JOBS_CONCURRENCY: int = 2
+    ML_JOBS_QUEUE_SIZE: int = 100
+    ML_JOBS_RETENTION_SECONDS: int = 7 * 24 * 60 * 60
+    ML_CACHE_MEMORY_BYTES: int = 256 * 1024 * 1024
+    ML_CACHE_DIR: str = ""
+    ML_CACHE_DISK_BYTES: int = 2 * 1024 * 1024 * 1024
+    ML_BATCH_MAX_TILES: int = 100
+    ML_SERVER_TIMING: bool = False
+    ML_PROFILE_DIR: str = "profiles"
+    ML_INFERENCE_BACKEND: Literal["catboost", "onnx"] = "catboost"
+    ML_INFERENCE_THREADS: int = 0
+    ML_WEATHER_STATIONS: int = 256
+    ML_SCENES_DIR: str = "scenes"
+    ML_CHANGES_DIR: str = "changes"
+    ML_CHANGES_MAX_BYTES: int = 16 * 1024 * 1024 * 1024
+    ML_CHANGES_MAX_AGE_SECONDS: int = 30 * 24 * 60 * 60
 
     class Config:
         env_file = "configs/.env"
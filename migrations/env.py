@@ -9,6 +9,9 @@ from alembic import context
 
 from configs.Environment import get_environment_variables
 from models.BaseModel import EntityMeta
+from models.FirePoint import FirePoint  # noqa: F401
+from models.Job import Job  # noqa: F401
+from models.Scene import Scene  # noqa: F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,68 @@
+"""create fire point store
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scenes",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("model_version", sa.String(length=64), nullable=False),
+        sa.Column("threshold", sa.Float(), nullable=False),
+        sa.Column("crs", sa.String(), nullable=True),
+        sa.Column("bounds", sa.JSON(), nullable=False),
+        sa.Column("point_count", sa.Integer(), nullable=False),
+        sa.Column("acquired_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("content_hash"),
+    )
+    op.create_index(
+        op.f("ix_scenes_acquired_at"), "scenes", ["acquired_at"], unique=False
+    )
+    op.create_table(
+        "fire_points",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("scene_id", sa.String(length=36), nullable=False),
+        sa.Column("lon", sa.Float(), nullable=False),
+        sa.Column("lat", sa.Float(), nullable=False),
+        sa.Column("probability", sa.Float(), nullable=False),
+        sa.Column("cell", sa.BigInteger(), nullable=False),
+        sa.Column("detected_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["scene_id"], ["scenes.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_fire_points_cell_detected_at",
+        "fire_points",
+        ["cell", "detected_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_fire_points_scene_id", "fire_points", ["scene_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_fire_points_scene_id", table_name="fire_points")
+    op.drop_index("ix_fire_points_cell_detected_at", table_name="fire_points")
+    op.drop_table("fire_points")
+    op.drop_index(op.f("ix_scenes_acquired_at"), table_name="scenes")
+    op.drop_table("scenes")
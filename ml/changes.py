@@ -0,0 +1,263 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+from affine import Affine
+from loguru import logger
+
+from ml.screening import dilate_blocks
+from ml.utils import pixels_to_coords
+
+# Codes of the change column of `change_detections()`.
+NEW = 1
+GROWN = 2
+EXTINGUISHED = 3
+CHANGE_KINDS = {NEW: "new", GROWN: "grown", EXTINGUISHED: "extinguished"}
+
+BAND_COUNT = 4
+
+
+def footprint_key(crs: str | None, transform: Affine, shape: tuple, dtype) -> str:
+    """
+    Identifies a footprint: successive scenes share their state only if they have the same grid (CRS, transform and shape) and band data type.
+    """
+    grid = (crs, tuple(transform)[:6], tuple(shape), np.dtype(dtype).str)
+    return hashlib.blake2b(repr(grid).encode(), digest_size=16).hexdigest()
+
+
+class FootprintState:
+    """
+    The last known fire probability of every pixel of a footprint and the band values it was computed from, memory-mapped from the files of `directory`, so a scene only pages in the rows it touches.
+
+    `fingerprint` identifies the model and the scene-level inputs (weather features, entropy ranges) the probabilities were computed with. It is None for a new footprint and while an update is in progress, so an interrupted update makes the next scene re-score every pixel.
+    """
+
+    def __init__(self, directory: str, shape: tuple[int, int], dtype):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "meta.json")
+
+        bands_path = os.path.join(directory, "bands.npy")
+        proba_path = os.path.join(directory, "proba.npy")
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as file:
+                self.fingerprint = json.load(file)["fingerprint"]
+            self.bands = np.lib.format.open_memmap(bands_path, mode="r+")
+            self.proba = np.lib.format.open_memmap(proba_path, mode="r+")
+            self.is_new = False
+            return
+
+        # Pixels that were never observed have a NaN probability.
+        self.bands = np.lib.format.open_memmap(
+            bands_path, mode="w+", dtype=dtype, shape=(BAND_COUNT, *shape)
+        )
+        self.proba = np.lib.format.open_memmap(
+            proba_path, mode="w+", dtype=np.float32, shape=shape
+        )
+        self.proba[:] = np.nan
+        self.fingerprint = None
+        self.is_new = True
+        self._write_meta(None)
+
+    def begin(self):
+        self._write_meta(None)
+
+    def commit(self, fingerprint: str):
+        self.bands.flush()
+        self.proba.flush()
+        self._write_meta(fingerprint)
+        self.fingerprint = fingerprint
+
+    def _write_meta(self, fingerprint: str | None):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"fingerprint": fingerprint}, file)
+        os.replace(tmp_path, self.meta_path)
+
+
+@contextmanager
+def open_footprint(
+    root: str, crs: str | None, transform: Affine, shape: tuple[int, int], dtype
+) -> Iterator[FootprintState]:
+    """
+    open_footprint(root: str, crs: str | None, transform: Affine, shape: tuple[int, int], dtype) -> Iterator[FootprintState]
+
+    Opens the state of a footprint in the store directory `root`, creating it for a footprint seen for the first time. The state is locked for the duration of the block, so scenes of the same footprint sent to different worker processes are applied one after the other.
+    """
+    directory = os.path.join(root, footprint_key(crs, transform, shape, dtype))
+
+    # Closing the lock file releases the lock.
+    with _lock(directory, blocking=True):
+        yield FootprintState(directory, shape, dtype)
+
+
+def _lock(directory: str, blocking: bool):
+    # The lock file of a state directory, open and locked. `evict_footprints()`
+    # removes directories while holding their lock, so a lock that turns out
+    # to be on a removed file is taken again on a new directory. Without
+    # `blocking`, None if the state is in use or gone.
+    lock_path = os.path.join(directory, "lock")
+    flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+    while True:
+        if blocking:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            lock = open(lock_path, "a")  # noqa: SIM115 - closed by the caller
+        except FileNotFoundError:
+            if blocking:
+                continue
+            return None
+
+        try:
+            fcntl.flock(lock, flags)
+            if os.path.samestat(os.fstat(lock.fileno()), os.stat(lock_path)):
+                return lock
+        except (BlockingIOError, FileNotFoundError):
+            pass
+        lock.close()
+        if not blocking:
+            return None
+
+
+def evict_footprints(root: str, max_bytes: int = 0, max_age_seconds: int = 0) -> int:
+    """
+    evict_footprints(root: str, max_bytes: int = 0, max_age_seconds: int = 0) -> int
+
+    Removes footprint states from the store directory `root`, which would otherwise keep one state per grid ever seen: about 4 x H x W band values and H x W float32 probabilities each. States in use are skipped.
+
+    Parameters:
+        root (str):
+            The store directory, with the states in any subdirectory (one per model).
+        max_bytes (int):
+            The size the states may take together; the least recently updated states are removed above it, except the most recent one. 0 for no limit.
+        max_age_seconds (int):
+            States not updated for longer are removed. 0 for no limit.
+
+    Returns:
+        int:
+            The number of removed states.
+    """
+    states = []
+    for directory, _, files in os.walk(root):
+        if "meta.json" not in files:
+            continue
+        try:
+            size = sum(os.path.getsize(os.path.join(directory, f)) for f in files)
+            used = os.path.getmtime(os.path.join(directory, "meta.json"))
+        except FileNotFoundError:
+            # Evicted by another process meanwhile.
+            continue
+        states.append((used, size, directory))
+    states.sort()
+
+    total = sum(size for _, size, _ in states)
+    now = time.time()
+    removed = 0
+    for index, (used, size, directory) in enumerate(states):
+        expired = max_age_seconds and now - used > max_age_seconds
+        # The most recent state is the one a scene just updated.
+        oversized = max_bytes and total > max_bytes and index < len(states) - 1
+        if not (expired or oversized):
+            continue
+
+        lock = _lock(directory, blocking=False)
+        if lock is None:
+            continue
+        with lock:
+            shutil.rmtree(directory)
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.info(f"evicted {removed} footprint states from {root}")
+    return removed
+
+
+def changed_pixels(
+    bands: np.ndarray,
+    previous_bands: np.ndarray,
+    previous_proba: np.ndarray,
+    valid: np.ndarray,
+    tolerance: float,
+) -> np.ndarray:
+    """
+    changed_pixels(bands: np.ndarray, previous_bands: np.ndarray, previous_proba: np.ndarray, valid: np.ndarray, tolerance: float) -> np.ndarray
+
+    Finds the pixels that need a new probability: the valid pixels that were never scored or where any band differs from the values the stored probability was computed from by more than `tolerance` (in band units). Masked pixels, e.g. under clouds, are not observed and keep their state.
+    """
+    difference = np.abs(bands.astype(np.float64) - previous_bands)
+    moved = (difference > tolerance).any(axis=0)
+    moved |= (np.isnan(bands) != np.isnan(previous_bands)).any(axis=0)
+    return valid & (moved | np.isnan(previous_proba))
+
+
+def spread_mask(fire: np.ndarray) -> np.ndarray:
+    """
+    The pixels where a new fire pixel counts as grown rather than new: the pixels that were burning and their 8 neighbours.
+    """
+    return dilate_blocks(fire, 1)
+
+
+def change_detections(
+    previous_fire: np.ndarray,
+    near_fire: np.ndarray,
+    proba: np.ndarray,
+    threshold: float,
+    transform: Affine,
+) -> np.ndarray:
+    """
+    change_detections(previous_fire: np.ndarray, near_fire: np.ndarray, proba: np.ndarray, threshold: float, transform: Affine) -> np.ndarray
+
+    Compares the fire pixels of a window before and after an update.
+
+    Parameters:
+        previous_fire (np.ndarray):
+            A boolean array, True for the pixels that were above `threshold` before the update.
+        near_fire (np.ndarray):
+            The previous fire pixels grown by one pixel, see `spread_mask()`. It must be computed over the whole footprint, so fires on the window edges are seen.
+        proba (np.ndarray):
+            The probabilities after the update, of the same shape.
+        threshold (float):
+            The fire probability threshold, e.g. `THRESHOLD`.
+        transform (affine.Affine):
+            The affine transform of the window.
+
+    Returns:
+        np.ndarray:
+            An (N, 4) array of x, y, fire probability after the update and change code, in row-major order: NEW for a fire pixel with no fire next to it before, GROWN for a fire pixel next to a previous fire pixel and EXTINGUISHED for a previous fire pixel that is no longer above `threshold`.
+    """
+    fire = proba > threshold
+    codes = np.zeros(proba.shape, dtype=np.int8)
+    codes[fire & ~previous_fire] = NEW
+    codes[fire & ~previous_fire & near_fire] = GROWN
+    codes[previous_fire & ~fire] = EXTINGUISHED
+
+    rows, cols = np.nonzero(codes)
+    detections = np.empty((len(rows), 4), dtype=np.float64)
+    detections[:, :2] = pixels_to_coords(rows, cols, transform)
+    detections[:, 2] = proba[rows, cols]
+    detections[:, 3] = codes[rows, cols]
+    return detections
+
+
+def changes_collection(detections: np.ndarray) -> dict:
+    """
+    Wraps the (N, 4) change detections into a GeoJSON FeatureCollection of points with the `change` kind and the `probability` after the update as properties.
+    """
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [x, y]},
+                "properties": {"change": CHANGE_KINDS[int(code)], "probability": p},
+            }
+            for x, y, p, code in detections.tolist()
+        ],
+    }
@@ -1,2 +1,23 @@
 THRESHOLD = 0.5
 MODEL_PATH = "ml/models/model"
+MODELS_PATH = "ml/models/models.json"
+TILE_SIZE = 1024
+HEAT_MAP_CELL_SIZE = 32
+HEAT_MAP_MAX_CELL_SIZE = 4096
+HEAT_MAP_MAX_CELLS = 10000
+CSV_TAIL_ROWS = 10
+ENTROPY_WINDOW = 5
+ENTROPY_BINS = 20
+PREDICT_BATCH_ROWS = 65536
+BATCH_TILE_PIXELS = 1024 * 1024
+SCREEN_BLOCK_SIZE = 32
+SCREEN_SAMPLES = 8
+SCREEN_THRESHOLD = 0.05
+# The band difference (in band units) above which a pixel of a re-acquired
+# footprint is scored again; 0 re-scores every pixel that changed at all.
+CHANGE_TOLERANCE = 0.0
+
+# (window, aggregation, name) of the weather features, see `weather_features()`.
+# The mean of the last CSV_TAIL_ROWS rows under the column names is what the
+# model was trained on; e.g. ("7d", "trend", "{column}_trend_7d") adds more.
+WEATHER_WINDOWS = ((CSV_TAIL_ROWS, "mean", "{column}"),)
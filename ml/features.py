@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+
+def assemble_features(
+    pixel_data, csv_features: pd.Series, feature_names: list[str]
+) -> np.ndarray:
+    """
+    assemble_features(pixel_data, csv_features: pd.Series, feature_names: list[str]) -> np.ndarray
+
+    This function builds the model input matrix in a single preallocated, C-contiguous float32 array, without tiling the CSV features across the pixels or making intermediate DataFrame copies.
+
+    Parameters:
+        pixel_data (pd.DataFrame | dict[str, np.ndarray]):
+            The per-pixel features, one column (or flat array) per feature. All columns must have the same length.
+        csv_features (pd.Series):
+            The scene-level features, such as the aggregated weather values returned by `process_csv()`. Each value is the same for every pixel.
+        feature_names (list[str]):
+            The feature order expected by the model, e.g. `get_model().feature_names_`.
+
+    Returns:
+        np.ndarray:
+            A float32 array of shape (N_pixels, len(feature_names)). Pixel features take precedence over CSV features with the same name, and features found in neither are filled with NaN.
+
+    Function Workflow:
+        1. The output array is allocated once with `np.empty`.
+        2. Each pixel feature is cast and copied into its column.
+        3. Each CSV feature is broadcast into its column, so the constant is written once per column instead of being materialized as a tiled matrix.
+        4. Each missing feature column is filled with NaN.
+    """
+    n_pixels = len(pixel_data[next(iter(pixel_data))])
+
+    features = np.empty((n_pixels, len(feature_names)), dtype=np.float32)
+
+    for i, name in enumerate(feature_names):
+        if name in pixel_data:
+            features[:, i] = pixel_data[name]
+        elif name in csv_features.index:
+            features[:, i] = csv_features[name]
+        else:
+            features[:, i] = np.nan
+
+    return features
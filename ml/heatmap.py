@@ -0,0 +1,111 @@
+import warnings
+
+import numpy as np
+
+POOLING_METHODS = ("mean", "max")
+
+
+def pool_blocks(
+    pred_proba: np.ndarray, cell_size: int, method: str = "mean"
+) -> np.ndarray:
+    """
+    pool_blocks(pred_proba: np.ndarray, cell_size: int, method: str = "mean") -> np.ndarray
+
+    This function aggregates a probability raster into a coarser grid of `cell_size` x `cell_size` pixel cells.
+
+    Parameters:
+        pred_proba (np.ndarray):
+            A 2D array with the fire probability of every pixel.
+        cell_size (int):
+            The side of a grid cell in pixels. A cell larger than the raster is clamped to the raster, which gives the same single-cell grid.
+        method (str):
+            "mean" for block-mean pooling or "max" for max pooling.
+
+    Returns:
+        np.ndarray:
+            A 2D float32 array of shape (ceil(H / cell_size), ceil(W / cell_size)). Cells on the right and bottom edges that are only partly covered by the raster are aggregated over the pixels they cover. NaN pixels (masked out) are ignored, and cells with no other pixels are NaN.
+    """
+    if method not in POOLING_METHODS:
+        raise ValueError(
+            f"unknown pooling method {method!r}, expected one of {POOLING_METHODS}"
+        )
+
+    height, width = pred_proba.shape
+    cell_size = min(cell_size, max(height, width))
+    grid_height = -(-height // cell_size)
+    grid_width = -(-width // cell_size)
+
+    padded = np.full(
+        (grid_height * cell_size, grid_width * cell_size), np.nan, dtype=np.float32
+    )
+    padded[:height, :width] = pred_proba
+    blocks = padded.reshape(grid_height, cell_size, grid_width, cell_size)
+
+    # Cells that are entirely masked out are NaN; skip the "empty slice" warnings.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        if method == "max":
+            return np.nanmax(blocks, axis=(1, 3))
+        return np.nanmean(blocks, axis=(1, 3))
+
+
+def heat_map_features(
+    grid: np.ndarray,
+    transform,
+    shape: tuple[int, int],
+    cell_size: int,
+    min_weight: float = 0.0,
+    top_k: int | None = None,
+) -> dict:
+    """
+    heat_map_features(grid: np.ndarray, transform, shape: tuple[int, int], cell_size: int, min_weight: float = 0.0, top_k: int | None = None) -> dict
+
+    This function turns a pooled probability grid into a GeoJSON FeatureCollection with one weighted `Point` per cell, placed at the center of the pixels the cell covers.
+
+    Parameters:
+        grid (np.ndarray):
+            The pooled grid, as returned by `pool_blocks()`.
+        transform (affine.Affine):
+            The affine transform of the original raster.
+        shape (tuple[int, int]):
+            The (height, width) of the original raster.
+        cell_size (int):
+            The side of a grid cell in pixels.
+        min_weight (float):
+            Cells with a lower weight are left out.
+        top_k (int | None):
+            If set, only the `top_k` cells with the highest weights are kept.
+
+    Returns:
+        dict:
+            A FeatureCollection whose features carry the cell weight in `properties.weight`, ordered by decreasing weight.
+    """
+    height, width = shape
+
+    rows, cols = np.nonzero(grid >= min_weight)
+    weights = grid[rows, cols]
+
+    if top_k is not None and len(weights) > top_k:
+        keep = np.argpartition(weights, -top_k)[-top_k:]
+        rows, cols, weights = rows[keep], cols[keep], weights[keep]
+
+    order = np.argsort(-weights, kind="stable")
+    rows, cols, weights = rows[order], cols[order], weights[order]
+
+    # Centers of the covered pixels, in fractional pixel coordinates.
+    row_centers = (rows * cell_size + np.minimum((rows + 1) * cell_size, height)) / 2
+    col_centers = (cols * cell_size + np.minimum((cols + 1) * cell_size, width)) / 2
+    xs, ys = transform * (col_centers, row_centers)
+
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"weight": round(weight, 4)},
+                "geometry": {"type": "Point", "coordinates": [x, y]},
+            }
+            for x, y, weight in zip(xs.tolist(), ys.tolist(), weights.tolist())
+        ],
+    }
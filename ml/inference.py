@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+
+import catboost as cb
+import numpy as np
+
+INFERENCE_BACKENDS = ("catboost", "onnx")
+
+
+class CatBoostBackend:
+    """
+    Scores the feature matrix with CatBoost's own evaluator of the oblivious trees, on the float32 array as is (no DataFrame, no copy) and with an explicit number of threads.
+    """
+
+    name = "catboost"
+
+    def __init__(self, model: cb.CatBoostClassifier, thread_count: int = 0):
+        self.model = model
+        # 0 is CatBoost's default of all cores (-1). The process pool passes
+        # 1 when it runs several workers, see `get_inference_threads()`.
+        self.thread_count = thread_count or -1
+
+    @property
+    def feature_names(self) -> list[str]:
+        return self.model.feature_names_
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        return self.model.predict(
+            np.ascontiguousarray(features, dtype=np.float32),
+            prediction_type="Probability",
+            thread_count=self.thread_count,
+        )[:, 1]
+
+
+class OnnxBackend:
+    """
+    Scores the feature matrix with the model exported to ONNX (see `export_onnx()`) in onnxruntime, with float32 accumulation of the tree values instead of CatBoost's double precision.
+
+    The exported model runs without CatBoost, e.g. to check a deployment target. onnxruntime evaluates the trees as generic decision trees, which makes it several times slower than `CatBoostBackend`. Needs the `onnx` and `onnxruntime` packages of the optional `onnx` extra (`poetry install -E onnx`).
+    """
+
+    name = "onnx"
+
+    def __init__(self, onnx_path: str, feature_names: list[str], thread_count: int = 0):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = thread_count
+        self.session = onnxruntime.InferenceSession(
+            onnx_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._feature_names = feature_names
+
+    @property
+    def feature_names(self) -> list[str]:
+        return self._feature_names
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        (proba,) = self.session.run(
+            ["probability_tensor"],
+            {"features": np.ascontiguousarray(features, dtype=np.float32)},
+        )
+        return proba[:, 1].astype(np.float64)
+
+
+def export_onnx(model: cb.CatBoostClassifier, onnx_path: str):
+    """
+    export_onnx(model: cb.CatBoostClassifier, onnx_path: str)
+
+    Exports the model to a standalone ONNX file whose output is the (N, 2) float32 probability tensor.
+
+    Parameters:
+        model (cb.CatBoostClassifier):
+            The model to export.
+        onnx_path (str):
+            The output path. The file is replaced atomically, so concurrent exports by several worker processes are safe.
+
+    Function Workflow:
+        1. The model is round-tripped through CatBoost's JSON format to declare its class labels (0 and 1) as integers; CatBoost refuses to export float labels to ONNX.
+        2. CatBoost exports the model to ONNX.
+        3. The ZipMap node, which turns the probabilities into one Python dict per row, is removed and the probability tensor becomes the output of the graph.
+    """
+    import onnx
+    from onnx import TensorProto, helper
+
+    directory = os.path.dirname(onnx_path) or "."
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        json_path = os.path.join(tmp, "model.json")
+        model.save_model(json_path, format="json")
+        with open(json_path, encoding="utf-8") as file:
+            exported = json.load(file)
+        exported["model_info"]["class_params"]["class_label_type"] = "Integer"
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(exported, file)
+
+        integer_labels = cb.CatBoostClassifier()
+        integer_labels.load_model(json_path, format="json")
+        integer_labels.save_model(os.path.join(tmp, "model.onnx"), format="onnx")
+
+        graph_model = onnx.load(os.path.join(tmp, "model.onnx"))
+        graph = graph_model.graph
+        for node in [node for node in graph.node if node.op_type == "ZipMap"]:
+            graph.node.remove(node)
+        for output in [
+            output for output in graph.output if output.name == "probabilities"
+        ]:
+            graph.output.remove(output)
+        graph.output.append(
+            helper.make_tensor_value_info(
+                "probability_tensor", TensorProto.FLOAT, ["N", 2]
+            )
+        )
+
+        onnx.save(graph_model, os.path.join(tmp, "export.onnx"))
+        os.replace(os.path.join(tmp, "export.onnx"), onnx_path)
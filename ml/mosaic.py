@@ -0,0 +1,328 @@
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.features import bounds as geometry_bounds
+from rasterio.features import geometry_mask
+from rasterio.transform import array_bounds
+from rasterio.warp import Resampling, reproject, transform_bounds, transform_geom
+from rasterio.warp import transform as warp_transform
+from rasterio.windows import Window, from_bounds
+
+from ml.processing import read_valid_mask
+from ml.raster import TIFF_EXTENSIONS
+from ml.utils import coords_to_wgs84
+
+WGS84 = "EPSG:4326"
+EARTH_RADIUS = 6371008.8
+
+# Points inserted per polygon edge before a geometry is reprojected, so that
+# straight edges follow their curved image in the other CRS.
+DENSIFY_POINTS = 16
+
+
+@dataclass(frozen=True)
+class SceneFootprint:
+    """
+    The header metadata of one scene of a directory: where it is, in which CRS and at which resolution. The resolution is the side of the center pixel in metres, comparable between scenes in any CRS.
+    """
+
+    path: str
+    crs: str
+    transform: Affine
+    height: int
+    width: int
+    bounds_wgs84: tuple[float, float, float, float]
+    resolution: float
+    mtime_ns: int
+
+
+@dataclass(frozen=True)
+class AoiTile:
+    """
+    A window of a scene to run the pipeline on, with what decides which of its pixels are scored: the pixels inside the `aoi` geometries (in the scene CRS) that none of the `earlier` scenes has valid data for.
+    """
+
+    path: str
+    crs: str
+    window: Window
+    aoi: tuple[dict, ...]
+    earlier: tuple[str, ...]
+
+    def claim_mask(self, transform: Affine, mask_band: int | None = None) -> np.ndarray:
+        shape = (self.window.height, self.window.width)
+        mask = geometry_mask(self.aoi, shape, transform, invert=True)
+        for path in self.earlier:
+            if not mask.any():
+                break
+            mask &= ~valid_on_grid(path, mask_band, self.crs, transform, shape)
+        return mask
+
+
+def valid_on_grid(
+    path: str, mask_band: int | None, crs: str, transform: Affine, shape: tuple
+) -> np.ndarray:
+    """
+    The pixels of the grid `crs`, `transform`, `shape` whose center lies in a valid pixel of the scene at `path`, see `read_valid_mask()`. Nodata borders and masked pixels of the scene are left to the grid.
+    """
+    valid = np.zeros(shape, dtype=np.uint8)
+    footprint = read_footprint(path)
+    bounds = transform_bounds(crs, footprint.crs, *array_bounds(*shape, transform))
+    window = _scene_window(footprint, bounds)
+    if window is None:
+        return valid.astype(bool)
+
+    with rasterio.open(path) as src:
+        scene_valid = read_valid_mask(src, mask_band, window)
+        if scene_valid is None:
+            scene_valid = np.ones((window.height, window.width), dtype=bool)
+
+        # Nearest resampling takes the scene pixel under every grid pixel
+        # center; grid pixels outside the scene stay invalid.
+        reproject(
+            scene_valid.view(np.uint8),
+            valid,
+            src_transform=src.window_transform(window),
+            src_crs=src.crs,
+            dst_transform=transform,
+            dst_crs=crs,
+            resampling=Resampling.nearest,
+        )
+
+    return valid.astype(bool)
+
+
+_footprints: dict[tuple[str, int, int], SceneFootprint] = {}
+_lock = threading.Lock()
+
+
+def read_footprint(path: str) -> SceneFootprint:
+    """
+    Reads the footprint of a scene from its header only; the pixel data is not decoded.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    footprint = _footprints.get(key)
+    if footprint is not None:
+        return footprint
+
+    with rasterio.open(path) as src:
+        if src.crs is None:
+            raise ValueError(f"{path} has no CRS")
+        crs = src.crs.to_string()
+        footprint = SceneFootprint(
+            path=path,
+            crs=crs,
+            transform=src.transform,
+            height=src.height,
+            width=src.width,
+            bounds_wgs84=transform_bounds(crs, WGS84, *src.bounds, densify_pts=21),
+            resolution=_resolution_m(crs, src.transform, src.height, src.width),
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+    with _lock:
+        for stale_key in [k for k in _footprints if k[0] == path]:
+            del _footprints[stale_key]
+        _footprints[key] = footprint
+
+    return footprint
+
+
+def footprint_index(directory: str) -> list[SceneFootprint]:
+    """
+    footprint_index(directory: str) -> list[SceneFootprint]
+
+    This function builds the footprint index of the GeoTIFF scenes in `directory` (recursively). Footprints are cached per file and re-read only when a file changes, so repeated calls only list the directory.
+
+    Parameters:
+        directory (str):
+            The directory with the scenes.
+
+    Returns:
+        list[SceneFootprint]:
+            The footprints in priority order: finest resolution first, then the most recently modified scene, then by path. Where scenes overlap, the pixels are taken from the scene that comes first.
+    """
+    footprints = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(TIFF_EXTENSIONS):
+                footprints.append(read_footprint(os.path.join(root, name)))
+
+    return sorted(footprints, key=lambda f: (f.resolution, -f.mtime_ns, f.path))
+
+
+def parse_aoi(aoi: dict | None = None, bbox: tuple | None = None) -> tuple[dict, ...]:
+    """
+    parse_aoi(aoi: dict | None = None, bbox: tuple | None = None) -> tuple[dict, ...]
+
+    Normalizes an area of interest given as a GeoJSON geometry, Feature or FeatureCollection, or as a (min_lon, min_lat, max_lon, max_lat) bounding box, into a tuple of polygon geometries in WGS84.
+
+    Raises:
+        ValueError: If the area of interest is missing, malformed or has no polygons.
+    """
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if not (min_lon < max_lon and min_lat < max_lat):
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        corners = [
+            (min_lon, min_lat),
+            (max_lon, min_lat),
+            (max_lon, max_lat),
+            (min_lon, max_lat),
+            (min_lon, min_lat),
+        ]
+        return ({"type": "Polygon", "coordinates": [corners]},)
+
+    if not isinstance(aoi, dict):
+        raise ValueError("aoi must be a GeoJSON object")
+
+    if aoi.get("type") == "FeatureCollection":
+        geometries = [feature.get("geometry") for feature in aoi.get("features", [])]
+    elif aoi.get("type") == "Feature":
+        geometries = [aoi.get("geometry")]
+    else:
+        geometries = [aoi]
+
+    polygons = tuple(
+        geometry
+        for geometry in geometries
+        if isinstance(geometry, dict)
+        and geometry.get("type") in ("Polygon", "MultiPolygon")
+    )
+    if not polygons:
+        raise ValueError("aoi must contain Polygon or MultiPolygon geometries")
+    return polygons
+
+
+def aoi_tiles(
+    footprints: list[SceneFootprint], aoi: tuple[dict, ...], strip_rows: int
+) -> list[AoiTile]:
+    """
+    aoi_tiles(footprints: list[SceneFootprint], aoi: tuple[dict, ...], strip_rows: int) -> list[AoiTile]
+
+    This function selects the parts of the scenes that cover the area of interest and splits them into row strips for the worker processes. A ground pixel is claimed by the first scene (in `footprints` order) that has valid data at its center, so overlapping scenes never score the same ground pixel twice and the nodata or masked pixels of one scene are filled in from the next.
+
+    Parameters:
+        footprints (list[SceneFootprint]):
+            The scenes in priority order, see `footprint_index()`.
+        aoi (tuple[dict, ...]):
+            The area of interest in WGS84, see `parse_aoi()`.
+        strip_rows (int):
+            The number of rows per tile.
+
+    Returns:
+        list[AoiTile]:
+            The tiles, scene by scene in priority order.
+
+    Function Workflow:
+        1. Scenes whose WGS84 bounds miss the bounds of the area of interest are skipped without any reprojection.
+        2. The area of interest is reprojected to the scene CRS and its bounds select the window of the scene to read.
+        3. The overlapping scenes that come earlier are noted; when a tile runs, the pixels they have valid data for are excluded by its mask, see `AoiTile.claim_mask()`.
+    """
+    aoi = tuple(_densify(geometry) for geometry in aoi)
+    aoi_bounds = _union_bounds(aoi)
+
+    tiles = []
+    for index, footprint in enumerate(footprints):
+        if not _intersects(footprint.bounds_wgs84, aoi_bounds):
+            continue
+
+        scene_aoi = tuple(transform_geom(WGS84, footprint.crs, g) for g in aoi)
+        window = _scene_window(footprint, _union_bounds(scene_aoi))
+        if window is None:
+            continue
+
+        earlier = tuple(
+            other.path
+            for other in footprints[:index]
+            if _intersects(other.bounds_wgs84, footprint.bounds_wgs84)
+        )
+
+        row_end = window.row_off + window.height
+        for row_off in range(window.row_off, row_end, strip_rows):
+            strip = Window(
+                window.col_off,
+                row_off,
+                window.width,
+                min(strip_rows, row_end - row_off),
+            )
+            tiles.append(
+                AoiTile(footprint.path, footprint.crs, strip, scene_aoi, earlier)
+            )
+
+    return tiles
+
+
+def merge_to_wgs84(tiles: list[AoiTile], detections: list[np.ndarray]) -> np.ndarray:
+    """
+    Concatenates the (N, 3) detections of `tiles`, in their scene CRS, into one array of longitude, latitude and fire probability, with one batch transform per distinct CRS.
+    """
+    merged = np.concatenate(detections) if detections else np.empty((0, 3))
+    crs_of_rows = np.repeat([tile.crs for tile in tiles], [len(d) for d in detections])
+
+    for crs in dict.fromkeys(tile.crs for tile in tiles):
+        rows = crs_of_rows == crs
+        merged[rows, :2] = coords_to_wgs84(merged[rows], crs)
+    return merged
+
+
+def _scene_window(footprint: SceneFootprint, bounds: tuple) -> Window | None:
+    window = from_bounds(*bounds, transform=footprint.transform)
+    col_start = max(int(np.floor(window.col_off)), 0)
+    row_start = max(int(np.floor(window.row_off)), 0)
+    col_stop = min(int(np.ceil(window.col_off + window.width)), footprint.width)
+    row_stop = min(int(np.ceil(window.row_off + window.height)), footprint.height)
+
+    if col_stop <= col_start or row_stop <= row_start:
+        return None
+    return Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+
+
+def _resolution_m(crs: str, transform: Affine, height: int, width: int) -> float:
+    # The geometric mean of the great-circle lengths of the top and left edges
+    # of the center pixel.
+    cols = np.array([0, 1, 0]) + width // 2
+    rows = np.array([0, 0, 1]) + height // 2
+    lons, lats = warp_transform(crs, WGS84, *(transform * (cols, rows)))
+    lons, lats = np.radians(lons), np.radians(lats)
+
+    def distance(i, j):
+        a = (
+            np.sin((lats[j] - lats[i]) / 2) ** 2
+            + np.cos(lats[i]) * np.cos(lats[j]) * np.sin((lons[j] - lons[i]) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+    return float((distance(0, 1) * distance(0, 2)) ** 0.5)
+
+
+def _union_bounds(geometries) -> tuple[float, float, float, float]:
+    boxes = np.array([geometry_bounds(geometry) for geometry in geometries])
+    return (*boxes[:, :2].min(axis=0), *boxes[:, 2:].max(axis=0))
+
+
+def _intersects(a: tuple, b: tuple) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _densify(geometry: dict) -> dict:
+    def ring(points):
+        points = np.asarray(points, dtype=np.float64)[:, :2]
+        steps = np.linspace(0, 1, DENSIFY_POINTS, endpoint=False)[:, None]
+        segments = [
+            start + steps * (end - start) for start, end in zip(points[:-1], points[1:])
+        ]
+        return np.vstack(segments + [points[-1:]]).tolist()
+
+    if geometry["type"] == "Polygon":
+        coordinates = [ring(r) for r in geometry["coordinates"]]
+    else:
+        coordinates = [
+            [ring(r) for r in polygon] for polygon in geometry["coordinates"]
+        ]
+    return {"type": geometry["type"], "coordinates": coordinates}
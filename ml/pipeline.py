@@ -1,24 +1,62 @@
-import catboost as cb
+import hashlib
+import os
+import time
+
 import geojson
 import numpy as np
 import pandas as pd
-import rasterio
+from rasterio.windows import Window
 from PIL import Image
 import io
+from typing import Iterator
 
-from ml.constants import THRESHOLD, MODEL_PATH
-from ml.processing import load_and_preprocess_tiff, process_csv
-from ml.utils import pixel_to_coord
+from loguru import logger
 
-loaded_model = cb.CatBoostClassifier()
-loaded_model.load_model(MODEL_PATH)
+from ml.changes import (
+    EXTINGUISHED,
+    GROWN,
+    NEW,
+    change_detections,
+    changed_pixels,
+    open_footprint,
+    spread_mask,
+)
+from ml.constants import (
+    CHANGE_TOLERANCE,
+    ENTROPY_WINDOW,
+    HEAT_MAP_CELL_SIZE,
+    HEAT_MAP_MAX_CELLS,
+    PREDICT_BATCH_ROWS,
+    SCREEN_BLOCK_SIZE,
+    SCREEN_SAMPLES,
+    TILE_SIZE,
+)
+from ml.events import fire_events
+from ml.features import assemble_features
+from ml.heatmap import heat_map_features, pool_blocks
+from ml.mosaic import AoiTile
+from ml.processing import (
+    ENTROPY_FEATURES,
+    band_range,
+    iter_row_windows,
+    iter_windows,
+    process_csv,
+    read_overview_pixel_data,
+    read_pixel_data,
+    read_valid_mask,
+)
+from ml.profiling import record_model, stage
+from ml.raster import open_raster
+from ml.registry import current_plan, get_backend, get_model, model_version
+from ml.screening import dilate_blocks, expand_blocks, screened_fraction
+from ml.utils import extract_fire_detections
 
 
 def generate_fire_points(
-    csv_info: pd.DataFrame, tiff_image: Image
+    csv_info: pd.DataFrame, tiff_image: Image, screen_threshold: float | None = None
 ) -> list[geojson.Point]:
     """
-    generate_fire_points(csv_info: pd.DataFrame, tiff_image: Image) -> list[geojson.Point]
+    generate_fire_points(csv_info: pd.DataFrame, tiff_image: Image, screen_threshold: float | None = None) -> list[geojson.Point]
 
     This function generates a list of GeoJSON `Point` objects representing locations with high fire probability, based on input data from a CSV file and a multi-band TIFF image. The function uses machine learning predictions to identify fire-prone areas from the image and returns the geographical coordinates of those points.
 
@@ -27,59 +65,701 @@ def generate_fire_points(
             A pandas DataFrame containing tabular data from a CSV file, used to enhance pixel information from the TIFF image.
         tiff_image (Image):
             A multi-band TIFF image containing geospatial data. This image provides pixel data for analysis.
+        screen_threshold (float | None):
+            If set, the two-stage mode of `screen_fire_detections()` is used with this coarse threshold: only the parts of the image whose downsampled probability reaches it are run at full resolution. The share of the scene that was skipped is logged.
 
     Returns:
         list[geojson.Point]:
             A list of GeoJSON Point objects representing geographical locations where the probability of fire exceeds a predefined threshold.
 
     Function Workflow:
-        1. The function loads and preprocesses the TIFF image using `load_and_preprocess_tiff()`, extracting pixel data from selected bands (red, green, blue, infrared, and mask).
-        2. The original shape and transformation matrix of the TIFF image are obtained using `rasterio`.
-        3. The CSV data is processed using `process_csv()` to calculate mean values, which are expanded across all pixel data in the TIFF image.
-        4. The pixel data and processed CSV data are combined into a single DataFrame.
-        5. The function ensures that all features required by the machine learning model (`loaded_model`) are present in the DataFrame, filling missing features with NaN values.
-        6. The pre-trained model is used to predict the fire probabilities for each pixel.
-        7. For pixels with fire probability higher than a defined threshold (`THRESHOLD`), the pixel coordinates are converted to geographical coordinates using `pixel_to_coord()`.
+        1. The TIFF image is opened once with `open_raster()`. The nodata value, the internal masks and the mask band are checked with `read_valid_mask()`, and only the valid pixels are preprocessed using `read_pixel_data()`, extracting pixel data from selected bands (red, green, blue and infrared).
+        2. The original shape and transformation matrix of the TIFF image are taken from the same opened dataset, without decoding any band again.
+        3. The CSV data is processed using `process_csv()` to calculate mean values.
+        4. The pixel data and processed CSV data are written into a single float32 feature matrix using `assemble_features()`, with the CSV means broadcast to every pixel.
+        5. The feature matrix follows the feature order of the machine learning model (`get_model()`); missing features are filled with NaN values.
+        6. The pre-trained model is used to predict the fire probabilities for each valid pixel, and the probabilities are scattered back into the original shape (masked pixels get NaN).
+        7. The pixels with fire probability higher than the threshold of the served model (`THRESHOLD` unless the model set defines another, see `load_models()`) are selected in one step and their pixel coordinates are converted to geographical coordinates in one batch using `extract_fire_detections()`.
         8. A GeoJSON `Point` is created for each high-probability pixel and added to the output list.
     """
-    pixel_data = load_and_preprocess_tiff(
-        tiff_image, r_band=1, g_band=2, b_band=3, ik_band=4, mask_band=5
+    if screen_threshold is None:
+        return coords_to_points(generate_fire_detections(csv_info, tiff_image))
+
+    detections, screening = screen_fire_detections(
+        csv_info, tiff_image, screen_threshold
+    )
+    logger.info(
+        f"screening skipped {screening['skipped_fraction']:.1%} of the scene "
+        f"({screening['candidate_blocks']}/{screening['blocks']} blocks kept)"
+    )
+    return coords_to_points(detections)
+
+
+def generate_fire_detections(csv_info: pd.DataFrame, tiff_image: Image) -> np.ndarray:
+    """
+    generate_fire_detections(csv_info: pd.DataFrame, tiff_image: Image) -> np.ndarray
+
+    Runs the same pipeline as `generate_fire_points()`, but returns the detections as an (N, 3) array of x, y and fire probability instead of GeoJSON points.
+    """
+    csv_mean_data = process_csv(csv_info)
+
+    with open_raster(tiff_image) as src:
+        cb_pred_proba = _window_fire_proba(
+            src, None, csv_mean_data, _entropy_ranges(src)
+        )
+        transform = src.transform
+
+    return _extract_fire_detections(cb_pred_proba, transform)
+
+
+def stream_fire_points(
+    csv_info: pd.DataFrame, tiff_image: Image, tile_size: int | None = TILE_SIZE
+) -> Iterator[geojson.Point]:
+    """
+    stream_fire_points(csv_info: pd.DataFrame, tiff_image: Image, tile_size: int | None = TILE_SIZE) -> Iterator[geojson.Point]
+
+    Streaming variant of `generate_fire_points()` for large TIFF images. The feature -> predict -> threshold pipeline runs over one raster window at a time, so peak memory depends on `tile_size` and not on the size of the scene.
+
+    Parameters:
+        csv_info (pd.DataFrame):
+            A pandas DataFrame containing tabular data from a CSV file.
+        tiff_image (Image):
+            A multi-band TIFF image containing geospatial data.
+        tile_size (int | None):
+            The side of a square tile in pixels. If None, the native block windows of the TIFF image are used.
+
+    Yields:
+        geojson.Point:
+            The same points as `generate_fire_points()` returns, grouped by tile: the tiles are visited in row-major order and the points inside a tile are in row-major order too.
+    """
+    for detections in stream_fire_detections(csv_info, tiff_image, tile_size):
+        yield from coords_to_points(detections)
+
+
+def stream_fire_detections(
+    csv_info: pd.DataFrame, tiff_image: Image, tile_size: int | None = TILE_SIZE
+) -> Iterator[np.ndarray]:
+    """
+    stream_fire_detections(csv_info: pd.DataFrame, tiff_image: Image, tile_size: int | None = TILE_SIZE) -> Iterator[np.ndarray]
+
+    Same as `stream_fire_points()`, but yields one (N, 3) array of x, y and fire probability per tile instead of GeoJSON points.
+    """
+    csv_mean_data = process_csv(csv_info)
+
+    with open_raster(tiff_image) as src:
+        entropy_ranges = _entropy_ranges(src)
+        for window in iter_windows(src, tile_size):
+            yield _window_fire_detections(src, window, csv_mean_data, entropy_ranges)
+
+
+def window_fire_detections(
+    csv_mean_data: pd.Series,
+    tiff_image: Image,
+    window: Window,
+    entropy_ranges: tuple | None = None,
+) -> np.ndarray:
+    """
+    window_fire_detections(csv_mean_data: pd.Series, tiff_image: Image, window: Window, entropy_ranges: tuple | None = None) -> np.ndarray
+
+    Runs the pipeline on one window of the TIFF image. This is the unit of work that is sent to the worker processes when a raster is split across them.
+
+    Parameters:
+        csv_mean_data (pd.Series):
+            The CSV features, as returned by `process_csv()`.
+        tiff_image (Image):
+            A multi-band TIFF image containing geospatial data.
+        window (Window):
+            The part of the image to process.
+        entropy_ranges (tuple):
+            The band ranges for the local entropy features, see `read_pixel_data()`. They are estimated from the image if the model uses these features and they are not given.
+
+    Returns:
+        np.ndarray:
+            An (N, 3) array with the coordinates and the fire probability of the fire pixels inside the window, in row-major order.
+    """
+    with open_raster(tiff_image) as src:
+        if entropy_ranges is None:
+            entropy_ranges = _entropy_ranges(src)
+
+        return _window_fire_detections(src, window, csv_mean_data, entropy_ranges)
+
+
+def batch_fire_detections(
+    csv_mean_data: pd.Series, tiff_images: list[Image]
+) -> list[np.ndarray]:
+    """
+    batch_fire_detections(csv_mean_data: pd.Series, tiff_images: list[Image]) -> list[np.ndarray]
+
+    Runs the pipeline on several TIFF images that share the same CSV features. The pixels of all images go through `predict_fire_proba()` together, so small tiles fill whole model batches instead of making one short call each. It is the unit of work of the batch endpoint.
+
+    Parameters:
+        csv_mean_data (pd.Series):
+            The CSV features, as returned by `process_csv()`, computed once for all images.
+        tiff_images (list[Image]):
+            The multi-band TIFF images.
+
+    Returns:
+        list[np.ndarray]:
+            One (N, 3) array of x, y and fire probability per image, in the order of `tiff_images`, as `generate_fire_detections()` would return for each of them.
+    """
+    tiles = []
+    for tiff_image in tiff_images:
+        with open_raster(tiff_image) as src:
+            valid = read_valid_mask(src, mask_band=5)
+            pixel_data = _read_pixel_data(src, None, _entropy_ranges(src), valid)
+            tiles.append((pixel_data, valid, (src.height, src.width), src.transform))
+
+    pred_proba = predict_fire_proba(
+        pd.concat([pixel_data for pixel_data, *_ in tiles], ignore_index=True),
+        csv_mean_data,
     )
 
-    with rasterio.open(tiff_image) as src:
-        original_shape = src.read(1).shape
+    detections = []
+    offset = 0
+    for pixel_data, valid, shape, transform in tiles:
+        tile_proba = pred_proba[offset : offset + len(pixel_data)]
+        offset += len(pixel_data)
+
+        detections.append(
+            _extract_fire_detections(
+                _scatter_proba(tile_proba, valid, shape), transform
+            )
+        )
+
+    return detections
+
+
+def screen_fire_detections(
+    csv_info: pd.DataFrame,
+    tiff_image: Image,
+    screen_threshold: float,
+    block_size: int = SCREEN_BLOCK_SIZE,
+    samples: int = SCREEN_SAMPLES,
+    dilate: int = 1,
+) -> tuple[np.ndarray, dict]:
+    """
+    screen_fire_detections(csv_info: pd.DataFrame, tiff_image: Image, screen_threshold: float, block_size: int = SCREEN_BLOCK_SIZE, samples: int = SCREEN_SAMPLES, dilate: int = 1) -> tuple[np.ndarray, dict]
+
+    Two-stage variant of `generate_fire_detections()`. Most of a scene has no fire, so a cheap first stage decides which blocks are worth running the model on at full resolution.
+
+    Parameters:
+        csv_info (pd.DataFrame):
+            A pandas DataFrame containing tabular data from a CSV file.
+        tiff_image (Image):
+            A multi-band TIFF image containing geospatial data.
+        screen_threshold (float):
+            The coarse probability a block needs to go on to the second stage. It should be well below `THRESHOLD`: it trades recall for speed, 0 keeps every block.
+        block_size (int):
+            The side of a screening block in pixels.
+        samples (int):
+            The number of pixels sampled along each side of a block in the first stage, at most `block_size`. Fires smaller than about `block_size / samples` pixels can fall between the samples.
+        dilate (int):
+            The number of neighbouring blocks kept around each block that passes.
+
+    Returns:
+        tuple[np.ndarray, dict]:
+            The (N, 3) detections, a subset of what `generate_fire_detections()` returns, and the screening statistics: the number of blocks, the number of candidate blocks and the skipped fraction of the scene.
+
+    Function Workflow:
+        1. The image is read downsampled with `read_overview_pixel_data()` to `samples` x `samples` pixels per block, and the model scores these pixels. Nearest resampling is used because block averages dilute small fires below any useful threshold.
+        2. Each block is scored with the highest sample probability (`pool_blocks()` max pooling); blocks reaching `screen_threshold` are selected and grown by `dilate` blocks with `dilate_blocks()`.
+        3. Consecutive block rows with candidates are read in strips of up to TILE_SIZE rows; the candidate blocks are combined with `read_valid_mask()`, so only their pixels get features and go through the model.
+    """
+    csv_mean_data = process_csv(csv_info)
+
+    with open_raster(tiff_image) as src:
+        shape = (src.height, src.width)
+
+        samples = min(samples, block_size)
+        sample_shape = (
+            -(-src.height // block_size) * samples,
+            -(-src.width // block_size) * samples,
+        )
+        sample_data = read_overview_pixel_data(
+            src, r_band=1, g_band=2, b_band=3, ik_band=4, out_shape=sample_shape
+        )
+        sample_proba = predict_fire_proba(sample_data, csv_mean_data, shadow=False)
+        sample_proba = sample_proba.reshape(sample_shape)
+        block_proba = pool_blocks(sample_proba, samples, "max")
+
+        candidates = dilate_blocks(block_proba >= screen_threshold, dilate)
+
+        entropy_ranges = _entropy_ranges(src)
+        strip_blocks = max(1, TILE_SIZE // block_size)
+        parts = []
+        for block_row in _candidate_strips(candidates, strip_blocks):
+            window = Window(
+                0,
+                block_row.start * block_size,
+                src.width,
+                min(block_row.stop * block_size, src.height)
+                - block_row.start * block_size,
+            )
+            screen = expand_blocks(
+                candidates[block_row], block_size, (window.height, window.width)
+            )
+            parts.append(
+                _window_fire_detections(
+                    src, window, csv_mean_data, entropy_ranges, screen
+                )
+            )
+
+    detections = np.concatenate(parts) if parts else np.empty((0, 3))
+    screening = {
+        "blocks": int(candidates.size),
+        "candidate_blocks": int(candidates.sum()),
+        "skipped_fraction": screened_fraction(candidates, block_size, shape),
+    }
+    return detections, screening
+
+
+def _candidate_strips(candidates: np.ndarray, strip_blocks: int) -> Iterator[slice]:
+    # Runs of consecutive block rows with at least one candidate, split into
+    # strips of at most strip_blocks block rows.
+    rows = np.flatnonzero(candidates.any(axis=1))
+    if not len(rows):
+        return
+
+    start = previous = rows[0]
+    for row in rows[1:]:
+        if row != previous + 1 or row - start >= strip_blocks:
+            yield slice(int(start), int(previous) + 1)
+            start = row
+        previous = row
+    yield slice(int(start), int(previous) + 1)
+
+
+def generate_fire_events(
+    csv_info: pd.DataFrame, tiff_image: Image, connectivity: int = 8
+) -> dict:
+    """
+    generate_fire_events(csv_info: pd.DataFrame, tiff_image: Image, connectivity: int = 8) -> dict
+
+    This function runs the same pipeline as `generate_fire_points()`, but groups the adjacent fire pixels into fire events with `fire_events()`, so the response size depends on the number of fires and not on the number of burning pixels.
+
+    Parameters:
+        csv_info (pd.DataFrame):
+            A pandas DataFrame containing tabular data from a CSV file.
+        tiff_image (Image):
+            A multi-band TIFF image containing geospatial data.
+        connectivity (int):
+            4 or 8, the pixel neighbourhood that joins fire pixels into one event.
+
+    Returns:
+        dict:
+            A GeoJSON FeatureCollection with one Polygon feature per fire event, see `fire_events()`.
+    """
+    csv_mean_data = process_csv(csv_info)
+
+    with open_raster(tiff_image) as src:
+        cb_pred_proba = _window_fire_proba(
+            src, None, csv_mean_data, _entropy_ranges(src)
+        )
         transform = src.transform
 
+    with stage("events", cb_pred_proba.size):
+        return fire_events(
+            cb_pred_proba, transform, current_plan().served.threshold, connectivity
+        )
+
+
+def generate_heat_map(
+    csv_info: pd.DataFrame,
+    tiff_image: Image,
+    cell_size: int = HEAT_MAP_CELL_SIZE,
+    method: str = "mean",
+    min_weight: float = 0.0,
+    top_k: int | None = HEAT_MAP_MAX_CELLS,
+) -> dict:
+    """
+    generate_heat_map(csv_info: pd.DataFrame, tiff_image: Image, cell_size: int = HEAT_MAP_CELL_SIZE, method: str = "mean", min_weight: float = 0.0, top_k: int | None = HEAT_MAP_MAX_CELLS) -> dict
+
+    This function builds a fire heat map from the same probability raster that `generate_fire_points()` thresholds. The probabilities are pooled into a grid of `cell_size` x `cell_size` pixel cells, so the response size depends on the grid and not on the number of pixels.
+
+    Parameters:
+        csv_info (pd.DataFrame):
+            A pandas DataFrame containing tabular data from a CSV file.
+        tiff_image (Image):
+            A multi-band TIFF image containing geospatial data.
+        cell_size (int):
+            The side of a heat map cell in pixels (the resolution of the heat map).
+        method (str):
+            "mean" or "max" pooling of the probabilities inside a cell.
+        min_weight (float):
+            Cells with a lower weight are left out.
+        top_k (int | None):
+            The maximum number of cells to return, the ones with the highest weights are kept.
+
+    Returns:
+        dict:
+            A GeoJSON FeatureCollection of weighted cell points, see `heat_map_features()`.
+
+    Function Workflow:
+        1. The CSV data is processed once using `process_csv()`.
+        2. The raster is processed in full-width strips whose height is a multiple of `cell_size`, so every cell lies inside one strip and memory stays bounded by the strip size.
+        3. The probabilities of each strip are pooled with `pool_blocks()` and the strip grids are stacked.
+        4. The grid is filtered and converted to features with `heat_map_features()`.
+    """
+    csv_mean_data = process_csv(csv_info)
+
+    with open_raster(tiff_image) as src:
+        strip_rows = max(1, TILE_SIZE // cell_size) * cell_size
+        entropy_ranges = _entropy_ranges(src)
+        grid = np.concatenate(
+            [
+                pool_blocks(
+                    _window_fire_proba(src, window, csv_mean_data, entropy_ranges),
+                    cell_size,
+                    method,
+                )
+                for window in iter_row_windows(src.height, src.width, strip_rows)
+            ]
+        )
+        transform = src.transform
+        shape = (src.height, src.width)
+
+    return heat_map_features(grid, transform, shape, cell_size, min_weight, top_k)
+
+
+def aoi_tile_detections(csv_mean_data: pd.Series, tile: AoiTile) -> np.ndarray:
+    """
+    aoi_tile_detections(csv_mean_data: pd.Series, tile: AoiTile) -> np.ndarray
+
+    Runs the pipeline on one tile of an area of interest (see `aoi_tiles()`). Only the pixels the tile claims are scored; like nodata pixels, the others skip feature computation and inference.
+
+    Parameters:
+        csv_mean_data (pd.Series):
+            The CSV features, as returned by `process_csv()`.
+        tile (AoiTile):
+            The scene window and the geometries that select its pixels.
+
+    Returns:
+        np.ndarray:
+            An (N, 3) array with the coordinates in the scene CRS and the fire probability of the fire pixels, in row-major order.
+    """
+    with open_raster(tile.path) as src:
+        screen = tile.claim_mask(src.window_transform(tile.window), mask_band=5)
+        if not screen.any():
+            return np.empty((0, 3))
+
+        return _window_fire_detections(
+            src, tile.window, csv_mean_data, _entropy_ranges(src), screen
+        )
+
+
+def detect_fire_changes(
+    csv_info: pd.DataFrame,
+    tiff_image: Image,
+    store_dir: str,
+    tolerance: float = CHANGE_TOLERANCE,
+    strip_rows: int = TILE_SIZE,
+) -> tuple[np.ndarray, dict]:
+    """
+    detect_fire_changes(csv_info: pd.DataFrame, tiff_image: Image, store_dir: str, tolerance: float = CHANGE_TOLERANCE, strip_rows: int = TILE_SIZE) -> tuple[np.ndarray, dict]
+
+    Change detection mode for footprints that are acquired again and again. The probability raster of the previous scene of the footprint is kept in `store_dir` (see `open_footprint()`); only the pixels whose bands changed are scored again and only the fire pixels that changed are returned.
+
+    Parameters:
+        csv_info (pd.DataFrame):
+            A pandas DataFrame containing tabular data from a CSV file.
+        tiff_image (Image):
+            A multi-band TIFF image containing geospatial data. Scenes with the same CRS, transform, shape and band data type share one footprint.
+        store_dir (str):
+            The directory of the footprint states, with one subdirectory per served model.
+        tolerance (float):
+            The largest band difference, in band units, that does not make a pixel be scored again. Higher values trade accuracy for speed on noisy acquisitions; 0 gives the probabilities `generate_fire_detections()` would.
+        strip_rows (int):
+            The number of rows processed at once.
+
+    Returns:
+        tuple[np.ndarray, dict]:
+            The (N, 4) change detections (x, y, fire probability and change code, see `change_detections()`) in the raster CRS, and the statistics: the number of pixels, the number of re-scored pixels and their fraction, the count of every change kind and whether the footprint had a previous scene. The first scene of a footprint reports all of its fire pixels as new.
+
+    Function Workflow:
+        1. The footprint state is opened and locked. If the model, the weather features or the entropy ranges differ from the ones the stored probabilities were computed with, every valid pixel is scored again.
+        2. The scene is read in strips and compared with the stored bands with `changed_pixels()`; the bands of the changed pixels are stored and the previous fire pixels are noted. With the local entropy features, the changed pixels are grown by the entropy neighbourhood.
+        3. The changed pixels of every strip are scored like the screened pixels of `screen_fire_detections()` and their probabilities are stored; strips without changes are not read again.
+        4. The fire pixels before and after are compared with `change_detections()`. Masked pixels keep their previous state, so a cloud over a fire does not extinguish it.
+    """
     csv_mean_data = process_csv(csv_info)
+    served = current_plan().served
+    # Each model keeps its own states, so traffic split between models does
+    # not make them overwrite each other's probabilities.
+    store_dir = os.path.join(store_dir, served.name)
+
+    with open_raster(tiff_image) as src:
+        shape = (src.height, src.width)
+        entropy_ranges = _entropy_ranges(src)
+        fingerprint = _scene_fingerprint(served.path, csv_mean_data, entropy_ranges)
+        windows = list(iter_row_windows(src.height, src.width, strip_rows))
+        crs = src.crs.to_string() if src.crs else None
+        dtype = np.result_type(*src.dtypes[:4])
+
+        with open_footprint(store_dir, crs, src.transform, shape, dtype) as state:
+            rescore_all = state.fingerprint != fingerprint
+            # An interrupted update leaves no fingerprint, see FootprintState.
+            state.begin()
+
+            changed = np.zeros(shape, dtype=bool)
+            previous_fire = np.zeros(shape, dtype=bool)
+            with stage("changes", src.height * src.width):
+                for window in windows:
+                    rows = slice(window.row_off, window.row_off + window.height)
+                    bands = src.read([1, 2, 3, 4], window=window)
+                    valid = read_valid_mask(src, mask_band=5, window=window)
+                    if valid is None:
+                        valid = np.ones(bands.shape[1:], dtype=bool)
+
+                    previous_bands = state.bands[:, rows]
+                    previous_proba = state.proba[rows]
+                    previous_fire[rows] = previous_proba > served.threshold
+                    if rescore_all:
+                        changed[rows] = valid
+                    else:
+                        changed[rows] = changed_pixels(
+                            bands, previous_bands, previous_proba, valid, tolerance
+                        )
+                    previous_bands[:, changed[rows]] = bands[:, changed[rows]]
 
-    csv_data_expanded = pd.DataFrame(
-        np.tile(csv_mean_data.values, (len(pixel_data), 1)), columns=csv_mean_data.index
+                near_fire = spread_mask(previous_fire)
+                if entropy_ranges is not None:
+                    # The entropy of a pixel depends on its neighbourhood.
+                    changed = dilate_blocks(changed, ENTROPY_WINDOW // 2)
+
+            parts = []
+            rescored = 0
+            for window in windows:
+                rows = slice(window.row_off, window.row_off + window.height)
+                if not changed[rows].any():
+                    continue
+
+                proba = _window_fire_proba(
+                    src, window, csv_mean_data, entropy_ranges, changed[rows]
+                )
+                scored = ~np.isnan(proba)
+                rescored += int(scored.sum())
+                stored_proba = state.proba[rows]
+                stored_proba[scored] = proba[scored]
+
+                with stage("extract", proba.size):
+                    parts.append(
+                        change_detections(
+                            previous_fire[rows],
+                            near_fire[rows],
+                            np.asarray(stored_proba),
+                            served.threshold,
+                            src.window_transform(window),
+                        )
+                    )
+
+            state.commit(fingerprint)
+            is_new = state.is_new
+
+    detections = np.concatenate(parts) if parts else np.empty((0, 4))
+    codes = detections[:, 3]
+    pixels = shape[0] * shape[1]
+    stats = {
+        "pixels": pixels,
+        "rescored_pixels": rescored,
+        "rescored_fraction": rescored / pixels if pixels else 0.0,
+        "new": int((codes == NEW).sum()),
+        "grown": int((codes == GROWN).sum()),
+        "extinguished": int((codes == EXTINGUISHED).sum()),
+        "previous_scene": not is_new,
+    }
+    return detections, stats
+
+
+def _scene_fingerprint(
+    model_path: str, csv_mean_data: pd.Series, entropy_ranges: tuple | None
+) -> str:
+    # Everything a pixel probability depends on besides the pixel itself.
+    inputs = (
+        model_version(model_path),
+        list(csv_mean_data.index),
+        csv_mean_data.to_numpy().tolist(),
+        entropy_ranges,
+    )
+    return hashlib.blake2b(repr(inputs).encode(), digest_size=16).hexdigest()
+
+
+def _entropy_ranges(src) -> tuple | None:
+    # The local entropy features are computed only for models trained with them.
+    feature_names = set()
+    for spec in current_plan().models:
+        feature_names.update(get_model(spec.path).feature_names_)
+    if not set(ENTROPY_FEATURES) & feature_names:
+        return None
+
+    return band_range(src, 1), band_range(src, 4)
+
+
+def _read_pixel_data(
+    src,
+    window: Window | None = None,
+    entropy_ranges: tuple | None = None,
+    valid: np.ndarray | None = None,
+) -> pd.DataFrame:
+    return read_pixel_data(
+        src,
+        r_band=1,
+        g_band=2,
+        b_band=3,
+        ik_band=4,
+        mask_band=5,
+        window=window,
+        entropy=entropy_ranges is not None,
+        entropy_ranges=entropy_ranges,
+        valid=valid,
+    )
+
+
+def _window_fire_proba(
+    src,
+    window: Window | None,
+    csv_mean_data: pd.Series,
+    entropy_ranges: tuple | None = None,
+    screen: np.ndarray | None = None,
+) -> np.ndarray:
+    if window is None:
+        shape = (src.height, src.width)
+    else:
+        shape = (window.height, window.width)
+
+    # Nodata and masked pixels skip feature computation and inference.
+    valid = read_valid_mask(src, mask_band=5, window=window)
+    if screen is not None:
+        valid = screen if valid is None else valid & screen
+
+    pixel_data = _read_pixel_data(src, window, entropy_ranges, valid)
+
+    return _scatter_proba(predict_fire_proba(pixel_data, csv_mean_data), valid, shape)
+
+
+def _scatter_proba(
+    pred_proba: np.ndarray, valid: np.ndarray | None, shape: tuple[int, int]
+) -> np.ndarray:
+    if valid is None:
+        return pred_proba.reshape(shape)
+
+    # Masked pixels get a NaN probability, which is never above THRESHOLD and
+    # is ignored by the heat map pooling.
+    full_proba = np.full(shape, np.nan)
+    full_proba[valid] = pred_proba
+    return full_proba
+
+
+def _window_fire_detections(
+    src,
+    window: Window,
+    csv_mean_data: pd.Series,
+    entropy_ranges: tuple | None = None,
+    screen: np.ndarray | None = None,
+) -> np.ndarray:
+    cb_pred_proba = _window_fire_proba(
+        src, window, csv_mean_data, entropy_ranges, screen
+    )
+
+    return _extract_fire_detections(cb_pred_proba, src.window_transform(window))
+
+
+def _extract_fire_detections(cb_pred_proba: np.ndarray, transform) -> np.ndarray:
+    with stage("extract", cb_pred_proba.size):
+        return extract_fire_detections(
+            cb_pred_proba, transform, current_plan().served.threshold
+        )
+
+
+def predict_fire_proba(
+    pixel_data: pd.DataFrame, csv_mean_data: pd.Series, shadow: bool = True
+) -> np.ndarray:
+    """
+    predict_fire_proba(pixel_data: pd.DataFrame, csv_mean_data: pd.Series, shadow: bool = True) -> np.ndarray
+
+    Combines the pixel features with the aggregated CSV features using `assemble_features()` and runs the models of the current scoring plan (`current_plan()`) on them with the configured inference backend (`get_backend()`).
+
+    Parameters:
+        pixel_data (pd.DataFrame):
+            The pixel features, as returned by `load_and_preprocess_tiff()`.
+        csv_mean_data (pd.Series):
+            The CSV features, as returned by `process_csv()`.
+        shadow (bool):
+            Whether the shadow models of the plan score the features too. Their probabilities are not returned, only recorded with `record_model()`.
+
+    Returns:
+        np.ndarray:
+            A 1D array with the probability of the positive class of the served model for every row of `pixel_data`.
+
+    Function Workflow:
+        1. The feature matrix is assembled once with the union of the feature names of the models, those of the served model first.
+        2. The served model scores the matrix in batches of PREDICT_BATCH_ROWS rows.
+        3. Each shadow model scores the columns it was trained on, and its decisions at its own threshold are compared with the decisions of the served model.
+    """
+    plan = current_plan()
+    specs = plan.models if shadow else (plan.served,)
+    backends = [get_backend(spec.path) for spec in specs]
+
+    feature_names = list(
+        dict.fromkeys(name for backend in backends for name in backend.feature_names)
     )
-    df = pd.concat([pixel_data, csv_data_expanded], axis=1)
+    with stage("assemble", len(pixel_data)):
+        features = assemble_features(pixel_data, csv_mean_data, feature_names)
 
-    feature_names = loaded_model.feature_names_
+    with stage("predict", len(features)):
+        pred_proba, seconds = _score(backends[0], features, feature_names)
+        fire = pred_proba > plan.served.threshold
+        positives = int(fire.sum())
+    record_model(
+        plan.served.name,
+        model_version(plan.served.path),
+        "served",
+        seconds,
+        len(features),
+        positives,
+        0,
+    )
 
-    missing_columns = [col for col in feature_names if col not in df.columns]
+    for spec, backend in zip(specs[1:], backends[1:]):
+        with stage("shadow", len(features)):
+            shadow_proba, seconds = _score(backend, features, feature_names)
+            shadow_fire = shadow_proba > spec.threshold
+        record_model(
+            spec.name,
+            model_version(spec.path),
+            "shadow",
+            seconds,
+            len(features),
+            int(shadow_fire.sum()),
+            int((shadow_fire == fire).sum()),
+        )
 
-    for col in missing_columns:
-        df[col] = np.nan
+    return pred_proba
 
-    df = df.reindex(columns=feature_names)
 
-    cb_pred_proba = loaded_model.predict_proba(df)[:, 1].reshape(
-        original_shape
-    )  # Get the probability estimates for the positive class
+def _score(
+    backend, features: np.ndarray, feature_names: list[str]
+) -> tuple[np.ndarray, float]:
+    if backend.feature_names != feature_names:
+        index = {name: i for i, name in enumerate(feature_names)}
+        features = features[:, [index[name] for name in backend.feature_names]]
 
-    geojson_points = []
+    # The model is fastest on batches of PREDICT_BATCH_ROWS rows that stay in
+    # cache; a single call on millions of rows is slower.
+    start = time.perf_counter()
+    pred_proba = np.empty(len(features))
+    for offset in range(0, len(features), PREDICT_BATCH_ROWS):
+        batch = features[offset : offset + PREDICT_BATCH_ROWS]
+        pred_proba[offset : offset + len(batch)] = backend.predict_proba(batch)
+    return pred_proba, time.perf_counter() - start
 
-    for row in range(cb_pred_proba.shape[0]):
-        for col in range(cb_pred_proba.shape[1]):
-            if cb_pred_proba[row, col] > THRESHOLD:
-                x, y = pixel_to_coord(row, col, transform)
-                point = geojson.Point([x, y])
-                geojson_points.append(point)
 
-    return geojson_points
+def coords_to_points(coords: np.ndarray) -> list[geojson.Point]:
+    """
+    coords_to_points(coords: np.ndarray) -> list[geojson.Point]
+
+    Wraps an (N, 2) coordinate array, as returned by `extract_fire_coords()`, into GeoJSON `Point` objects. For (N, 3) detection arrays the probability column is ignored.
+    """
+    return [geojson.Point(coord) for coord in coords[:, :2].tolist()]
 
 
 if __name__ == "__main__":
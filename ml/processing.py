@@ -1,42 +1,49 @@
+import numpy as np
 import pandas as pd
-import rasterio
+from rasterio.enums import MaskFlags, Resampling
+from rasterio.windows import Window
 
-from ml.utils import calculate_additional_features
+from ml.constants import ENTROPY_WINDOW, WEATHER_WINDOWS
+from ml.profiling import stage
+from ml.raster import open_raster
+from ml.utils import calculate_additional_features, local_entropy
+from ml.weather import weather_features
 
+ENTROPY_FEATURES = ("entropy_red", "entropy_nir")
+BAND_RANGE_SAMPLE = 1024
 
-def process_csv(csv_data):
+
+def process_csv(csv_data, windows=WEATHER_WINDOWS):
     """
-    process_csv(csv_data)
+    process_csv(csv_data, windows=WEATHER_WINDOWS)
 
-    This function processes the input CSV data by calculating the mean values of the last 10 rows (excluding the first column).
+    This function processes the input CSV data into the scene-level weather features using `weather_features()`. With the default windows these are the mean values of the last 10 rows of every column except the first.
 
     Parameters:
         csv_data (pd.DataFrame):
-            A pandas DataFrame containing the CSV data to be processed. The first column is excluded from processing, and only the last 10 rows of the remaining columns are considered.
+            A pandas DataFrame containing the CSV data to be processed. The first column holds the timestamps, the remaining columns the weather values in chronological order.
+        windows (tuple):
+            The (window, aggregation, name) triples to compute, see `weather_features()`.
 
     Returns:
         pd.Series:
-            A pandas Series containing the mean values of the last 10 rows for each feature (excluding the first column). If there is no data, the mean values will be NaN.
+            A pandas Series containing the weather features, indexed by the names `assemble_features()` matches against the model features. If there is no data, the values will be NaN.
     """
-    # Read the CSV file
-    # Take only the last 10 rows
-    last_10_rows = csv_data.iloc[:, 1:].tail(10)
-    # Calculate the mean for each feature
-    mean_values = last_10_rows.mean()
-    # If there's no data, the mean will be NaN
-    return mean_values
+    return weather_features(csv_data, windows)
 
 
 # In your main processing function:
-def load_and_preprocess_tiff(file_path, r_band, g_band, b_band, ik_band, mask_band):
+def load_and_preprocess_tiff(
+    file_path, r_band, g_band, b_band, ik_band, mask_band, entropy=False
+):
     """
-    load_and_preprocess_tiff(file_path, r_band, g_band, b_band, ik_band, mask_band)
+    load_and_preprocess_tiff(file_path, r_band, g_band, b_band, ik_band, mask_band, entropy=False)
 
     This function loads a multi-band TIFF image, extracts specified bands, calculates additional remote sensing features, and returns a DataFrame containing pixel-level information for further analysis.
 
     Parameters:
-        file_path (str):
-            The file path to the input TIFF image.
+        file_path (str | RasterSource | bytes | file-like):
+            The input TIFF image, see `open_raster()`.
         r_band (int):
             The index of the red band in the TIFF image.
         g_band (int):
@@ -46,46 +53,252 @@ def load_and_preprocess_tiff(file_path, r_band, g_band, b_band, ik_band, mask_ba
         ik_band (int):
             The index of the near-infrared (NIR) band in the TIFF image.
         mask_band (int):
-            The index of the mask band in the TIFF image (currently commented out in the function).
+            The index of the mask band in the TIFF image. It is not used here, see `read_valid_mask()`.
+        entropy (bool):
+            Whether to add the `entropy_red` and `entropy_nir` local entropy texture features (see `local_entropy()`). They are off by default because they are the most expensive features.
 
     Returns:
         pd.DataFrame:
             A DataFrame where each row corresponds to a pixel from the TIFF image and each column represents the values of the red, green, blue, NIR, and additional calculated features (e.g., NDVI, EVI, SAVI, NDWI, SR, GNDVI) for that pixel.
 
     Function Workflow:
-        1. Opens the TIFF image using `rasterio` and extracts the specified bands (red, green, blue, and NIR).
-        2. Calculates additional vegetation and water indices, such as NDVI, EVI, SAVI, and NDWI, as well as spectral ratios.
+        1. Opens the TIFF image using `rasterio` and extracts the specified bands (red, green, blue, and NIR) in a single read.
+        2. Calculates additional vegetation and water indices, such as NDVI, EVI, SAVI, and NDWI, as well as spectral ratios, and optionally the local entropy of the red and NIR bands.
         3. Flattens the band data and derived features to create a tabular format.
         4. Returns a pandas DataFrame with the extracted and calculated features for each pixel.
     """
-    with rasterio.open(file_path) as src:
-        red = src.read(r_band)
-        green = src.read(g_band)
-        blue = src.read(b_band)
-        nir = src.read(ik_band)
-        # mask = src.read(mask_band)
+    with open_raster(file_path) as src:
+        return read_pixel_data(
+            src, r_band, g_band, b_band, ik_band, mask_band, entropy=entropy
+        )
+
+
+def read_pixel_data(
+    src,
+    r_band,
+    g_band,
+    b_band,
+    ik_band,
+    mask_band,
+    window=None,
+    entropy=False,
+    entropy_ranges=None,
+    valid=None,
+):
+    """
+    read_pixel_data(src, r_band, g_band, b_band, ik_band, mask_band, window=None, entropy=False, entropy_ranges=None, valid=None)
+
+    Same as `load_and_preprocess_tiff()`, but reads from an already opened rasterio dataset and optionally only from a part of it.
+
+    Parameters:
+        src (rasterio.DatasetReader):
+            The opened TIFF image.
+        r_band, g_band, b_band, ik_band, mask_band (int):
+            The band indices, see `load_and_preprocess_tiff()`.
+        window (rasterio.windows.Window):
+            The part of the image to read. The whole image is read if omitted.
+        entropy (bool):
+            Whether to add the local entropy features, see `load_and_preprocess_tiff()`. The neighbourhoods of the pixels on the window edges are read from the surrounding image, so tiles give the same values as the whole image.
+        entropy_ranges (tuple):
+            The value ranges of the red and NIR bands, as returned by `band_range()`. Pass them when reading several windows of the same image to estimate them only once.
+        valid (np.ndarray):
+            A boolean array of the window shape, as returned by `read_valid_mask()`. Only the valid pixels get a row and their features are computed from the valid band values only. All pixels are kept if omitted.
+
+    Returns:
+        pd.DataFrame:
+            A DataFrame with one row per (valid) pixel of the window, in row-major order.
+    """
+    # A single multi-band read decodes every block of the window only once.
+    with stage("decode", _window_pixels(src, window)):
+        red, green, blue, nir = src.read(
+            [r_band, g_band, b_band, ik_band], window=window
+        )
+
+    with stage("features", red.size if valid is None else int(valid.sum())):
+        if valid is not None:
+            red, green, blue, nir = red[valid], green[valid], blue[valid], nir[valid]
+
+        # Create a DataFrame with pixel-level information
+        columns = _band_columns(red, green, blue, nir)
+
+    if entropy:
+        with stage("entropy", _window_pixels(src, window)):
+            if entropy_ranges is None:
+                entropy_ranges = (band_range(src, r_band), band_range(src, ik_band))
+
+            for name, band, value_range in zip(
+                ENTROPY_FEATURES, (r_band, ik_band), entropy_ranges
+            ):
+                values = read_local_entropy(src, band, value_range, window)
+                columns[name] = values[valid] if valid is not None else values.flatten()
+
+    with stage("dataframe", len(columns["red"])):
+        pixel_data = pd.DataFrame(columns)
+
+    return pixel_data
+
+
+def _window_pixels(src, window=None) -> int:
+    if window is None:
+        return src.height * src.width
+    return int(window.height) * int(window.width)
+
+
+def read_overview_pixel_data(
+    src, r_band, g_band, b_band, ik_band, out_shape, resampling=Resampling.nearest
+):
+    """
+    read_overview_pixel_data(src, r_band, g_band, b_band, ik_band, out_shape, resampling=Resampling.nearest)
+
+    Same as `read_pixel_data()` for a downsampled version of the whole image of shape `out_shape`. GDAL serves the read from the image overviews when it has suitable ones. With the default nearest resampling the values are a regular sample of real pixels, while `Resampling.average` gives block averages, which blur small bright spots into their surroundings.
 
-    ndvi, evi, savi, ndwi, sr, gndvi, entropy_red, entropy_nir = (
-        calculate_additional_features(red, green, blue, nir)
+    Returns:
+        pd.DataFrame:
+            A DataFrame with one row per pixel of the downsampled image, in row-major order. The local entropy features are left out.
+    """
+    red, green, blue, nir = src.read(
+        [r_band, g_band, b_band, ik_band],
+        out_shape=(4, *out_shape),
+        resampling=resampling,
     )
 
-    # Create a DataFrame with pixel-level information
-    pixel_data = pd.DataFrame(
-        {
-            "red": red.flatten(),
-            "green": green.flatten(),
-            "blue": blue.flatten(),
-            "nir": nir.flatten(),
-            "ndvi": ndvi.flatten(),
-            "evi": evi.flatten(),
-            "savi": savi.flatten(),
-            "ndwi": ndwi.flatten(),
-            "sr": sr.flatten(),
-            "gndvi": gndvi.flatten(),
-            #'entropy_red': entropy_red.flatten(),
-            #'entropy_nir': entropy_nir.flatten(),
-            #'mask': mask.flatten()
-        }
+    return pd.DataFrame(_band_columns(red, green, blue, nir))
+
+
+def _band_columns(red, green, blue, nir) -> dict:
+    ndvi, evi, savi, ndwi, sr, gndvi = calculate_additional_features(
+        red, green, blue, nir
     )
 
-    return pixel_data
+    return {
+        "red": red.flatten(),
+        "green": green.flatten(),
+        "blue": blue.flatten(),
+        "nir": nir.flatten(),
+        "ndvi": ndvi.flatten(),
+        "evi": evi.flatten(),
+        "savi": savi.flatten(),
+        "ndwi": ndwi.flatten(),
+        "sr": sr.flatten(),
+        "gndvi": gndvi.flatten(),
+    }
+
+
+def read_valid_mask(src, mask_band=None, window=None):
+    """
+    read_valid_mask(src, mask_band=None, window=None)
+
+    This function finds the pixels worth running the model on: the pixels inside the valid footprint of the image, as opposed to nodata borders, zero padding and pixels flagged by the mask band (clouds, water).
+
+    Parameters:
+        src (rasterio.DatasetReader):
+            The opened TIFF image.
+        mask_band (int):
+            The index of the mask band, where 0 marks an invalid pixel. It is ignored if the image has fewer bands.
+        window (rasterio.windows.Window):
+            The part of the image to check. The whole image is checked if omitted.
+
+    Returns:
+        np.ndarray | None:
+            A boolean array of the window shape that is True for valid pixels, or None if every pixel is valid.
+
+    Function Workflow:
+        1. Unless every band is flagged as all-valid, the GDAL dataset mask is read, which covers the nodata value, alpha band and internal masks.
+        2. The mask band is read, if present, and combined with the dataset mask.
+        3. None is returned when nothing is masked, so callers can take the unmasked fast path.
+    """
+    valid = None
+
+    with stage("mask", _window_pixels(src, window)):
+        if any(MaskFlags.all_valid not in flags for flags in src.mask_flag_enums):
+            valid = src.dataset_mask(window=window) != 0
+
+        if mask_band is not None and mask_band <= src.count:
+            band_valid = src.read(mask_band, window=window) != 0
+            valid = band_valid if valid is None else valid & band_valid
+
+    if valid is not None and valid.all():
+        return None
+
+    return valid
+
+
+def read_local_entropy(src, band, value_range, window=None, size=ENTROPY_WINDOW):
+    """
+    read_local_entropy(src, band, value_range, window=None, size=ENTROPY_WINDOW)
+
+    Calculates `local_entropy()` of one band over a window, reading a margin of `size // 2` pixels around it where the image allows, so that the result does not depend on how the image is split into windows.
+    """
+    full = Window(0, 0, src.width, src.height)
+    if window is None:
+        window = full
+
+    radius = size // 2
+    padded = Window(
+        window.col_off - radius,
+        window.row_off - radius,
+        window.width + 2 * radius,
+        window.height + 2 * radius,
+    ).intersection(full)
+
+    values = local_entropy(src.read(band, window=padded), size, value_range=value_range)
+
+    row = int(window.row_off - padded.row_off)
+    col = int(window.col_off - padded.col_off)
+    return values[row : row + int(window.height), col : col + int(window.width)]
+
+
+def band_range(src, band, sample=BAND_RANGE_SAMPLE):
+    """
+    band_range(src, band, sample=BAND_RANGE_SAMPLE)
+
+    Estimates the (min, max) value range of a band from a decimated read of at most `sample` x `sample` pixels. It sets the histogram bins of the local entropy features consistently for all windows of an image.
+    """
+    out_shape = (min(src.height, sample), min(src.width, sample))
+    values = src.read(band, out_shape=out_shape)
+
+    return float(np.nanmin(values)), float(np.nanmax(values))
+
+
+def iter_windows(src, tile_size=None):
+    """
+    iter_windows(src, tile_size=None)
+
+    Splits an opened raster into windows for tiled processing.
+
+    Parameters:
+        src (rasterio.DatasetReader):
+            The opened TIFF image.
+        tile_size (int):
+            The side of a square tile in pixels. Tiles on the right and bottom edges are clipped to the image. If omitted, the native block windows of the first band are used.
+
+    Yields:
+        rasterio.windows.Window:
+            The windows, in row-major order. Together they cover the image exactly once.
+    """
+    if tile_size is None:
+        for _, window in src.block_windows(1):
+            yield window
+        return
+
+    if tile_size <= 0:
+        raise ValueError(f"tile_size must be positive, got {tile_size}")
+
+    for row_off in range(0, src.height, tile_size):
+        for col_off in range(0, src.width, tile_size):
+            yield Window(
+                col_off,
+                row_off,
+                min(tile_size, src.width - col_off),
+                min(tile_size, src.height - row_off),
+            )
+
+
+def iter_row_windows(height, width, strip_rows):
+    """
+    iter_row_windows(height, width, strip_rows)
+
+    Splits a raster of the given size into full-width row strips of `strip_rows` rows (the last one may be shorter). Processing the strips in order keeps the row-major pixel order of the whole raster.
+    """
+    for row_off in range(0, height, strip_rows):
+        yield Window(0, row_off, width, min(strip_rows, height - row_off))
@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# (stage, seconds, pixels) records of the current `recording()` block, or None
+# when nothing is being recorded and `stage()` only costs two clock reads.
+_records: list[tuple[str, float, int]] | None = None
+
+# (model, version, role, seconds, pixels, positives, agreements) records of the
+# current `model_recording()` block, see `record_model()`.
+_model_records: list[tuple] | None = None
+
+
+@contextmanager
+def stage(name: str, pixels: int = 0) -> Iterator[None]:
+    """
+    stage(name: str, pixels: int = 0) -> Iterator[None]
+
+    Times a pipeline stage, such as "decode" or "predict", together with the number of pixels it processed. The time is kept only inside a `recording()` block, so the pipeline can be instrumented unconditionally.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _records is not None:
+            _records.append((name, time.perf_counter() - start, pixels))
+
+
+@contextmanager
+def recording() -> Iterator[list[tuple[str, float, int]]]:
+    """
+    recording() -> Iterator[list[tuple[str, float, int]]]
+
+    Collects the `stage()` timings of the code run inside the block into the yielded list of (stage, seconds, pixels) records. Used by the worker processes to send the timings of a job back with its result.
+    """
+    global _records
+
+    previous, _records = _records, []
+    try:
+        yield _records
+    finally:
+        _records = previous
+
+
+def record_model(
+    model: str,
+    version: str,
+    role: str,
+    seconds: float,
+    pixels: int,
+    positives: int,
+    agreements: int,
+):
+    """
+    record_model(model: str, version: str, role: str, seconds: float, pixels: int, positives: int, agreements: int)
+
+    Records one scoring pass of a model: its role ("served" or "shadow"), the time it took, the number of pixels scored, how many of them were above the model threshold and, for a shadow model, how many got the same decision as the served model. Kept only inside a `model_recording()` block.
+    """
+    if _model_records is not None:
+        _model_records.append(
+            (model, version, role, seconds, pixels, positives, agreements)
+        )
+
+
+@contextmanager
+def model_recording() -> Iterator[list[tuple]]:
+    """
+    model_recording() -> Iterator[list[tuple]]
+
+    Same as `recording()` for the `record_model()` records.
+    """
+    global _model_records
+
+    previous, _model_records = _model_records, []
+    try:
+        yield _model_records
+    finally:
+        _model_records = previous
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator
+
+import rasterio
+from affine import Affine
+from rasterio.io import DatasetReader, MemoryFile
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Classic TIFF and BigTIFF, little- and big-endian.
+TIFF_SIGNATURES = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+TIFF_EXTENSIONS = (".tif", ".tiff")
+
+
+@dataclass
+class RasterSource:
+    """
+    A TIFF image kept either in memory or in an on-disk temporary file, together with the metadata read from its header.
+
+    Instances are cheap to pickle when the image is on disk (only the path is sent), so they can be handed to the worker processes as is. The process that created the source is responsible for calling `close()`, which also removes a temporary file.
+    """
+
+    path: str | None = None
+    data: bytes | None = None
+    height: int = 0
+    width: int = 0
+    count: int = 0
+    transform: Affine = field(default_factory=Affine.identity)
+    crs: str | None = None
+    is_temporary: bool = False
+    _memfile: MemoryFile | None = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RasterSource":
+        return cls(data=data)._read_metadata()
+
+    @classmethod
+    def from_path(cls, path: str, is_temporary: bool = False) -> "RasterSource":
+        return cls(path=path, is_temporary=is_temporary)._read_metadata()
+
+    @classmethod
+    def from_file(cls, file: BinaryIO, spool_bytes: int) -> "RasterSource":
+        """
+        Reads an uploaded image. Images up to `spool_bytes` are kept in memory, larger ones are copied in chunks to a temporary file, so the upload is never held in memory as a whole.
+        """
+        if file_size(file) <= spool_bytes:
+            return cls.from_bytes(file.read())
+
+        with tempfile.NamedTemporaryFile(suffix=".tiff", delete=False) as tmp:
+            shutil.copyfileobj(file, tmp, COPY_CHUNK_SIZE)
+
+        try:
+            return cls.from_path(tmp.name, is_temporary=True)
+        except Exception:
+            os.remove(tmp.name)
+            raise
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.height, self.width
+
+    @contextmanager
+    def open(self) -> Iterator[DatasetReader]:
+        if self.path is not None:
+            with rasterio.open(self.path) as src:
+                yield src
+            return
+
+        # The bytes are copied into GDAL's in-memory filesystem once per
+        # process and every later open reuses that copy.
+        if self._memfile is None:
+            self._memfile = MemoryFile(self.data)
+        with self._memfile.open() as src:
+            yield src
+
+    def close(self):
+        if self._memfile is not None:
+            self._memfile.close()
+            self._memfile = None
+        if self.is_temporary and self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.is_temporary = False
+
+    def __enter__(self) -> "RasterSource":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_memfile"] = None
+        return state
+
+    def _read_metadata(self) -> "RasterSource":
+        with self.open() as src:
+            self.height, self.width = src.height, src.width
+            self.count = src.count
+            self.transform = src.transform
+            self.crs = src.crs.to_string() if src.crs else None
+        return self
+
+
+def is_tiff(file: BinaryIO) -> bool:
+    """
+    Checks the TIFF signature in the first bytes of a seekable file object without reading the rest of it.
+    """
+    file.seek(0)
+    signature = file.read(4)
+    file.seek(0)
+    return signature in TIFF_SIGNATURES
+
+
+def file_size(file: BinaryIO) -> int:
+    size = file.seek(0, os.SEEK_END)
+    file.seek(0)
+    return size
+
+
+def rasters_from_zip(
+    file: BinaryIO, spool_bytes: int, max_bytes: int
+) -> list[tuple[str, RasterSource]]:
+    """
+    Reads the *.tif / *.tiff members of a zip bundle, in archive order, as `RasterSource.from_file()` reads single uploads. Raises ValueError for a member that is not a TIFF image or is larger than `max_bytes` once uncompressed; the images read so far are closed first.
+    """
+    rasters = []
+    try:
+        with zipfile.ZipFile(file) as bundle:
+            for member in bundle.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(
+                    TIFF_EXTENSIONS
+                ):
+                    continue
+
+                if member.file_size > max_bytes:
+                    raise ValueError(
+                        f"{member.filename} is larger than {max_bytes} bytes"
+                    )
+
+                with bundle.open(member) as member_file:
+                    if not is_tiff(member_file):
+                        raise ValueError(f"{member.filename} is not a TIFF image")
+                    rasters.append(
+                        (
+                            member.filename,
+                            RasterSource.from_file(member_file, spool_bytes),
+                        )
+                    )
+    except Exception:
+        for _, raster in rasters:
+            raster.close()
+        raise
+
+    return rasters
+
+
+def open_raster(tiff_image):
+    """
+    open_raster(tiff_image)
+
+    Opens a TIFF image given as a `RasterSource`, raw bytes, a path or a file-like object.
+
+    Returns:
+        A context manager yielding an opened `rasterio.io.DatasetReader`.
+    """
+    if isinstance(tiff_image, RasterSource):
+        return tiff_image.open()
+    if isinstance(tiff_image, (bytes, bytearray, memoryview)):
+        return RasterSource(data=bytes(tiff_image)).open()
+    return rasterio.open(tiff_image)
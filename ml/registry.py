@@ -0,0 +1,268 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+import catboost as cb
+from loguru import logger
+
+from ml.constants import MODEL_PATH, MODELS_PATH, THRESHOLD
+from ml.inference import INFERENCE_BACKENDS, CatBoostBackend, OnnxBackend, export_onnx
+
+_models: dict[tuple[str, int], cb.CatBoostClassifier] = {}
+_backends: dict[tuple[str, int], CatBoostBackend | OnnxBackend] = {}
+_lock = threading.Lock()
+
+# Set per worker process by `configure_inference()`.
+_inference = {"backend": "catboost", "thread_count": 0}
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """
+    A named model version of the model set, see `load_models()`.
+    """
+
+    name: str
+    path: str
+    threshold: float = THRESHOLD
+    weight: float = 0.0
+    shadow: bool = False
+
+
+@dataclass(frozen=True)
+class ScoringPlan:
+    """
+    The model whose predictions a request returns and the shadow models that score the same features alongside it, only to be measured.
+    """
+
+    served: ModelSpec
+    shadows: tuple[ModelSpec, ...] = ()
+
+    @property
+    def models(self) -> tuple[ModelSpec, ...]:
+        return (self.served, *self.shadows)
+
+
+DEFAULT_MODEL = ModelSpec("default", MODEL_PATH)
+
+_model_sets: dict[tuple[str, int], dict[str, ModelSpec]] = {}
+
+# Set per job by `scoring()`.
+_plan = ScoringPlan(DEFAULT_MODEL)
+
+
+def get_model(path: str = MODEL_PATH) -> cb.CatBoostClassifier:
+    """
+    get_model(path: str = MODEL_PATH) -> cb.CatBoostClassifier
+
+    This function returns the CatBoost model stored at `path`, loading it on first use. Loaded models are kept per process and keyed by path and modification time, so replacing the model file makes the next call load the new version without restarting the process.
+
+    Parameters:
+        path (str):
+            The path to the saved CatBoost model.
+
+    Returns:
+        cb.CatBoostClassifier:
+            The loaded model.
+    """
+    key = (path, os.stat(path).st_mtime_ns)
+
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        start = time.perf_counter()
+        model = cb.CatBoostClassifier()
+        model.load_model(path)
+        logger.info(
+            f"loaded model {path} (version {key[1]}) in {time.perf_counter() - start:.3f}s"
+        )
+
+        for stale_key in [k for k in _models if k[0] == path]:
+            del _models[stale_key]
+        _models[key] = model
+
+    return model
+
+
+def configure_inference(backend: str = "catboost", thread_count: int = 0):
+    """
+    Selects the inference backend (one of INFERENCE_BACKENDS) and its thread count (0 for the backend default) that `get_backend()` returns in this process.
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"unknown inference backend {backend!r}")
+
+    with _lock:
+        _inference.update(backend=backend, thread_count=thread_count)
+        _backends.clear()
+
+
+def get_backend(path: str = MODEL_PATH) -> CatBoostBackend | OnnxBackend:
+    """
+    get_backend(path: str = MODEL_PATH) -> CatBoostBackend | OnnxBackend
+
+    This function returns the configured inference backend (see `configure_inference()`) for the model stored at `path`. Like `get_model()`, backends are kept per process and rebuilt when the model file is replaced.
+
+    Parameters:
+        path (str):
+            The path to the saved CatBoost model.
+
+    Returns:
+        CatBoostBackend | OnnxBackend:
+            An object with the `feature_names` of the model and a `predict_proba(features)` method returning the positive class probabilities of a float32 feature matrix.
+
+    Function Workflow:
+        1. The CatBoost model is loaded with `get_model()`.
+        2. For the "onnx" backend, the model is exported next to the model file (`<path>.onnx`) unless an export newer than the model file exists.
+        3. The backend is created with the configured thread count.
+    """
+    model = get_model(path)
+    key = (path, os.stat(path).st_mtime_ns)
+
+    backend = _backends.get(key)
+    if backend is not None:
+        return backend
+
+    with _lock:
+        backend = _backends.get(key)
+        if backend is not None:
+            return backend
+
+        thread_count = _inference["thread_count"]
+        if _inference["backend"] == "onnx":
+            onnx_path = f"{path}.onnx"
+            if not os.path.exists(onnx_path) or os.stat(onnx_path).st_mtime_ns < key[1]:
+                start = time.perf_counter()
+                export_onnx(model, onnx_path)
+                logger.info(
+                    f"exported model {path} to {onnx_path} in "
+                    f"{time.perf_counter() - start:.3f}s"
+                )
+            backend = OnnxBackend(onnx_path, model.feature_names_, thread_count)
+        else:
+            backend = CatBoostBackend(model, thread_count)
+
+        for stale_key in [k for k in _backends if k[0] == path]:
+            del _backends[stale_key]
+        _backends[key] = backend
+
+    return backend
+
+
+def model_version(path: str = MODEL_PATH) -> str:
+    """
+    Returns an identifier of the model file currently stored at `path`. It changes whenever the file is replaced.
+    """
+    return str(os.stat(path).st_mtime_ns)
+
+
+def warm_up(path: str = MODEL_PATH):
+    """
+    Loads the model and its inference backend ahead of the first prediction, e.g. on application startup.
+    """
+    get_backend(path)
+
+
+def load_models(path: str = MODELS_PATH) -> dict[str, ModelSpec]:
+    """
+    load_models(path: str = MODELS_PATH) -> dict[str, ModelSpec]
+
+    This function reads the model set: the model versions served at the same time, e.g. the production model and candidates trained in `ml/notebooks/boost.ipynb`. Like models, the set is kept per process and read again when the file changes, so models are added or re-weighted without a restart.
+
+    Parameters:
+        path (str):
+            A JSON object mapping model names to their settings: the `path` of the saved CatBoost model, its fire probability `threshold` (THRESHOLD by default), its `weight` in the traffic split (0 by default: served only on request) and whether it is a `shadow` model scored with every request it does not serve. Without the file the set is the single "default" model at MODEL_PATH.
+
+    Returns:
+        dict[str, ModelSpec]:
+            The models by name, in file order.
+
+    Raises:
+        ValueError: If the file defines no models or invalid settings.
+    """
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return {DEFAULT_MODEL.name: DEFAULT_MODEL}
+
+    models = _model_sets.get(key)
+    if models is not None:
+        return models
+
+    with open(path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    if not isinstance(manifest, dict) or not manifest:
+        raise ValueError(f"{path} must map model names to their settings")
+
+    models = {}
+    for name, settings in manifest.items():
+        try:
+            spec = ModelSpec(name=name, **settings)
+        except TypeError as e:
+            raise ValueError(f"invalid settings of model {name!r}: {e}")
+        if not 0.0 <= spec.threshold <= 1.0 or spec.weight < 0:
+            raise ValueError(f"invalid threshold or weight of model {name!r}")
+        models[name] = spec
+
+    with _lock:
+        for stale_key in [k for k in _model_sets if k[0] == path]:
+            del _model_sets[stale_key]
+        _model_sets[key] = models
+
+    return models
+
+
+def plan_models(
+    models: dict[str, ModelSpec], name: str | None = None, rng=random
+) -> ScoringPlan:
+    """
+    plan_models(models: dict[str, ModelSpec], name: str | None = None, rng=random) -> ScoringPlan
+
+    Picks the model that serves a request: the model called `name` if given, otherwise a model drawn in proportion to the weights, or the first model when no model has a weight. Every other shadow model of the set scores along.
+
+    Raises:
+        ValueError: If there is no model called `name`.
+    """
+    if name is not None:
+        if name not in models:
+            raise ValueError(f"unknown model {name!r}")
+        served = models[name]
+    else:
+        weighted = [spec for spec in models.values() if spec.weight > 0]
+        if weighted:
+            served = rng.choices(weighted, [spec.weight for spec in weighted])[0]
+        else:
+            served = next(iter(models.values()))
+
+    shadows = tuple(
+        spec for spec in models.values() if spec.shadow and spec.name != served.name
+    )
+    return ScoringPlan(served, shadows)
+
+
+@contextmanager
+def scoring(plan: ScoringPlan) -> Iterator[ScoringPlan]:
+    """
+    Makes `plan` the models that `predict_fire_proba()` scores with inside the block. Used by the worker processes to run a job with the plan of its request.
+    """
+    global _plan
+
+    previous, _plan = _plan, plan
+    try:
+        yield plan
+    finally:
+        _plan = previous
+
+
+def current_plan() -> ScoringPlan:
+    return _plan
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def dilate_blocks(candidates: np.ndarray, radius: int = 1) -> np.ndarray:
+    """
+    dilate_blocks(candidates: np.ndarray, radius: int = 1) -> np.ndarray
+
+    This function grows a boolean block grid by `radius` blocks in every direction (including diagonals), so that fires lying on the edge of a block that passed the screening are still covered by the second stage.
+
+    Parameters:
+        candidates (np.ndarray):
+            A 2D boolean array, True for the blocks that passed the screening.
+        radius (int):
+            The number of neighbouring blocks to add around each candidate.
+
+    Returns:
+        np.ndarray:
+            A boolean array of the same shape.
+    """
+    if radius <= 0:
+        return candidates.copy()
+
+    height, width = candidates.shape
+    padded = np.pad(candidates, radius)
+    dilated = np.zeros_like(candidates)
+
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            dilated |= padded[dy : dy + height, dx : dx + width]
+
+    return dilated
+
+
+def expand_blocks(
+    candidates: np.ndarray, block_size: int, shape: tuple[int, int]
+) -> np.ndarray:
+    """
+    expand_blocks(candidates: np.ndarray, block_size: int, shape: tuple[int, int]) -> np.ndarray
+
+    Turns a block grid into a pixel mask of the given shape; blocks on the right and bottom edges are clipped to the raster.
+    """
+    pixels = np.repeat(np.repeat(candidates, block_size, axis=0), block_size, axis=1)
+    return pixels[: shape[0], : shape[1]]
+
+
+def screened_fraction(
+    candidates: np.ndarray, block_size: int, shape: tuple[int, int]
+) -> float:
+    """
+    screened_fraction(candidates: np.ndarray, block_size: int, shape: tuple[int, int]) -> float
+
+    Returns the fraction of the raster pixels that lie outside the candidate blocks, i.e. the share of the scene the second stage skips.
+    """
+    height, width = shape
+    block_rows = np.minimum(
+        block_size, height - np.arange(candidates.shape[0]) * block_size
+    )
+    block_cols = np.minimum(
+        block_size, width - np.arange(candidates.shape[1]) * block_size
+    )
+
+    kept = block_rows @ candidates.astype(np.int64) @ block_cols
+    return 1.0 - kept / (height * width)
@@ -1,12 +1,19 @@
 import numpy as np
 import rasterio
+from rasterio.crs import CRS
+from rasterio.warp import transform as warp_transform
 
+from ml.constants import ENTROPY_BINS, ENTROPY_WINDOW
 
-def calculate_additional_features(red, green, blue, nir):
+WGS84 = CRS.from_epsg(4326)
+SPECTRAL_INDICES = ("ndvi", "evi", "savi", "ndwi", "sr", "gndvi")
+
+
+def calculate_additional_features(red, green, blue, nir, out=None):
     """
-    calculate_additional_features(red, green, blue, nir)
+    calculate_additional_features(red, green, blue, nir, out=None)
 
-    This function calculates various vegetation and water indices, as well as texture features, from multi-spectral image data. These indices are useful in remote sensing applications for analyzing vegetation health, water content, and other environmental features.
+    This function calculates various vegetation and water indices from multi-spectral image data. These indices are useful in remote sensing applications for analyzing vegetation health, water content, and other environmental features.
 
     Parameters:
         red (np.array):
@@ -17,50 +24,262 @@ def calculate_additional_features(red, green, blue, nir):
             The blue band data from the image.
         nir (np.array):
             The near-infrared (NIR) band data from the image.
+        out (np.array):
+            An optional float32 buffer of shape (6, *red.shape) to write the indices into, e.g. reused across the tiles of one scene. A new buffer is allocated if omitted.
 
     Returns:
         tuple:
-            A tuple of calculated indices and features, including:
+            A tuple of float32 views into `out`, in the order of `SPECTRAL_INDICES`:
             - NDVI (Normalized Difference Vegetation Index)
             - EVI (Enhanced Vegetation Index)
             - SAVI (Soil Adjusted Vegetation Index)
             - NDWI (Normalized Difference Water Index)
             - SR (Simple Ratio)
             - GNDVI (Green Normalized Difference Vegetation Index)
-            - entropy_red (Texture feature based on local entropy for the red band)
-            - entropy_nir (Texture feature based on local entropy for the NIR band)
+
+    Function Workflow:
+        1. The bands are cast to float32 once. The band differences, the SAVI denominator `nir + red` and `6 * red` in EVI are taken in the input dtype first, so integer bands keep the wrap-around arithmetic the model was trained with. The other sums start from a float constant and never wrapped.
+        2. The shared subexpressions `nir - red` and `nir + red` are computed once.
+        3. Every index is evaluated in place into its slice of `out`, with two scratch arrays for the remaining temporaries.
+    """
+    if out is None:
+        out = np.empty((len(SPECTRAL_INDICES),) + red.shape, dtype=np.float32)
+
+    ndvi, evi, savi, ndwi, sr, gndvi = out
+
+    red32 = _as_float32(red)
+    nir32 = _as_float32(nir)
+    nir_minus_red = _as_float32(nir - red)
+    nir_plus_red = np.add(nir32, red32)
+    scratch = np.empty_like(nir_plus_red)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # NDVI = (nir - red) / (1e-3 + nir + red)
+        np.add(nir_plus_red, 1e-3, out=ndvi)
+        np.divide(nir_minus_red, ndvi, out=ndvi)
+
+        # SAVI = (nir - red) / (nir + red + 0.5) * 1.5
+        np.add(_as_float32(nir + red), 0.5, out=savi)
+        np.divide(nir_minus_red, savi, out=savi)
+        np.multiply(savi, 1.5, out=savi)
+
+        # EVI = 2.5 * (nir - red) / (1e-3 + nir + 6 * red - 7.5 * blue + 1)
+        # The constants are folded and added last: for integer bands the rest
+        # of the denominator is exact in float32 and cannot cancel them out.
+        np.add(nir32, _as_float32(6 * red), out=evi)
+        np.multiply(_as_float32(blue), 7.5, out=scratch)
+        np.subtract(evi, scratch, out=evi)
+        np.add(evi, 1 + 1e-3, out=evi)
+        np.multiply(nir_minus_red, 2.5, out=scratch)
+        np.divide(scratch, evi, out=evi)
+
+        # SR = nir / (1e-3 + red)
+        np.add(red32, 1e-3, out=sr)
+        np.divide(nir32, sr, out=sr)
+
+        # The NIR/red temporaries are no longer needed, reuse them for green.
+        green32 = _as_float32(green)
+        np.add(green32, nir32, out=nir_plus_red)
+        np.add(nir_plus_red, 1e-3, out=nir_plus_red)
+
+        # NDWI = (green - nir) / (1e-3 + green + nir)
+        np.divide(_as_float32(green - nir), nir_plus_red, out=ndwi)
+
+        # GNDVI = (nir - green) / (1e-3 + nir + green)
+        np.divide(_as_float32(nir - green), nir_plus_red, out=gndvi)
+
+    return ndvi, evi, savi, ndwi, sr, gndvi
+
+
+def _as_float32(values):
+    return np.asarray(values).astype(np.float32, copy=False)
+
+
+def local_entropy(
+    band, size=ENTROPY_WINDOW, bins=ENTROPY_BINS, value_range=None, strip_rows=256
+):
     """
-    # Existing NDVI calculation
-    ndvi = (nir - red) / (1e-3 + nir + red)
+    local_entropy(band, size=ENTROPY_WINDOW, bins=ENTROPY_BINS, value_range=None, strip_rows=256)
 
-    # Enhanced Vegetation Index (EVI)
-    evi = 2.5 * (nir - red) / (1e-3 + nir + 6 * red - 7.5 * blue + 1)
+    This function calculates the local entropy texture feature: the Shannon entropy (in bits) of the histogram of the `size` x `size` neighbourhood of every pixel. It replaces `generic_filter(band, entropy, size=5)`, which called a Python function for every pixel.
 
-    # Soil Adjusted Vegetation Index (SAVI)
-    savi = ((nir - red) / (nir + red + 0.5)) * 1.5
+    Parameters:
+        band (np.array):
+            The 2D band data.
+        size (int):
+            The side of the square neighbourhood. Pixels outside the band are mirrored, as in `generic_filter()`.
+        bins (int):
+            The number of histogram bins, at most 255.
+        value_range (tuple[float, float]):
+            The (min, max) range split into the bins. Values outside are put in the first or last bin. The band's own range is used if omitted; pass the range of the whole image when computing the feature tile by tile, so that every tile uses the same bins.
+        strip_rows (int):
+            The number of output rows computed at once, which bounds the scratch memory.
+
+    Returns:
+        np.array:
+            A float32 array of the same shape as `band`.
+
+    Function Workflow:
+        1. The band is quantized once into `bins` uint8 levels and padded by mirroring.
+        2. For every strip of rows and every bin present in it, the per-bin counts of all neighbourhoods are computed by summing `size` shifted rows and then `size` shifted columns of the bin's indicator array.
+        3. The entropy is accumulated as log2(n) - sum(c * log2(c)) / n over the bins, with the c * log2(c) terms of three bins looked up at once in a table indexed by their packed counts.
+    """
+    band = np.asarray(band)
+    height, width = band.shape
+    radius = size // 2
+    n = size * size
+
+    quantized = _quantize(band, bins, value_range)
+    padded = np.pad(quantized, radius, mode="symmetric")
+
+    # c * log2(c) of three bins at once, indexed by their counts packed in base n + 1.
+    counts = np.arange(n + 1, dtype=np.float64)
+    plogp = counts * np.log2(np.maximum(counts, 1))
+    plogp3 = np.add.outer(np.add.outer(plogp, plogp), plogp).astype(np.float32).ravel()
+    packed_dtype = np.uint16 if plogp3.size <= 2**16 else np.uint32
+
+    entropy = np.empty((height, width), dtype=np.float32)
+
+    for start in range(0, height, strip_rows):
+        stop = min(start + strip_rows, height)
+        block = padded[start : stop + 2 * radius]
+        acc = np.zeros((stop - start, width), dtype=np.float32)
 
-    # Normalized Difference Water Index (NDWI)
-    ndwi = (green - nir) / (1e-3 + green + nir)
+        levels = np.flatnonzero(np.bincount(block.ravel(), minlength=bins))
+        for group in range(0, len(levels), 3):
+            packed = np.zeros((stop - start, width), dtype=packed_dtype)
+            for level in levels[group : group + 3]:
+                packed *= n + 1
+                packed += _window_counts(block == level, size, stop - start, width)
+            # Missing bins of the last group are zero counts in the lowest digits.
+            packed *= (n + 1) ** (3 - len(levels[group : group + 3]))
 
-    # Simple Ratio (SR)
-    sr = nir / (1e-3 + red)
+            acc += plogp3.take(packed)
 
-    # Green Normalized Difference Vegetation Index (GNDVI)
-    gndvi = (nir - green) / (1e-3 + nir + green)
+        entropy[start:stop] = np.log2(n) - acc / n
 
-    # Texture features (example: local entropy)
-    def entropy(values):
-        values = values.flatten()
-        h, _ = np.histogram(values, bins=20)
-        h = h / h.sum()
-        return -np.sum(h * np.log2(h + (h == 0)))
+    return entropy
 
-    entropy_red = 0  # generic_filter(red, entropy, size=5)
-    entropy_nir = 0  # generic_filter(nir, entropy, size=5)
 
-    return ndvi, evi, savi, ndwi, sr, gndvi, entropy_red, entropy_nir
+def _window_counts(indicator, size, height, width):
+    indicator = indicator.view(np.uint8)
+
+    rows = indicator[:height].copy()
+    for i in range(1, size):
+        rows += indicator[i : i + height]
+
+    counts = rows[:, :width].copy()
+    for j in range(1, size):
+        counts += rows[:, j : j + width]
+
+    return counts
+
+
+def _quantize(band, bins, value_range=None):
+    if value_range is None:
+        value_range = (np.nanmin(band), np.nanmax(band))
+    low, high = (float(value) for value in value_range)
+
+    scale = bins / (high - low) if high > low else 0.0
+    levels = np.nan_to_num((band.astype(np.float32) - low) * scale)
+
+    return np.clip(levels, 0, bins - 1).astype(np.uint8)
 
 
 def pixel_to_coord(row, col, transform):
     x, y = rasterio.transform.xy(transform, row, col)
     return x, y
+
+
+def pixels_to_coords(rows, cols, transform):
+    """
+    pixels_to_coords(rows, cols, transform)
+
+    Vectorized counterpart of `pixel_to_coord`. Converts whole arrays of pixel indices to coordinates with a single batched affine transform.
+
+    Parameters:
+        rows (np.array):
+            Pixel row indices.
+        cols (np.array):
+            Pixel column indices, the same length as `rows`.
+        transform (affine.Affine):
+            The affine transform of the raster.
+
+    Returns:
+        np.array:
+            A float64 array of shape (N, 2) with the x and y coordinates of the pixel centers.
+    """
+    coords = np.empty((len(rows), 2), dtype=np.float64)
+    if len(rows) == 0:
+        return coords
+
+    xs, ys = rasterio.transform.xy(transform, rows, cols)
+    coords[:, 0] = xs
+    coords[:, 1] = ys
+    return coords
+
+
+def extract_fire_coords(pred_proba, transform, threshold):
+    """
+    extract_fire_coords(pred_proba, transform, threshold)
+
+    Finds every pixel of the probability raster above `threshold` in one step and converts the pixel indices to coordinates in one batch.
+
+    Parameters:
+        pred_proba (np.array):
+            A 2D array with the fire probability of every pixel.
+        transform (affine.Affine):
+            The affine transform of the raster.
+        threshold (float):
+            Pixels with a probability strictly greater than this value are reported.
+
+    Returns:
+        np.array:
+            A float64 array of shape (N, 2) with the x and y coordinates of the fire pixels, in row-major pixel order.
+    """
+    rows, cols = np.nonzero(pred_proba > threshold)
+    return pixels_to_coords(rows, cols, transform)
+
+
+def extract_fire_detections(pred_proba, transform, threshold):
+    """
+    extract_fire_detections(pred_proba, transform, threshold)
+
+    Same as `extract_fire_coords`, but also keeps the probability of every selected pixel.
+
+    Returns:
+        np.array:
+            A float64 array of shape (N, 3) with the x and y coordinates and the fire probability of the fire pixels, in row-major pixel order.
+    """
+    rows, cols = np.nonzero(pred_proba > threshold)
+
+    detections = np.empty((len(rows), 3), dtype=np.float64)
+    detections[:, :2] = pixels_to_coords(rows, cols, transform)
+    detections[:, 2] = pred_proba[rows, cols]
+    return detections
+
+
+def coords_to_wgs84(coords, crs):
+    """
+    coords_to_wgs84(coords, crs)
+
+    Reprojects an (N, 2) or wider coordinate array from `crs` to WGS84 longitude/latitude in one batch transform.
+
+    Parameters:
+        coords (np.array):
+            An array whose first two columns are x and y in `crs`.
+        crs (str | rasterio.crs.CRS | None):
+            The source coordinate reference system. If None or already EPSG:4326, the coordinates are returned unchanged.
+
+    Returns:
+        np.array:
+            A float64 array of shape (N, 2) with longitude and latitude.
+    """
+    lonlat = np.array(coords[:, :2], dtype=np.float64)
+    if crs is None or len(lonlat) == 0 or CRS.from_user_input(crs) == WGS84:
+        return lonlat
+
+    lon, lat = warp_transform(crs, WGS84, lonlat[:, 0], lonlat[:, 1])
+    lonlat[:, 0] = lon
+    lonlat[:, 1] = lat
+    return lonlat
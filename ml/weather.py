@@ -0,0 +1,215 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from ml.constants import CSV_TAIL_ROWS, WEATHER_WINDOWS
+
+AGGREGATIONS = ("mean", "min", "max", "sum", "trend")
+
+# Bytes before the processed end of a history that must be unchanged for an
+# upload to count as an append to it.
+APPEND_CHECK_BYTES = 256
+
+
+def read_csv_tail(file, rows=CSV_TAIL_ROWS, block_size=64 * 1024):
+    """
+    read_csv_tail(file, rows=CSV_TAIL_ROWS, block_size=64 * 1024)
+
+    This function parses only the header and the last `rows` data rows of a CSV file, reading the file backwards in blocks from its end. This is all the row count windows of `process_csv()` look at, so long weather histories never have to be decoded or held in memory as a whole.
+
+    Parameters:
+        file (BinaryIO):
+            A seekable binary file object with UTF-8 encoded CSV data. Rows must not contain quoted line breaks.
+        rows (int):
+            The number of data rows to keep from the end of the file.
+        block_size (int):
+            The number of bytes read per step.
+
+    Returns:
+        pd.DataFrame:
+            The header and the last `rows` non-empty rows of the file, parsed with `pd.read_csv`.
+    """
+    file.seek(0)
+    header = file.readline()
+    header_end = file.tell()
+    position = file.seek(0, os.SEEK_END)
+
+    tail = b""
+    while True:
+        lines = tail.split(b"\n")
+        # The first line is incomplete until the block before it has been read.
+        complete = lines[1:] if position > header_end else lines
+        data_lines = [line for line in complete if line.strip()]
+
+        if len(data_lines) >= rows or position <= header_end:
+            break
+
+        step = min(block_size, position - header_end)
+        position -= step
+        file.seek(position)
+        tail = file.read(step) + tail
+
+    file.seek(0)
+    body = b"\n".join(data_lines[-rows:] if rows else [])
+    return pd.read_csv(io.BytesIO(header + body), encoding="utf-8")
+
+
+def parse_window(window: int | str) -> int | pd.Timedelta:
+    """
+    A window is either a number of rows or a duration such as "24h" or "7d", which covers the rows whose timestamp is less than the duration before the newest timestamp.
+    """
+    if isinstance(window, int):
+        return window
+    return pd.Timedelta(window)
+
+
+def weather_features(history: pd.DataFrame, windows=WEATHER_WINDOWS) -> pd.Series:
+    """
+    weather_features(history: pd.DataFrame, windows=WEATHER_WINDOWS) -> pd.Series
+
+    This function aggregates a weather history into scene-level features, one value per weather column, window and aggregation.
+
+    Parameters:
+        history (pd.DataFrame):
+            The weather rows in chronological order. The first column holds the timestamps, the remaining columns the weather values.
+        windows (tuple[tuple[int | str, str, str], ...]):
+            (window, aggregation, name) triples. The window is a row count or a duration (see `parse_window()`), the aggregation one of AGGREGATIONS and the name a format string of the output column with a `{column}` field. "trend" is the least squares slope per day.
+
+    Returns:
+        pd.Series:
+            The features, indexed by name. Windows without values give NaN.
+
+    Function Workflow:
+        1. The timestamps are parsed once; rows with unparsable timestamps only take part in row count windows.
+        2. For every window, the rows it covers are selected with a slice (row counts) or a mask relative to the newest timestamp (durations).
+        3. Each aggregation is computed over all weather columns at once, ignoring missing values.
+    """
+    values = history.iloc[:, 1:].apply(pd.to_numeric, errors="coerce")
+    times = pd.to_datetime(history.iloc[:, 0], errors="coerce")
+    columns = list(values.columns)
+    data = values.to_numpy(dtype=np.float64)
+    days = (times - times.min()).dt.total_seconds().to_numpy() / 86400.0
+
+    features = {}
+    for window, aggregation, name in windows:
+        window = parse_window(window)
+        if isinstance(window, int):
+            rows = slice(max(len(data) - window, 0), None) if window else slice(0, 0)
+        else:
+            rows = (times > times.max() - window).to_numpy()
+
+        result = _aggregate(data[rows], days[rows], aggregation)
+        for column, value in zip(columns, result):
+            features[name.format(column=column)] = value
+
+    return pd.Series(features, dtype=np.float64)
+
+
+def _aggregate(data: np.ndarray, days: np.ndarray, aggregation: str) -> np.ndarray:
+    valid = ~np.isnan(data)
+    counts = valid.sum(axis=0)
+    empty = counts == 0
+    filled = np.where(valid, data, 0.0)
+
+    if aggregation == "mean":
+        result = filled.sum(axis=0) / np.maximum(counts, 1)
+    elif aggregation == "sum":
+        result = filled.sum(axis=0)
+    elif aggregation == "min":
+        result = np.where(valid, data, np.inf).min(axis=0, initial=np.inf)
+    elif aggregation == "max":
+        result = np.where(valid, data, -np.inf).max(axis=0, initial=-np.inf)
+    elif aggregation == "trend":
+        valid &= ~np.isnan(days)[:, None]
+        counts = valid.sum(axis=0)
+        t = np.where(valid, np.nan_to_num(days)[:, None], 0.0)
+        filled = np.where(valid, data, 0.0)
+        n = np.maximum(counts, 1)
+        t_centered = np.where(valid, t - t.sum(axis=0) / n, 0.0)
+        y_centered = np.where(valid, filled - filled.sum(axis=0) / n, 0.0)
+        spread = (t_centered**2).sum(axis=0)
+        result = (t_centered * y_centered).sum(axis=0) / np.where(spread > 0, spread, 1)
+        # A slope needs two distinct timestamps.
+        empty = spread == 0
+    else:
+        raise ValueError(f"unknown aggregation {aggregation!r}")
+
+    return np.where(empty, np.nan, result)
+
+
+def history_span(windows=WEATHER_WINDOWS) -> tuple[int, pd.Timedelta]:
+    """
+    The largest row count and the longest duration of `windows`: the rows a weather history has to keep to compute them.
+    """
+    rows = [window for window, _, _ in windows if isinstance(window, int)]
+    durations = [parse_window(w) for w, _, _ in windows if not isinstance(w, int)]
+    return max(rows, default=0), max(durations, default=pd.Timedelta(0))
+
+
+class WeatherHistory:
+    """
+    The tail of an append-only station CSV that `windows` can reach, kept between requests.
+
+    `update()` parses only the bytes appended since the previous update when the file still ends with the same bytes at the previous end position; any other change makes it parse the whole file again.
+    """
+
+    def __init__(self, windows=WEATHER_WINDOWS):
+        self.rows, self.duration = history_span(windows)
+        self.header = b""
+        self.offset = 0
+        self.check = b""
+        self.frame: pd.DataFrame | None = None
+
+    def update(self, file) -> bool:
+        """
+        Brings the history up to date with the seekable binary `file`. Returns True when only the appended rows had to be parsed.
+        """
+        size = file.seek(0, os.SEEK_END)
+
+        appended = self.frame is not None and self._is_append(file, size)
+        if appended:
+            file.seek(self.offset)
+            body = file.read()
+            if body.strip():
+                # Empty lines, e.g. the newline completing the last row, are
+                # skipped by read_csv.
+                rows = pd.read_csv(io.BytesIO(self.header + body), encoding="utf-8")
+                self.frame = pd.concat([self.frame, rows], ignore_index=True)
+        else:
+            file.seek(0)
+            self.header = file.readline()
+            if self.duration > pd.Timedelta(0):
+                file.seek(0)
+                self.frame = pd.read_csv(file, encoding="utf-8")
+            else:
+                # Row count windows only need the last rows of the file.
+                self.frame = read_csv_tail(file, self.rows)
+
+        self.offset = size
+        file.seek(max(size - APPEND_CHECK_BYTES, 0))
+        self.check = file.read(APPEND_CHECK_BYTES)
+        file.seek(0)
+
+        self._trim()
+        return appended
+
+    def _is_append(self, file, size: int) -> bool:
+        if size < self.offset:
+            return False
+        file.seek(0)
+        if file.readline() != self.header:
+            return False
+        file.seek(self.offset - len(self.check))
+        return file.read(len(self.check)) == self.check
+
+    def _trim(self):
+        keep = len(self.frame) - self.rows
+        if self.duration > pd.Timedelta(0):
+            times = pd.to_datetime(self.frame.iloc[:, 0], errors="coerce")
+            recent = np.flatnonzero((times > times.max() - self.duration).to_numpy())
+            if len(recent):
+                keep = min(keep, recent[0])
+        if keep > 0:
+            self.frame = self.frame.iloc[keep:].reset_index(drop=True)
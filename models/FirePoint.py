@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
+
+from models.BaseModel import EntityMeta
+
+# Side of a spatial index cell in degrees, about 5.5 km of latitude.
+GRID_CELL_DEGREES = 0.05
+GRID_COLUMNS = round(360 / GRID_CELL_DEGREES)
+
+# Above this many cell rows a bbox query filters on lon/lat only.
+MAX_GRID_RANGES = 256
+
+
+class FirePoint(EntityMeta):
+    __tablename__ = "fire_points"
+
+    # SQLite only autoincrements an INTEGER primary key.
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    scene_id = Column(
+        String(36), ForeignKey("scenes.id", ondelete="CASCADE"), nullable=False
+    )
+    lon = Column(Float, nullable=False)
+    lat = Column(Float, nullable=False)
+    probability = Column(Float, nullable=False)
+    cell = Column(BigInteger, nullable=False)
+    detected_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_fire_points_cell_detected_at", "cell", "detected_at"),
+        Index("ix_fire_points_scene_id", "scene_id"),
+    )
+
+    def normalize(self) -> dict:
+        return {
+            "id": self.id,
+            "scene_id": self.scene_id,
+            "lon": self.lon,
+            "lat": self.lat,
+            "probability": self.probability,
+            "detected_at": self.detected_at,
+        }
+
+
+def grid_cells(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """
+    Row-major index of the GRID_CELL_DEGREES cell containing each point.
+    Cells of one grid row are consecutive, so a bbox maps to one integer
+    range per row.
+    """
+    rows = np.floor((np.asarray(lat) + 90) / GRID_CELL_DEGREES).astype(np.int64)
+    cols = np.floor((np.asarray(lon) + 180) / GRID_CELL_DEGREES).astype(np.int64)
+    return rows * GRID_COLUMNS + np.clip(cols, 0, GRID_COLUMNS - 1)
+
+
+def grid_cell_ranges(
+    min_lon: float, min_lat: float, max_lon: float, max_lat: float
+) -> list[tuple[int, int]] | None:
+    """
+    The inclusive cell index ranges covering a bbox, or None if the bbox
+    spans more than MAX_GRID_RANGES cell rows.
+    """
+    first_row = math.floor((min_lat + 90) / GRID_CELL_DEGREES)
+    last_row = math.floor((max_lat + 90) / GRID_CELL_DEGREES)
+    if last_row - first_row + 1 > MAX_GRID_RANGES:
+        return None
+
+    first_col = max(0, math.floor((min_lon + 180) / GRID_CELL_DEGREES))
+    last_col = min(GRID_COLUMNS - 1, math.floor((max_lon + 180) / GRID_CELL_DEGREES))
+    return [
+        (row * GRID_COLUMNS + first_col, row * GRID_COLUMNS + last_col)
+        for row in range(first_row, last_row + 1)
+    ]
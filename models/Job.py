@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, String, Text
+
+from models.BaseModel import EntityMeta
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+UNFINISHED_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+FINISHED_JOB_STATUSES = (JOB_DONE, JOB_FAILED)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Job(EntityMeta):
+    __tablename__ = "jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, default=JOB_QUEUED, index=True)
+    params = Column(JSON, nullable=False, default=dict)
+    input_dir = Column(Text, nullable=False)
+    result_path = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    tiles_total = Column(Integer, nullable=False, default=0)
+    tiles_done = Column(Integer, nullable=False, default=0)
+    progress = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=_now)
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, default=_now, onupdate=_now
+    )
+
+    def normalize(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "error": self.error,
+            "tiles_total": self.tiles_total,
+            "tiles_done": self.tiles_done,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
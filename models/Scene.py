@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, String
+
+from models.BaseModel import EntityMeta
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Scene(EntityMeta):
+    __tablename__ = "scenes"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    content_hash = Column(String(64), nullable=False, unique=True)
+    model_version = Column(String(64), nullable=False)
+    threshold = Column(Float, nullable=False)
+    crs = Column(String, nullable=True)
+    bounds = Column(JSON, nullable=False)
+    point_count = Column(Integer, nullable=False, default=0)
+    acquired_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=_now)
+
+    def normalize(self) -> dict:
+        return {
+            "id": self.id,
+            "model_version": self.model_version,
+            "threshold": self.threshold,
+            "crs": self.crs,
+            "bounds": self.bounds,
+            "point_count": self.point_count,
+            "acquired_at": self.acquired_at,
+            "created_at": self.created_at,
+        }
@@ -0,0 +1,133 @@
+from datetime import datetime
+
+import numpy as np
+from fastapi import Depends
+from sqlalchemy import and_, insert, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from configs.Database import get_db_connection
+from models.FirePoint import FirePoint, grid_cell_ranges, grid_cells
+from models.Scene import Scene
+
+INSERT_BATCH_SIZE = 10000
+
+FIRE_POINT_COLUMNS = ("scene_id", "lon", "lat", "probability", "cell", "detected_at")
+
+
+class FirePointRepository:
+    def __init__(self, db: AsyncSession = Depends(get_db_connection)):
+        self.db = db
+
+    async def get_scene(self, scene_id: str) -> Scene | None:
+        return await self.db.get(Scene, scene_id)
+
+    async def get_scene_by_hash(self, content_hash: str) -> Scene | None:
+        result = await self.db.execute(
+            select(Scene).where(Scene.content_hash == content_hash)
+        )
+        return result.scalar_one_or_none()
+
+    async def create_scene(
+        self, scene: Scene, lonlat: np.ndarray, probability: np.ndarray
+    ) -> Scene:
+        """
+        Stores a scene and its detections in one transaction. The points
+        are written with COPY on Postgres and with batched executemany
+        inserts elsewhere, never one row at a time. If the same scene was
+        stored meanwhile by another request, that scene is returned.
+        """
+        try:
+            await self._insert_scene(scene, lonlat, probability)
+        except IntegrityError:
+            await self.db.rollback()
+            existing = await self.get_scene_by_hash(scene.content_hash)
+            if existing is None:
+                raise
+            return existing
+
+        await self.db.refresh(scene)
+        return scene
+
+    async def _insert_scene(
+        self, scene: Scene, lonlat: np.ndarray, probability: np.ndarray
+    ):
+        scene.point_count = len(lonlat)
+        self.db.add(scene)
+        await self.db.flush()
+
+        cells = grid_cells(lonlat[:, 0], lonlat[:, 1])
+        records = list(
+            zip(
+                [scene.id] * len(lonlat),
+                lonlat[:, 0].tolist(),
+                lonlat[:, 1].tolist(),
+                probability.tolist(),
+                cells.tolist(),
+                [scene.acquired_at] * len(lonlat),
+            )
+        )
+
+        if self.db.bind.dialect.name == "postgresql":
+            await self._copy_points(records)
+        else:
+            for start in range(0, len(records), INSERT_BATCH_SIZE):
+                await self.db.execute(
+                    insert(FirePoint),
+                    [
+                        dict(zip(FIRE_POINT_COLUMNS, record))
+                        for record in records[start : start + INSERT_BATCH_SIZE]
+                    ],
+                )
+
+        await self.db.commit()
+
+    async def find_points(
+        self,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        start: datetime | None,
+        end: datetime | None,
+        after: tuple[datetime, int] | None,
+        limit: int,
+    ) -> list[FirePoint]:
+        # Pages are ordered by (detected_at, id) and `after` is the key of the
+        # last point of the previous page.
+        conditions = [
+            FirePoint.lon.between(min_lon, max_lon),
+            FirePoint.lat.between(min_lat, max_lat),
+        ]
+
+        cell_ranges = grid_cell_ranges(min_lon, min_lat, max_lon, max_lat)
+        if cell_ranges is not None:
+            conditions.append(
+                or_(
+                    *(
+                        FirePoint.cell.between(first, last)
+                        for first, last in cell_ranges
+                    )
+                )
+            )
+        if start is not None:
+            conditions.append(FirePoint.detected_at >= start)
+        if end is not None:
+            conditions.append(FirePoint.detected_at < end)
+        if after is not None:
+            conditions.append(tuple_(FirePoint.detected_at, FirePoint.id) > after)
+
+        result = await self.db.execute(
+            select(FirePoint)
+            .where(and_(*conditions))
+            .order_by(FirePoint.detected_at, FirePoint.id)
+            .limit(limit)
+        )
+        return list(result.scalars())
+
+    async def _copy_points(self, records: list[tuple]):
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            FirePoint.__tablename__, records=records, columns=FIRE_POINT_COLUMNS
+        )
@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import Sequence
+
+from fastapi import Depends
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from configs.Database import get_db_connection
+from models.Job import (
+    FINISHED_JOB_STATUSES,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    Job,
+)
+
+
+class JobRepository:
+    def __init__(self, db: AsyncSession = Depends(get_db_connection)):
+        self.db = db
+
+    async def create(self, job: Job) -> Job:
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get(self, job_id: str) -> Job | None:
+        return await self.db.get(Job, job_id)
+
+    async def update(self, job_id: str, **values):
+        await self.db.execute(update(Job).where(Job.id == job_id).values(**values))
+        await self.db.commit()
+
+    async def claim(self, job_id: str) -> bool:
+        # Moves a queued job to running. Only one of several workers that got
+        # the same job id from the queue claims it.
+        result = await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JOB_QUEUED)
+            .values(status=JOB_RUNNING, tiles_done=0, progress=0.0)
+        )
+        await self.db.commit()
+        return result.rowcount == 1
+
+    async def requeue_running(self):
+        await self.db.execute(
+            update(Job).where(Job.status == JOB_RUNNING).values(status=JOB_QUEUED)
+        )
+        await self.db.commit()
+
+    async def delete(self, job_id: str):
+        await self.db.execute(delete(Job).where(Job.id == job_id))
+        await self.db.commit()
+
+    async def list_finished_before(self, cutoff: datetime) -> list[Job]:
+        result = await self.db.execute(
+            select(Job).where(
+                Job.status.in_(FINISHED_JOB_STATUSES), Job.updated_at < cutoff
+            )
+        )
+        return list(result.scalars())
+
+    async def list_by_status(self, statuses: Sequence[str]) -> list[Job]:
+        result = await self.db.execute(
+            select(Job).where(Job.status.in_(statuses)).order_by(Job.created_at)
+        )
+        return list(result.scalars())
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from services.history import HistoryService
+
+router = APIRouter(prefix="/api/v1/ml/history", tags=["history"])
+
+
+@router.get(
+    "/fire_points",
+    summary="сохраненные точки пожаров в bbox за период",
+    response_model=dict,
+)
+async def get_fire_points(
+    min_lon: float = Query(..., ge=-180, le=180),
+    min_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    start: datetime | None = Query(None, description="начало периода (включительно)"),
+    end: datetime | None = Query(None, description="конец периода (не включительно)"),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    limit: int = Query(1000, ge=1, le=10000),
+    history_service: HistoryService = Depends(),
+):
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="Invalid bbox.")
+
+    return await history_service.find_points(
+        (min_lon, min_lat, max_lon, max_lat), start, end, cursor, limit
+    )
+
+
+@router.get(
+    "/scenes/{scene_id}",
+    summary="метаданные сохраненного снимка",
+    response_model=dict,
+)
+async def get_scene(scene_id: str, history_service: HistoryService = Depends()):
+    return (await history_service.get_scene(scene_id)).normalize()
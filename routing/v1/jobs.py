@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from convertors import fire_points
+from models.Job import UNFINISHED_JOB_STATUSES
+from routing.v1.main import validate_uploads
+from services.jobs import JobService, read_job
+
+router = APIRouter(prefix="/api/v1/ml/jobs", tags=["jobs"])
+
+PROGRESS_POLL_SECONDS = 1.0
+
+
+@router.post(
+    "/fire_points",
+    summary="асинхронный расчет точек возникновения пожаров",
+    status_code=202,
+    response_model=dict,
+)
+async def create_fire_points_job(
+    csv_file: UploadFile = File(...),
+    tiff_file: UploadFile = File(...),
+    tile_size: int | None = Query(
+        None, ge=1, description="высота полосы снимка, по которой считается прогресс"
+    ),
+    job_service: JobService = Depends(),
+):
+    await validate_uploads(csv_file, tiff_file)
+
+    job = await job_service.submit_fire_points(csv_file, tiff_file, tile_size)
+
+    return job.normalize()
+
+
+@router.get(
+    "/{job_id}",
+    summary="статус задачи",
+    response_model=dict,
+)
+async def get_job(job_id: str, job_service: JobService = Depends()):
+    return (await job_service.get(job_id)).normalize()
+
+
+@router.get(
+    "/{job_id}/events",
+    summary="поток прогресса задачи (server-sent events)",
+)
+async def get_job_events(job_id: str):
+    # Every poll reads the job in a short session, so watchers do not hold
+    # the database connections the job runner needs for its progress.
+    job = await read_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+
+    async def events():
+        current, last = job, None
+        # The stream ends if the job is removed meanwhile.
+        while current is not None:
+            state = jsonable_encoder(current.normalize())
+            if state != last:
+                yield f"data: {json.dumps(state)}\n\n"
+                last = state
+            if state["status"] not in UNFINISHED_JOB_STATUSES:
+                return
+            await asyncio.sleep(PROGRESS_POLL_SECONDS)
+            current = await read_job(job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.get(
+    "/{job_id}/result",
+    summary="результат задачи",
+)
+async def get_job_result(
+    job_id: str,
+    accept: str | None = Header(None),
+    job_service: JobService = Depends(),
+):
+    media_type = fire_points.negotiate(accept)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Supported formats: {', '.join(fire_points.MEDIA_TYPES)}",
+        )
+
+    detections = await job_service.get_detections(job_id)
+
+    return StreamingResponse(
+        fire_points.ENCODERS[media_type](detections), media_type=media_type
+    )
@@ -1,26 +1,314 @@
-import io
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+import json
+import os
+from datetime import datetime
+from typing import Literal
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
 import pandas as pd
+from starlette.concurrency import run_in_threadpool
 
+from configs.Environment import get_environment_variables
+from convertors import fire_points
+from ml.changes import changes_collection
+from ml.constants import (
+    CHANGE_TOLERANCE,
+    HEAT_MAP_CELL_SIZE,
+    HEAT_MAP_MAX_CELL_SIZE,
+    HEAT_MAP_MAX_CELLS,
+)
+from ml.events import CONNECTIVITY
+from ml.mosaic import parse_aoi
+from ml.raster import RasterSource, file_size, is_tiff, rasters_from_zip
 from schemas.geojson import GeoJSONPoint
+from services.history import HistoryService
 from services.ml import MlService
+from services.weather import get_weather_store
 
 router = APIRouter(prefix="/api/v1/ml", tags=["ml"])
 
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
 
 @router.post(
     "/fire_points",
     summary="получение точек возникновение пожаров",
     response_model=list[GeoJSONPoint],
+    responses={
+        200: {
+            "content": {
+                fire_points.PACKED: {},
+                fire_points.COLUMNAR: {},
+            },
+            "description": "GeoJSON точки или бинарный формат в зависимости от заголовка Accept",
+        }
+    },
 )
 async def create_fire_points(
     csv_file: UploadFile = File(...),
     tiff_file: UploadFile = File(...),
+    tile_size: int | None = Query(
+        None, ge=1, description="обрабатывать снимок тайлами заданного размера"
+    ),
+    persist: bool = Query(
+        False, description="сохранить найденные точки для исторических запросов"
+    ),
+    acquired_at: datetime | None = Query(None, description="время съемки снимка"),
+    screen_threshold: float | None = Query(
+        None,
+        ge=0.0,
+        le=1.0,
+        description="двухэтапный режим: порог вероятности на уменьшенном снимке, "
+        "ниже которого блоки не обрабатываются в полном разрешении",
+    ),
+    accept: str | None = Header(None),
     ml_service: MlService = Depends(),
+    history_service: HistoryService = Depends(),
 ):
+    media_type = fire_points.negotiate(accept)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Supported formats: {', '.join(fire_points.MEDIA_TYPES)}",
+        )
+
+    validate_content_types(csv_file, tiff_file)
+
+    if persist and screen_threshold is not None:
+        # The history store must hold every detection of a scene.
+        raise HTTPException(
+            status_code=400, detail="persist cannot be combined with screen_threshold."
+        )
+
+    key = await ml_service.cache_key(
+        "fire_points",
+        csv_file,
+        tiff_file,
+        tile_size=tile_size,
+        screen_threshold=screen_threshold,
+        format=media_type,
+    )
+
+    scene_key = None
+    if persist:
+        scene_key = await ml_service.scene_key(csv_file, tiff_file)
+        if await history_service.has_scene(scene_key):
+            scene_key = None
+
+    if scene_key is None:
+        body = await ml_service.cached_body(key)
+        if body is not None:
+            return Response(body, media_type=media_type)
+
+    headers = {}
     csv_info, tiff_image = await validate_request(csv_file, tiff_file)
+    with tiff_image:
+        if persist and tiff_image.crs is None:
+            # Without a CRS the points are pixel coordinates, not lon/lat.
+            raise HTTPException(
+                status_code=400, detail="persist requires a georeferenced scene."
+            )
+
+        if screen_threshold is None:
+            detections = await ml_service.generate_fire_detections(
+                csv_info, tiff_image, tile_size
+            )
+        else:
+            detections, screening = await ml_service.screen_fire_detections(
+                csv_info, tiff_image, screen_threshold
+            )
+            headers["X-Skipped-Fraction"] = f"{screening['skipped_fraction']:.4f}"
+
+        if scene_key is not None:
+            await history_service.save_scene(
+                scene_key, detections, tiff_image, acquired_at
+            )
+
+    return StreamingResponse(
+        ml_service.cache_chunks(key, fire_points.ENCODERS[media_type](detections)),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+@router.post(
+    "/fire_points/batch",
+    summary="получение точек пожаров для нескольких снимков с общим CSV",
+    responses={
+        200: {
+            "content": {fire_points.NDJSON: {}},
+            "description": "по одной JSON строке с точками на каждый снимок, по мере готовности",
+        }
+    },
+)
+async def create_batch_fire_points(
+    csv_file: UploadFile = File(...),
+    tiff_files: list[UploadFile] = File(
+        ..., description="TIFF снимки или zip архивы со снимками"
+    ),
+    ml_service: MlService = Depends(),
+):
+    csv_info, tiles = await validate_batch_request(csv_file, tiff_files)
+
+    async def stream():
+        try:
+            async for index, detections in ml_service.batch_fire_detections(
+                csv_info, [tiff_image for _, tiff_image in tiles]
+            ):
+                yield await run_in_threadpool(
+                    fire_points.encode_tile, index, tiles[index][0], detections
+                )
+        finally:
+            for _, tiff_image in tiles:
+                tiff_image.close()
+
+    return StreamingResponse(stream(), media_type=fire_points.NDJSON)
+
+
+@router.post(
+    "/fire_points/aoi",
+    summary="получение точек пожаров в области интереса по каталогу снимков",
+    response_model=list[GeoJSONPoint],
+    responses={
+        200: {
+            "content": {
+                fire_points.PACKED: {},
+                fire_points.COLUMNAR: {},
+            },
+            "description": "точки в WGS84 (долгота, широта); перекрывающиеся снимки не дают повторов",
+        }
+    },
+)
+async def create_aoi_fire_points(
+    csv_file: UploadFile = File(...),
+    aoi: str | None = Form(
+        None,
+        description="область интереса: GeoJSON геометрия, Feature или FeatureCollection в WGS84",
+    ),
+    bbox: str | None = Query(
+        None, description="область интереса: min_lon,min_lat,max_lon,max_lat"
+    ),
+    directory: str = Query(
+        "", description="каталог со снимками относительно ML_SCENES_DIR"
+    ),
+    tile_size: int | None = Query(
+        None, ge=1, description="число строк снимка, обрабатываемых за раз"
+    ),
+    accept: str | None = Header(None),
+    ml_service: MlService = Depends(),
+):
+    media_type = fire_points.negotiate(accept)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Supported formats: {', '.join(fire_points.MEDIA_TYPES)}",
+        )
+
+    area = validate_aoi(aoi, bbox)
+    scenes_dir = validate_scenes_dir(directory)
+    csv_info = await validate_csv(csv_file)
+
+    try:
+        detections, scenes = await ml_service.generate_aoi_detections(
+            csv_info, scenes_dir, area, tile_size
+        )
+    except (ValueError, OSError) as e:
+        # Scenes without a CRS, or files that are not readable GeoTIFFs.
+        raise HTTPException(
+            status_code=400, detail=f"Error processing the scenes: {str(e)}"
+        )
+
+    return StreamingResponse(
+        fire_points.ENCODERS[media_type](detections),
+        media_type=media_type,
+        headers={"X-Scenes": str(scenes)},
+    )
+
+
+@router.post(
+    "/fire_points/changes",
+    summary="изменения точек пожаров относительно предыдущего снимка той же территории",
+    response_model=dict,
+    responses={
+        200: {
+            "description": "GeoJSON точки со свойствами change (new, grown, extinguished) "
+            "и probability; первый снимок территории возвращает все точки как new",
+        }
+    },
+)
+async def create_fire_changes(
+    csv_file: UploadFile = File(...),
+    tiff_file: UploadFile = File(...),
+    tolerance: float = Query(
+        CHANGE_TOLERANCE,
+        ge=0.0,
+        description="изменение значений каналов, ниже которого пиксель не пересчитывается",
+    ),
+    ml_service: MlService = Depends(),
+):
+    validate_content_types(csv_file, tiff_file)
+
+    # The result depends on the previous scene of the footprint, so it is
+    # never served from the result cache.
+    csv_info, tiff_image = await validate_request(csv_file, tiff_file)
+    with tiff_image:
+        detections, stats = await ml_service.detect_fire_changes(
+            csv_info, tiff_image, tolerance
+        )
+
+    collection = changes_collection(detections)
+    collection["stats"] = stats
+    return Response(
+        json.dumps(collection, ensure_ascii=False, separators=(",", ":")),
+        media_type="application/json",
+        headers={"X-Rescored-Fraction": f"{stats['rescored_fraction']:.4f}"},
+    )
+
+
+@router.post(
+    "/fire_events",
+    summary="получение очагов пожаров (связных областей пикселей) в виде полигонов",
+    response_model=dict,
+)
+async def create_fire_events(
+    csv_file: UploadFile = File(...),
+    tiff_file: UploadFile = File(...),
+    connectivity: int = Query(
+        8, description="связность пикселей: 4 - по сторонам, 8 - и по диагонали"
+    ),
+    ml_service: MlService = Depends(),
+):
+    if connectivity not in CONNECTIVITY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"connectivity must be one of {', '.join(map(str, CONNECTIVITY))}.",
+        )
 
-    return ml_service.generate_fire_points(csv_info, tiff_image)
+    validate_content_types(csv_file, tiff_file)
+
+    async def compute():
+        csv_info, tiff_image = await validate_request(csv_file, tiff_file)
+        with tiff_image:
+            return await ml_service.generate_fire_events(
+                csv_info, tiff_image, connectivity
+            )
+
+    key = await ml_service.cache_key(
+        "fire_events", csv_file, tiff_file, connectivity=connectivity
+    )
+    return Response(
+        await ml_service.cached_json(key, compute), media_type="application/json"
+    )
 
 
 @router.post(
@@ -31,40 +319,207 @@ async def create_fire_points(
 async def create_heat_map(
     csv_file: UploadFile = File(...),
     tiff_file: UploadFile = File(...),
+    cell_size: int = Query(
+        HEAT_MAP_CELL_SIZE,
+        ge=1,
+        le=HEAT_MAP_MAX_CELL_SIZE,
+        description="размер ячейки heatmap в пикселях",
+    ),
+    method: Literal["mean", "max"] = Query(
+        "mean", description="агрегация вероятностей внутри ячейки"
+    ),
+    min_weight: float = Query(
+        0.0, ge=0.0, le=1.0, description="минимальный вес ячейки"
+    ),
+    top_k: int = Query(
+        HEAT_MAP_MAX_CELLS, ge=1, description="максимальное число ячеек в ответе"
+    ),
     ml_service: MlService = Depends(),
 ):
-    csv_info, tiff_image = await validate_request(csv_file, tiff_file)
+    validate_content_types(csv_file, tiff_file)
 
-    return ml_service.generate_fire_heat_map(csv_info, tiff_image)
+    async def compute():
+        csv_info, tiff_image = await validate_request(csv_file, tiff_file)
+        with tiff_image:
+            return await ml_service.generate_fire_heat_map(
+                csv_info, tiff_image, cell_size, method, min_weight, top_k
+            )
+
+    key = await ml_service.cache_key(
+        "heat_map",
+        csv_file,
+        tiff_file,
+        cell_size=cell_size,
+        method=method,
+        min_weight=min_weight,
+        top_k=top_k,
+    )
+    return Response(
+        await ml_service.cached_json(key, compute), media_type="application/json"
+    )
+
+
+@router.get(
+    "/cache",
+    summary="статистика кэша результатов",
+    response_model=dict,
+)
+async def get_cache_stats(ml_service: MlService = Depends()):
+    return ml_service.cache_stats()
+
+
+@router.get(
+    "/models",
+    summary="модели, распределение трафика и статистика по моделям",
+    response_model=dict,
+)
+async def get_models(ml_service: MlService = Depends()):
+    return ml_service.models()
 
 
 async def validate_request(
     csv_file: UploadFile, tiff_file: UploadFile
-) -> (pd.DataFrame, io.BytesIO):
-    if csv_file.content_type != "text/csv":
+) -> (pd.DataFrame, RasterSource):
+    await validate_uploads(csv_file, tiff_file)
+
+    env = get_environment_variables()
+
+    try:
+        csv_info = await run_in_threadpool(get_weather_store().history, csv_file.file)
+    except Exception as e:
         raise HTTPException(
-            status_code=400, detail="Invalid file type. Please upload a CSV file."
+            status_code=500, detail=f"Error processing the CSV file: {str(e)}"
         )
 
-    if tiff_file.content_type != "image/tiff":
+    try:
+        tiff_image = await run_in_threadpool(
+            RasterSource.from_file, tiff_file.file, env.ML_RASTER_SPOOL_BYTES
+        )
+    except Exception as e:
         raise HTTPException(
-            status_code=400, detail="Invalid TIFF file type. Please upload a TIFF file."
+            status_code=500, detail=f"Error processing the TIFF file: {str(e)}"
         )
 
+    return csv_info, tiff_image
+
+
+async def validate_batch_request(
+    csv_file: UploadFile, tiff_files: list[UploadFile]
+) -> (pd.DataFrame, list[tuple[str, RasterSource]]):
+    env = get_environment_variables()
+
+    for tiff_file in tiff_files:
+        if tiff_file.content_type not in ZIP_CONTENT_TYPES:
+            validate_content_types(csv_file, tiff_file)
+            await validate_tiff_signature(tiff_file)
+        await validate_upload_size(tiff_file)
+
+    csv_info = await validate_csv(csv_file)
+
+    tiles = []
     try:
-        contents = await csv_file.read()
-        csv_info = pd.read_csv(io.StringIO(contents.decode("utf-8")))
+        for tiff_file in tiff_files:
+            if tiff_file.content_type in ZIP_CONTENT_TYPES:
+                tiles += await run_in_threadpool(
+                    rasters_from_zip,
+                    tiff_file.file,
+                    env.ML_RASTER_SPOOL_BYTES,
+                    env.ML_MAX_UPLOAD_BYTES,
+                )
+            else:
+                tiff_image = await run_in_threadpool(
+                    RasterSource.from_file, tiff_file.file, env.ML_RASTER_SPOOL_BYTES
+                )
+                tiles.append((tiff_file.filename, tiff_image))
+
+            if len(tiles) > env.ML_BATCH_MAX_TILES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"At most {env.ML_BATCH_MAX_TILES} TIFF images per request.",
+                )
     except Exception as e:
+        for _, tiff_image in tiles:
+            tiff_image.close()
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(
-            status_code=500, detail=f"Error processing the CSV file: {str(e)}"
+            status_code=400, detail=f"Error processing the TIFF files: {str(e)}"
         )
 
+    if not tiles:
+        raise HTTPException(status_code=400, detail="No TIFF images in the request.")
+
+    return csv_info, tiles
+
+
+async def validate_csv(csv_file: UploadFile) -> pd.DataFrame:
+    validate_content_types(csv_file, None)
+    await validate_upload_size(csv_file)
+
     try:
-        tiff_contents = await tiff_file.read()
-        tiff_image = io.BytesIO(tiff_contents)
+        return await run_in_threadpool(get_weather_store().history, csv_file.file)
     except Exception as e:
         raise HTTPException(
-            status_code=500, detail=f"Error processing the TIFF file: {str(e)}"
+            status_code=500, detail=f"Error processing the CSV file: {str(e)}"
         )
 
-    return csv_info, tiff_image
+
+def validate_aoi(aoi: str | None, bbox: str | None) -> tuple[dict, ...]:
+    if (aoi is None) == (bbox is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of aoi and bbox.")
+
+    try:
+        if bbox is not None:
+            return parse_aoi(bbox=tuple(float(value) for value in bbox.split(",")))
+        return parse_aoi(json.loads(aoi))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid area of interest: {e}")
+
+
+def validate_scenes_dir(directory: str) -> str:
+    # The directory must stay inside ML_SCENES_DIR.
+    root = os.path.realpath(get_environment_variables().ML_SCENES_DIR)
+    path = os.path.realpath(os.path.join(root, directory))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=400, detail="Invalid scenes directory.")
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=404, detail="Scenes directory not found.")
+    return path
+
+
+async def validate_uploads(csv_file: UploadFile, tiff_file: UploadFile):
+    validate_content_types(csv_file, tiff_file)
+
+    for upload in (csv_file, tiff_file):
+        await validate_upload_size(upload)
+
+    await validate_tiff_signature(tiff_file)
+
+
+async def validate_tiff_signature(tiff_file: UploadFile):
+    if not await run_in_threadpool(is_tiff, tiff_file.file):
+        raise HTTPException(
+            status_code=400, detail="Invalid TIFF file. Please upload a TIFF file."
+        )
+
+
+async def validate_upload_size(upload: UploadFile):
+    env = get_environment_variables()
+
+    if await run_in_threadpool(file_size, upload.file) > env.ML_MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{upload.filename} is larger than {env.ML_MAX_UPLOAD_BYTES} bytes.",
+        )
+
+
+def validate_content_types(csv_file: UploadFile, tiff_file: UploadFile | None):
+    if csv_file.content_type != "text/csv":
+        raise HTTPException(
+            status_code=400, detail="Invalid file type. Please upload a CSV file."
+        )
+
+    if tiff_file is not None and tiff_file.content_type != "image/tiff":
+        raise HTTPException(
+            status_code=400, detail="Invalid TIFF file type. Please upload a TIFF file."
+        )
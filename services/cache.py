@@ -0,0 +1,248 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from fastapi import UploadFile
+from loguru import logger
+
+from configs.Environment import get_environment_variables
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+async def hash_uploads(*files: UploadFile, extra: tuple = ()) -> str:
+    """
+    Streams the uploaded files through a hash in chunks, without holding
+    them in memory, and rewinds them for the following reads. `extra`
+    values (model version, threshold, request parameters) are mixed in
+    after the file contents.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+
+    for file in files:
+        size = 0
+        while chunk := await file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+        await file.seek(0)
+        # The length separates the files, so moving bytes from the end of one
+        # file to the start of the next changes the key.
+        digest.update(size.to_bytes(8, "little"))
+
+    digest.update(repr(extra).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of serialized responses: a bounded in-memory LRU and an
+    optional on-disk directory, both limited by the total size in bytes.
+    """
+
+    def __init__(
+        self, memory_bytes: int, disk_dir: str | None = None, disk_bytes: int = 0
+    ):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            body = self._memory.get(key)
+            if body is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return body
+
+        body = self._read_disk(key)
+
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+
+        self._put_memory(key, body)
+        return body
+
+    def set(self, key: str, body: bytes):
+        self._put_memory(key, body)
+        self._write_disk(key, body)
+
+    def writer(self, key: str) -> "CacheWriter":
+        return CacheWriter(self, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+            }
+
+    def _put_memory(self, key: str, body: bytes):
+        if len(body) > self.memory_bytes:
+            return
+
+        with self._lock:
+            if key in self._memory:
+                self._memory_size -= len(self._memory.pop(key))
+
+            self._memory[key] = body
+            self._memory_size += len(body)
+
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key)
+
+    def _read_disk(self, key: str) -> bytes | None:
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            # The modification time doubles as the last access time for eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return body
+
+    def _write_disk(self, key: str, body: bytes):
+        if not self.disk_dir or len(body) > self.disk_bytes:
+            return
+
+        tmp_path = self._tmp_path(key)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            logger.warning(f"failed to write cache entry {key}: {e}")
+            return
+
+        self._evict_disk()
+
+    def _tmp_path(self, key: str) -> str:
+        return f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".tmp") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class CacheWriter:
+    """
+    Stores a body that arrives in chunks, e.g. a streamed response. The
+    chunks are kept in memory while they fit the in-memory tier; a larger
+    body is spooled to a temporary file of the disk tier and renamed into
+    place by `commit()`, so it never has to be held in memory. Bodies that
+    do not fit either tier are dropped.
+    """
+
+    def __init__(self, cache: ResultCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.size = 0
+        self._chunks: list[bytes] | None = []
+        self._file = None
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+            if self.size > self.cache.memory_bytes:
+                chunks, self._chunks = self._chunks, None
+                self._spool(chunks)
+        elif self._file is not None:
+            self._spool([chunk])
+
+    def commit(self):
+        if self._chunks is not None:
+            self.cache.set(self.key, b"".join(self._chunks))
+            self._chunks = None
+            return
+        if self._file is None:
+            return
+
+        try:
+            self._file.close()
+            os.replace(self._file.name, self.cache._disk_path(self.key))
+        except OSError as e:
+            logger.warning(f"failed to write cache entry {self.key}: {e}")
+            self.abort()
+            return
+        self._file = None
+        self.cache._evict_disk()
+
+    def abort(self):
+        self._chunks = None
+        if self._file is None:
+            return
+        self._file.close()
+        try:
+            os.remove(self._file.name)
+        except FileNotFoundError:
+            pass
+        self._file = None
+
+    def _spool(self, chunks: list[bytes]):
+        if not self.cache.disk_dir or self.size > self.cache.disk_bytes:
+            self.abort()
+            return
+
+        try:
+            if self._file is None:
+                self._file = open(self.cache._tmp_path(self.key), "wb")  # noqa: SIM115
+            for chunk in chunks:
+                self._file.write(chunk)
+        except OSError as e:
+            logger.warning(f"failed to write cache entry {self.key}: {e}")
+            self.abort()
+
+
+@lru_cache
+def get_result_cache() -> ResultCache:
+    env = get_environment_variables()
+    return ResultCache(
+        memory_bytes=env.ML_CACHE_MEMORY_BYTES,
+        disk_dir=env.ML_CACHE_DIR or None,
+        disk_bytes=env.ML_CACHE_DISK_BYTES,
+    )
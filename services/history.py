@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi import Depends, HTTPException
+from rasterio.transform import array_bounds
+from starlette.concurrency import run_in_threadpool
+
+from ml.raster import RasterSource
+from ml.registry import model_version
+from ml.utils import coords_to_wgs84
+from services.metrics import current_request_plan
+from models.FirePoint import FirePoint
+from models.Scene import Scene
+from repositories.FirePointRepository import FirePointRepository
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class HistoryService:
+    def __init__(self, fire_point_repository: FirePointRepository = Depends()):
+        self.fire_point_repository = fire_point_repository
+
+    async def has_scene(self, content_hash: str) -> bool:
+        return (
+            await self.fire_point_repository.get_scene_by_hash(content_hash) is not None
+        )
+
+    async def save_scene(
+        self,
+        content_hash: str,
+        detections: np.ndarray,
+        tiff_image: RasterSource,
+        acquired_at: datetime | None,
+    ) -> Scene:
+        lonlat = await run_in_threadpool(coords_to_wgs84, detections, tiff_image.crs)
+        served = current_request_plan().served
+
+        scene = Scene(
+            content_hash=content_hash,
+            model_version=model_version(served.path),
+            threshold=served.threshold,
+            crs=tiff_image.crs,
+            bounds=list(
+                array_bounds(tiff_image.height, tiff_image.width, tiff_image.transform)
+            ),
+            acquired_at=acquired_at or datetime.now(timezone.utc),
+        )
+        return await self.fire_point_repository.create_scene(
+            scene, lonlat, np.asarray(detections[:, 2])
+        )
+
+    async def get_scene(self, scene_id: str) -> Scene:
+        scene = await self.fire_point_repository.get_scene(scene_id)
+        if scene is None:
+            raise HTTPException(status_code=404, detail=f"Scene {scene_id} not found.")
+        return scene
+
+    async def find_points(
+        self,
+        bbox: tuple[float, float, float, float],
+        start: datetime | None,
+        end: datetime | None,
+        cursor: str | None,
+        limit: int,
+    ) -> dict:
+        points = await self.fire_point_repository.find_points(
+            *bbox, start=start, end=end, after=decode_cursor(cursor), limit=limit
+        )
+        return {
+            "items": [point.normalize() for point in points],
+            "next_cursor": encode_cursor(points[-1]) if len(points) == limit else None,
+        }
+
+
+def encode_cursor(point: FirePoint) -> str:
+    # "<detected_at in microseconds since the epoch>_<id>" of the last point.
+    detected_at = point.detected_at.replace(
+        tzinfo=point.detected_at.tzinfo or timezone.utc
+    )
+    return f"{(detected_at - EPOCH) // timedelta(microseconds=1)}_{point.id}"
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    if cursor is None:
+        return None
+    try:
+        microseconds, point_id = (int(part) for part in cursor.split("_"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return EPOCH + timedelta(microseconds=microseconds), point_id
@@ -0,0 +1,271 @@
+import asyncio
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import numpy as np
+from fastapi import Depends, HTTPException, UploadFile
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from configs.Database import async_session
+from configs.Environment import get_environment_variables
+from ml.constants import TILE_SIZE
+from ml.pipeline import window_fire_detections
+from ml.processing import iter_row_windows, process_csv
+from ml.raster import RasterSource
+from ml.registry import load_models, plan_models
+from models.Job import JOB_DONE, JOB_FAILED, JOB_QUEUED, Job
+from repositories.JobRepository import JobRepository
+from services.metrics import current_request_plan, request_plan
+from services.pool import run_in_process_pool
+from services.weather import get_weather_store
+
+FIRE_POINTS_JOB = "fire_points"
+
+CSV_NAME = "weather.csv"
+TIFF_NAME = "scene.tiff"
+RESULT_NAME = "detections.npy"
+
+# How often finished jobs older than ML_JOBS_RETENTION_SECONDS are removed.
+CLEANUP_INTERVAL_SECONDS = 60 * 60
+
+
+class JobQueue:
+    """
+    A bounded in-process queue of pipeline jobs. The job state lives in the
+    database and the inputs in ML_JOBS_DIR, so jobs that were queued or
+    running when the process stopped are picked up again on start. Finished
+    jobs and their files are removed after `retention_seconds`.
+    """
+
+    def __init__(self, concurrency: int, max_queued: int, retention_seconds: int = 0):
+        self.concurrency = concurrency
+        self.retention_seconds = retention_seconds
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queued)
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        # Runs before the workers and before requests are served, so the jobs
+        # marked running here are the ones the previous process left behind.
+        jobs = await self._unfinished_jobs()
+
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._recover(jobs)))
+        if self.retention_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._clean_up()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def full(self) -> bool:
+        return self.queue.full()
+
+    def submit(self, job_id: str):
+        # Raises `asyncio.QueueFull` when the queue filled up since `full()`.
+        self.queue.put_nowait(job_id)
+
+    async def _unfinished_jobs(self) -> list[Job]:
+        try:
+            async with async_session() as db:
+                repository = JobRepository(db)
+                await repository.requeue_running()
+                return await repository.list_by_status([JOB_QUEUED])
+        except Exception as e:
+            logger.error(f"failed to recover unfinished jobs: {e}")
+            return []
+
+    async def _recover(self, jobs: list[Job]):
+        # A job may be put twice if it was also submitted meanwhile; only the
+        # first worker to get it claims it, see `_run()`.
+        for job in jobs:
+            logger.info(f"requeueing job {job.id}")
+            await self.queue.put(job.id)
+
+    async def _clean_up(self):
+        while True:
+            try:
+                await self.remove_expired()
+            except Exception as e:
+                logger.error(f"failed to remove expired jobs: {e}")
+            await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+
+    async def remove_expired(self) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention_seconds)
+        async with async_session() as db:
+            repository = JobRepository(db)
+            jobs = await repository.list_finished_before(cutoff)
+            for job in jobs:
+                await run_in_threadpool(shutil.rmtree, job.input_dir, True)
+                await repository.delete(job.id)
+
+        if jobs:
+            logger.info(f"removed {len(jobs)} jobs finished before {cutoff}")
+        return len(jobs)
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.exception(f"job {job_id} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: str):
+        async with async_session() as db:
+            repository = JobRepository(db)
+            if not await repository.claim(job_id):
+                return
+
+            job = await repository.get(job_id)
+            try:
+                # The job is scored by the model picked for the request that
+                # submitted it.
+                request_plan.set(plan_models(load_models(), job.params.get("model")))
+                result_path = await run_fire_points_job(job, repository)
+            except Exception as e:
+                await repository.update(job_id, status=JOB_FAILED, error=str(e))
+                raise
+
+            await repository.update(
+                job_id, status=JOB_DONE, result_path=result_path, progress=1.0
+            )
+
+
+async def run_fire_points_job(job: Job, repository: JobRepository) -> str:
+    """
+    Runs the fire point pipeline of a job strip by strip in the process
+    pool and records the share of finished strips as the job progress.
+    """
+    tiff_image = RasterSource.from_path(os.path.join(job.input_dir, TIFF_NAME))
+
+    def read_weather():
+        with open(os.path.join(job.input_dir, CSV_NAME), "rb") as csv_file:
+            return process_csv(get_weather_store().history(csv_file))
+
+    csv_mean_data = await run_in_threadpool(read_weather)
+
+    windows = list(
+        iter_row_windows(
+            tiff_image.height,
+            tiff_image.width,
+            job.params.get("tile_size") or TILE_SIZE,
+        )
+    )
+    await repository.update(job.id, tiles_total=len(windows))
+
+    async def run_strip(index, window):
+        return index, await run_in_process_pool(
+            window_fire_detections, csv_mean_data, tiff_image, window
+        )
+
+    parts = [None] * len(windows)
+    strips = [run_strip(index, window) for index, window in enumerate(windows)]
+    for tiles_done, strip in enumerate(asyncio.as_completed(strips), start=1):
+        index, parts[index] = await strip
+        await repository.update(
+            job.id, tiles_done=tiles_done, progress=tiles_done / len(windows)
+        )
+
+    result_path = os.path.join(job.input_dir, RESULT_NAME)
+    detections = np.concatenate(parts) if parts else np.empty((0, 3))
+    await run_in_threadpool(np.save, result_path, detections)
+    return result_path
+
+
+async def read_job(job_id: str) -> Job | None:
+    # A job read in a session of its own, e.g. by long polls that would
+    # otherwise keep a pooled connection for the whole life of the job.
+    async with async_session() as db:
+        return await JobRepository(db).get(job_id)
+
+
+@lru_cache
+def get_job_queue() -> JobQueue:
+    env = get_environment_variables()
+    return JobQueue(
+        concurrency=env.ML_JOBS_CONCURRENCY,
+        max_queued=env.ML_JOBS_QUEUE_SIZE,
+        retention_seconds=env.ML_JOBS_RETENTION_SECONDS,
+    )
+
+
+class JobService:
+    def __init__(self, job_repository: JobRepository = Depends()):
+        self.job_repository = job_repository
+        self.queue = get_job_queue()
+        self.env = get_environment_variables()
+
+    async def submit_fire_points(
+        self, csv_file: UploadFile, tiff_file: UploadFile, tile_size: int | None
+    ) -> Job:
+        if self.queue.full():
+            raise HTTPException(
+                status_code=429, detail="Too many queued jobs, retry later."
+            )
+
+        job_id = str(uuid.uuid4())
+        job = Job(
+            id=job_id,
+            kind=FIRE_POINTS_JOB,
+            status=JOB_QUEUED,
+            params={
+                "tile_size": tile_size,
+                "model": current_request_plan().served.name,
+            },
+            input_dir=os.path.join(self.env.ML_JOBS_DIR, job_id),
+        )
+
+        try:
+            await run_in_threadpool(os.makedirs, job.input_dir, exist_ok=True)
+            await _save_upload(csv_file, os.path.join(job.input_dir, CSV_NAME))
+            await _save_upload(tiff_file, os.path.join(job.input_dir, TIFF_NAME))
+
+            job = await self.job_repository.create(job)
+        except Exception:
+            await run_in_threadpool(shutil.rmtree, job.input_dir, True)
+            raise
+
+        try:
+            # Other submits may have filled the queue while the uploads were
+            # being saved.
+            self.queue.submit(job.id)
+        except asyncio.QueueFull:
+            await self.job_repository.delete(job.id)
+            await run_in_threadpool(shutil.rmtree, job.input_dir, True)
+            raise HTTPException(
+                status_code=429, detail="Too many queued jobs, retry later."
+            )
+        return job
+
+    async def get(self, job_id: str) -> Job:
+        job = await self.job_repository.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+        return job
+
+    async def get_detections(self, job_id: str) -> np.ndarray:
+        job = await self.get(job_id)
+        if job.status != JOB_DONE:
+            raise HTTPException(
+                status_code=409, detail=f"Job {job_id} is {job.status}."
+            )
+        return np.load(job.result_path, mmap_mode="r")
+
+
+async def _save_upload(upload: UploadFile, path: str):
+    def copy():
+        upload.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(upload.file, f, 1024 * 1024)
+
+    await run_in_threadpool(copy)
@@ -0,0 +1,268 @@
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator
+
+from ml.registry import ScoringPlan, load_models, model_version, plan_models
+
+# Upper bounds of the stage and request duration histogram buckets, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Stage timings of the request being handled, for its Server-Timing header.
+request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_timings", default=None
+)
+# Whether the worker jobs of the request being handled are profiled (DEBUG only).
+request_profile: ContextVar[bool] = ContextVar("request_profile", default=False)
+# The models that score the request being handled, see `plan_models()`.
+request_plan: ContextVar[ScoringPlan | None] = ContextVar("request_plan", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class ModelStats:
+    def __init__(self):
+        self.duration = Histogram()
+        self.pixels = 0
+        self.positives = 0
+        self.agreements = 0
+
+
+class Metrics:
+    """
+    Prometheus-style metrics of the ML pipeline: per-stage durations and
+    pixel counts labelled with the version of the served model, per-model
+    scoring durations and decision counts, request durations, and the peak
+    RSS of the API process and of the worker processes. Timings recorded in
+    the workers arrive with the job results, see
+    `services.pool.run_in_process_pool()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: dict[tuple[str, str], Histogram] = {}
+        self.pixels: dict[tuple[str, str], int] = {}
+        self.models: dict[tuple[str, str, str], ModelStats] = {}
+        self.requests: dict[tuple[str, str, str], Histogram] = {}
+        self.worker_peak_rss = 0
+
+    def observe_stage(self, name: str, seconds: float, pixels: int = 0):
+        key = (name, model_version(current_request_plan().served.path))
+        with self._lock:
+            self.stages.setdefault(key, Histogram()).observe(seconds)
+            self.pixels[key] = self.pixels.get(key, 0) + pixels
+
+        timings = request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+    def observe_records(self, records: list[tuple[str, float, int]], peak_rss: int):
+        for name, seconds, pixels in records:
+            self.observe_stage(name, seconds, pixels)
+
+        with self._lock:
+            self.worker_peak_rss = max(self.worker_peak_rss, peak_rss)
+
+    def observe_models(self, records: list[tuple]):
+        # The `record_model()` records of a job.
+        with self._lock:
+            for model, version, role, seconds, pixels, positives, agreements in records:
+                stats = self.models.setdefault((model, version, role), ModelStats())
+                stats.duration.observe(seconds)
+                stats.pixels += pixels
+                stats.positives += positives
+                stats.agreements += agreements
+
+    def model_stats(self) -> list[dict]:
+        """
+        The scoring statistics per model version and role: the throughput,
+        the share of pixels above the model threshold and, for shadow
+        models, the share of pixels where they agree with the served model.
+        Only requests that are scored count: responses served from the result
+        cache run no model, so with a warm cache the rates describe the cache
+        misses, not the whole traffic.
+        """
+        with self._lock:
+            return [
+                {
+                    "model": model,
+                    "version": version,
+                    "role": role,
+                    "jobs": stats.duration.count,
+                    "pixels": stats.pixels,
+                    "seconds": stats.duration.sum,
+                    "pixels_per_second": stats.pixels / stats.duration.sum
+                    if stats.duration.sum
+                    else None,
+                    "positive_rate": stats.positives / stats.pixels
+                    if stats.pixels
+                    else None,
+                    "agreement_rate": stats.agreements / stats.pixels
+                    if stats.pixels and role == "shadow"
+                    else None,
+                }
+                for (model, version, role), stats in self.models.items()
+            ]
+
+    def observe_request(self, method: str, path: str, status: int, seconds: float):
+        with self._lock:
+            self.requests.setdefault((method, path, str(status)), Histogram()).observe(
+                seconds
+            )
+
+    @contextmanager
+    def stage(self, name: str, pixels: int = 0) -> Iterator[None]:
+        # For stages of the API process itself, such as serialization.
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - start, pixels)
+
+    def render(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            lines += _histogram_lines(
+                "ml_stage_duration_seconds",
+                "Duration of the ML pipeline stages.",
+                {
+                    (("stage", name), ("model_version", version)): histogram
+                    for (name, version), histogram in self.stages.items()
+                },
+            )
+
+            lines += [
+                "# HELP ml_stage_pixels_total Pixels processed by the ML pipeline stages.",
+                "# TYPE ml_stage_pixels_total counter",
+            ]
+            lines += [
+                f"ml_stage_pixels_total{_labels((('stage', name), ('model_version', version)))}"
+                f" {pixels}"
+                for (name, version), pixels in self.pixels.items()
+            ]
+
+            model_labels = {
+                key: (("model", key[0]), ("model_version", key[1]), ("role", key[2]))
+                for key in self.models
+            }
+            lines += _histogram_lines(
+                "ml_model_duration_seconds",
+                "Duration of the scoring passes of the models.",
+                {
+                    model_labels[key]: stats.duration
+                    for key, stats in self.models.items()
+                },
+            )
+            for name, help, attribute in (
+                ("ml_model_pixels_total", "Pixels scored by the models.", "pixels"),
+                (
+                    "ml_model_positive_pixels_total",
+                    "Pixels above the model threshold.",
+                    "positives",
+                ),
+                (
+                    "ml_model_agreeing_pixels_total",
+                    "Pixels with the same decision as the served model.",
+                    "agreements",
+                ),
+            ):
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+                lines += [
+                    f"{name}{_labels(model_labels[key])} {getattr(stats, attribute)}"
+                    for key, stats in self.models.items()
+                    if attribute != "agreements" or key[2] == "shadow"
+                ]
+
+            lines += _histogram_lines(
+                "ml_request_duration_seconds",
+                "Duration of the HTTP requests.",
+                {
+                    (("method", method), ("path", path), ("status", status)): histogram
+                    for (method, path, status), histogram in self.requests.items()
+                },
+            )
+
+            worker_peak_rss = self.worker_peak_rss
+
+        lines += [
+            "# HELP ml_peak_rss_bytes Peak resident set size of the processes.",
+            "# TYPE ml_peak_rss_bytes gauge",
+            f'ml_peak_rss_bytes{{process="api"}} {peak_rss()}',
+            f'ml_peak_rss_bytes{{process="worker"}} {worker_peak_rss}',
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def current_request_plan() -> ScoringPlan:
+    """
+    The scoring plan of the request being handled. Outside of a request,
+    e.g. in a background job that did not set one, a model is picked for
+    every call.
+    """
+    plan = request_plan.get()
+    if plan is None:
+        plan = plan_models(load_models())
+    return plan
+
+
+def peak_rss() -> int:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def server_timing(timings: dict[str, float], total: float) -> str:
+    """
+    A Server-Timing header value with the stage durations in milliseconds.
+    Stages that run after the headers are sent, like the encoding of a
+    streamed body, are not in it.
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _labels(labels: tuple[tuple[str, object], ...]) -> str:
+    values = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return f"{{{values}}}"
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name: str, help: str, histograms: dict) -> list[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+
+    for labels, histogram in histograms.items():
+        for bound, count in zip(DURATION_BUCKETS, histogram.buckets):
+            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+        lines.append(
+            f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}"
+        )
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+    return lines
+
+
+@lru_cache
+def get_metrics() -> Metrics:
+    return Metrics()
@@ -1,45 +1,324 @@
-import io
+import asyncio
+import json
+import math
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator
 
 import geojson
+import numpy as np
 import pandas as pd
+from fastapi import UploadFile
+from rasterio.windows import Window
+from starlette.concurrency import run_in_threadpool
 
-from ml.pipeline import generate_fire_points
+from configs.Environment import get_environment_variables
+from ml.changes import evict_footprints
+from ml.constants import (
+    BATCH_TILE_PIXELS,
+    HEAT_MAP_CELL_SIZE,
+    HEAT_MAP_MAX_CELLS,
+    TILE_SIZE,
+)
+from ml.mosaic import aoi_tiles, footprint_index, merge_to_wgs84
+from ml.pipeline import (
+    aoi_tile_detections,
+    batch_fire_detections,
+    coords_to_points,
+    detect_fire_changes,
+    generate_fire_detections,
+    generate_fire_events,
+    generate_heat_map,
+    screen_fire_detections,
+    stream_fire_detections,
+    stream_fire_points,
+    window_fire_detections,
+)
+from ml.processing import iter_row_windows, process_csv
+from ml.raster import RasterSource
+from ml.registry import load_models, model_version
+from services.cache import get_result_cache, hash_uploads
+from services.metrics import current_request_plan, get_metrics
+from services.pool import get_pool_size, run_in_process_pool
 
 
 class MlService:
     def __init__(self):
-        pass
+        self.env = get_environment_variables()
+        self.cache = get_result_cache()
+        self.metrics = get_metrics()
 
-    def generate_fire_points(
-        self, csv_info: pd.DataFrame, tiff_image: io.BytesIO
-    ) -> list[geojson.Point]:
-        return generate_fire_points(csv_info, tiff_image)
+    async def cache_key(
+        self, kind: str, csv_file: UploadFile, tiff_file: UploadFile, **params
+    ) -> str:
+        return await hash_uploads(
+            csv_file,
+            tiff_file,
+            extra=(kind, *self.served_model(), sorted(params.items())),
+        )
 
-    def generate_fire_heat_map(
-        self, csv_info: pd.DataFrame, tiff_image: io.BytesIO
-    ) -> dict:
+    async def scene_key(self, csv_file: UploadFile, tiff_file: UploadFile) -> str:
+        return await hash_uploads(
+            csv_file, tiff_file, extra=("scene", *self.served_model())
+        )
+
+    def served_model(self) -> tuple[str, str, float]:
+        # The name, version and threshold of the model serving the request;
+        # shadow models do not change the response.
+        served = current_request_plan().served
+        return served.name, model_version(served.path), served.threshold
+
+    def models(self) -> dict:
         return {
-            "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "properties": {"weight": 0.8},
-                    "geometry": {"type": "Point", "coordinates": [-73.9708, 40.7648]},
-                },
+            "models": [
                 {
-                    "type": "Feature",
-                    "properties": {"weight": 0.6},
-                    "geometry": {"type": "Point", "coordinates": [-73.9851, 40.7580]},
-                },
-                {
-                    "type": "Feature",
-                    "properties": {"weight": 1.0},
-                    "geometry": {"type": "Point", "coordinates": [-73.9926, 40.7467]},
-                },
-                {
-                    "type": "Feature",
-                    "properties": {"weight": 0.9},
-                    "geometry": {"type": "Point", "coordinates": [-74.0017, 40.7328]},
-                },
+                    "name": spec.name,
+                    "version": model_version(spec.path),
+                    "threshold": spec.threshold,
+                    "weight": spec.weight,
+                    "shadow": spec.shadow,
+                }
+                for spec in load_models().values()
             ],
+            "stats": self.metrics.model_stats(),
         }
+
+    async def cached_json(
+        self, key: str, compute: Callable[[], Awaitable[Any]]
+    ) -> bytes:
+        body = await run_in_threadpool(self.cache.get, key)
+        if body is not None:
+            return body
+
+        result = await compute()
+        with self.metrics.stage("serialize"):
+            body = json.dumps(
+                result, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+        await run_in_threadpool(self.cache.set, key, body)
+        return body
+
+    async def cached_body(self, key: str) -> bytes | None:
+        return await run_in_threadpool(self.cache.get, key)
+
+    def cache_chunks(self, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Passes a streamed response body through and stores it in the cache
+        once it is complete, see `CacheWriter`: bodies beyond the in-memory
+        tier are spooled to the disk tier. A body the client did not receive
+        in full is not stored.
+        """
+        writer = self.cache.writer(key)
+        serialize_time = 0.0
+        chunks = iter(chunks)
+        try:
+            while True:
+                # The chunks are encoded lazily, time the encoding separately
+                # from the time the client takes to receive them. The headers
+                # are sent by now, so the time goes to the metrics and not
+                # Server-Timing.
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                serialize_time += time.perf_counter() - start
+                if chunk is None:
+                    break
+
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            writer.abort()
+            raise
+
+        self.metrics.observe_stage("serialize", serialize_time)
+        writer.commit()
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    async def generate_fire_points(
+        self,
+        csv_info: pd.DataFrame,
+        tiff_image: RasterSource,
+        tile_size: int | None = None,
+    ) -> list[geojson.Point]:
+        return coords_to_points(
+            await self.generate_fire_detections(csv_info, tiff_image, tile_size)
+        )
+
+    async def generate_fire_detections(
+        self,
+        csv_info: pd.DataFrame,
+        tiff_image: RasterSource,
+        tile_size: int | None = None,
+    ) -> np.ndarray:
+        if tile_size is not None:
+            return await run_in_process_pool(
+                _stream_fire_detections, csv_info, tiff_image, tile_size
+            )
+
+        windows = self._split_windows(tiff_image)
+        if len(windows) > 1:
+            csv_mean_data = process_csv(csv_info)
+            parts = await asyncio.gather(
+                *(
+                    run_in_process_pool(
+                        window_fire_detections, csv_mean_data, tiff_image, window
+                    )
+                    for window in windows
+                )
+            )
+            return np.concatenate(parts)
+
+        return await run_in_process_pool(generate_fire_detections, csv_info, tiff_image)
+
+    async def screen_fire_detections(
+        self, csv_info: pd.DataFrame, tiff_image: RasterSource, screen_threshold: float
+    ) -> tuple[np.ndarray, dict]:
+        return await run_in_process_pool(
+            screen_fire_detections, csv_info, tiff_image, screen_threshold
+        )
+
+    def stream_fire_points(
+        self, csv_info: pd.DataFrame, tiff_image: RasterSource, tile_size: int | None
+    ) -> Iterator[geojson.Point]:
+        return stream_fire_points(csv_info, tiff_image, tile_size)
+
+    def _split_windows(self, tiff_image: RasterSource) -> list[Window]:
+        """
+        Splits rasters larger than ML_SPLIT_PIXELS into full-width row strips,
+        one per worker, so that the concatenated results keep the row-major
+        order of the whole-image path.
+        """
+        height, width = tiff_image.shape
+
+        if not self.env.ML_SPLIT_PIXELS or height * width <= self.env.ML_SPLIT_PIXELS:
+            return []
+
+        strip_rows = math.ceil(height / min(get_pool_size(), height))
+        return list(iter_row_windows(height, width, strip_rows))
+
+    async def batch_fire_detections(
+        self, csv_info: pd.DataFrame, tiff_images: list[RasterSource]
+    ) -> AsyncIterator[tuple[int, np.ndarray]]:
+        """
+        Runs many tiles that share one weather CSV. The CSV features are
+        computed once, small tiles are grouped so that each worker runs
+        predict_proba on full batches across the tiles of its group, and
+        (index, detections) pairs are yielded as soon as their group
+        finishes, not in upload order.
+        """
+        csv_mean_data = process_csv(csv_info)
+
+        async def run_group(group: list[int]) -> list[tuple[int, np.ndarray]]:
+            detections = await run_in_process_pool(
+                batch_fire_detections,
+                csv_mean_data,
+                [tiff_images[i] for i in group],
+            )
+            return list(zip(group, detections))
+
+        tasks = [
+            asyncio.ensure_future(run_group(group))
+            for group in self._batch_groups(tiff_images)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                for index, detections in await task:
+                    yield index, detections
+        finally:
+            # The client went away or a tile failed: drop the queued groups.
+            for task in tasks:
+                task.cancel()
+
+    def _batch_groups(self, tiff_images: list[RasterSource]) -> list[list[int]]:
+        """
+        Groups consecutive tiles up to BATCH_TILE_PIXELS pixels in total.
+        Larger tiles get a group of their own.
+        """
+        groups = []
+        pixels = 0
+        for index, tiff_image in enumerate(tiff_images):
+            height, width = tiff_image.shape
+            if not groups or pixels + height * width > BATCH_TILE_PIXELS:
+                groups.append([])
+                pixels = 0
+            groups[-1].append(index)
+            pixels += height * width
+
+        return groups
+
+    async def generate_aoi_detections(
+        self,
+        csv_info: pd.DataFrame,
+        directory: str,
+        aoi: tuple[dict, ...],
+        tile_size: int | None = None,
+    ) -> tuple[np.ndarray, int]:
+        # The index and the tile plan only read headers; the tiles run in the
+        # process pool and are reprojected to WGS84 together at the end.
+        csv_mean_data = process_csv(csv_info)
+        footprints = await run_in_threadpool(footprint_index, directory)
+        tiles = await run_in_threadpool(
+            aoi_tiles, footprints, aoi, tile_size or TILE_SIZE
+        )
+
+        detections = await asyncio.gather(
+            *(
+                run_in_process_pool(aoi_tile_detections, csv_mean_data, tile)
+                for tile in tiles
+            )
+        )
+        merged = await run_in_threadpool(merge_to_wgs84, tiles, list(detections))
+        return merged, len({tile.path for tile in tiles})
+
+    async def detect_fire_changes(
+        self, csv_info: pd.DataFrame, tiff_image: RasterSource, tolerance: float
+    ) -> tuple[np.ndarray, dict]:
+        # One worker updates the whole footprint state; scenes of the same
+        # footprint wait for each other on its lock.
+        result = await run_in_process_pool(
+            detect_fire_changes,
+            csv_info,
+            tiff_image,
+            self.env.ML_CHANGES_DIR,
+            tolerance,
+        )
+        await run_in_threadpool(
+            evict_footprints,
+            self.env.ML_CHANGES_DIR,
+            self.env.ML_CHANGES_MAX_BYTES,
+            self.env.ML_CHANGES_MAX_AGE_SECONDS,
+        )
+        return result
+
+    async def generate_fire_events(
+        self, csv_info: pd.DataFrame, tiff_image: RasterSource, connectivity: int = 8
+    ) -> dict:
+        return await run_in_process_pool(
+            generate_fire_events, csv_info, tiff_image, connectivity
+        )
+
+    async def generate_fire_heat_map(
+        self,
+        csv_info: pd.DataFrame,
+        tiff_image: RasterSource,
+        cell_size: int = HEAT_MAP_CELL_SIZE,
+        method: str = "mean",
+        min_weight: float = 0.0,
+        top_k: int | None = HEAT_MAP_MAX_CELLS,
+    ) -> dict:
+        return await run_in_process_pool(
+            generate_heat_map,
+            csv_info,
+            tiff_image,
+            cell_size=cell_size,
+            method=method,
+            min_weight=min_weight,
+            top_k=top_k,
+        )
+
+
+def _stream_fire_detections(
+    csv_info: pd.DataFrame, tiff_image: RasterSource, tile_size: int
+) -> np.ndarray:
+    parts = list(stream_fire_detections(csv_info, tiff_image, tile_size))
+    return np.concatenate(parts) if parts else np.empty((0, 3))
@@ -0,0 +1,117 @@
+import asyncio
+import cProfile
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from loguru import logger
+
+from configs.Environment import get_environment_variables
+from ml.profiling import model_recording, recording
+from ml.registry import configure_inference, load_models, scoring, warm_up
+from services.metrics import (
+    current_request_plan,
+    get_metrics,
+    peak_rss,
+    request_profile,
+)
+
+
+def _init_worker(backend: str, thread_count: int):
+    # Loads the CatBoost models of the model set (and exports them for the
+    # backend) once per worker process, before its first job.
+    configure_inference(backend, thread_count)
+    for spec in load_models().values():
+        warm_up(spec.path)
+
+
+def _noop():
+    pass
+
+
+def get_pool_size() -> int:
+    return get_environment_variables().ML_WORKERS or os.cpu_count() or 1
+
+
+def get_inference_threads() -> int:
+    # The backends use every core by default; with several workers that
+    # would run workers x cores threads, so each worker gets one thread.
+    env = get_environment_variables()
+    if env.ML_INFERENCE_THREADS:
+        return env.ML_INFERENCE_THREADS
+    return 1 if get_pool_size() > 1 else 0
+
+
+@lru_cache
+def get_process_pool() -> ProcessPoolExecutor:
+    # "spawn" keeps the workers clear of the event loop and CatBoost threads
+    # of the API process.
+    env = get_environment_variables()
+    return ProcessPoolExecutor(
+        max_workers=get_pool_size(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(env.ML_INFERENCE_BACKEND, get_inference_threads()),
+    )
+
+
+async def warm_up_process_pool():
+    # Submitting one job per worker makes the pool start every worker process
+    # (and load the model in it) now rather than on the first request.
+    await asyncio.gather(*(run_in_process_pool(_noop) for _ in range(get_pool_size())))
+
+
+def shutdown_process_pool():
+    if get_process_pool.cache_info().currsize:
+        get_process_pool().shutdown(cancel_futures=True)
+        get_process_pool.cache_clear()
+
+
+async def run_in_process_pool(func, *args, **kwargs):
+    # The job runs with the models of the request. The stage timings and
+    # model records of the worker come back with the result and are merged
+    # into the metrics (and the Server-Timing of the request).
+    plan = current_request_plan()
+    profile_dir = get_environment_variables().ML_PROFILE_DIR
+    if not request_profile.get():
+        profile_dir = None
+
+    loop = asyncio.get_running_loop()
+    (
+        result,
+        records,
+        model_records,
+        worker_peak_rss,
+        profile_path,
+    ) = await loop.run_in_executor(
+        get_process_pool(),
+        partial(_instrumented_call, func, plan, profile_dir, *args, **kwargs),
+    )
+
+    get_metrics().observe_records(records, worker_peak_rss)
+    get_metrics().observe_models(model_records)
+    if profile_path is not None:
+        logger.info(f"profile of {func.__name__} written to {profile_path}")
+
+    return result
+
+
+def _instrumented_call(func, plan, profile_dir, *args, **kwargs):
+    profiler = cProfile.Profile() if profile_dir is not None else None
+    profile_path = None
+
+    with scoring(plan), recording() as records, model_recording() as model_records:
+        if profiler is None:
+            result = func(*args, **kwargs)
+        else:
+            result = profiler.runcall(func, *args, **kwargs)
+
+    if profiler is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{func.__name__}.prof"
+        profile_path = os.path.join(profile_dir, name)
+        profiler.dump_stats(profile_path)
+
+    return result, records, model_records, peak_rss(), profile_path
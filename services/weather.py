@@ -0,0 +1,67 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import pandas as pd
+
+from configs.Environment import get_environment_variables
+from ml.weather import WeatherHistory
+
+# Station CSVs are append-only, so their header and first data rows
+# identify the station; a fixed number of bytes would take in the appended
+# rows of a short file.
+STATION_KEY_LINES = 2
+
+
+class WeatherStore:
+    """
+    Per-station weather histories (see `WeatherHistory`) in a bounded LRU,
+    so an upload that appends rows to a known station CSV only parses the
+    appended rows.
+    """
+
+    def __init__(self, max_stations: int):
+        self.max_stations = max_stations
+        self._histories: OrderedDict[str, WeatherHistory] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def history(self, file) -> pd.DataFrame:
+        """
+        The rows of the CSV `file` the weather windows need, for
+        `process_csv()`.
+        """
+        key = station_key(file)
+
+        with self._lock:
+            history = self._histories.pop(key, None)
+        if history is None:
+            history = WeatherHistory()
+
+        # Parsed outside the lock; concurrent uploads of one station each
+        # update their own copy and the last one is kept.
+        history.update(file)
+        frame = history.frame
+
+        with self._lock:
+            if self.max_stations > 0:
+                self._histories[key] = history
+                while len(self._histories) > self.max_stations:
+                    self._histories.popitem(last=False)
+
+        return frame
+
+
+def station_key(file) -> str:
+    file.seek(0)
+    digest = hashlib.blake2b(digest_size=16)
+    for _ in range(STATION_KEY_LINES):
+        # The line ending of a last row is only written with the next row.
+        digest.update(file.readline().rstrip(b"\r\n") + b"\n")
+    file.seek(0)
+    return digest.hexdigest()
+
+
+@lru_cache
+def get_weather_store() -> WeatherStore:
+    return WeatherStore(get_environment_variables().ML_WEATHER_STATIONS)
@@ -0,0 +1,108 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from benchmarks.synthetic import write_synthetic_tiff
+from convertors.fire_points import NDJSON
+
+URL = "/api/v1/ml/fire_points"
+
+
+@pytest.fixture(scope="module")
+def other_scene(tmp_path_factory):
+    path = tmp_path_factory.mktemp("scenes") / "other.tiff"
+    return write_synthetic_tiff(str(path), 200, 180, seed=1, fire_fraction=0.02)
+
+
+def zipped(members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        for name, content in members.items():
+            bundle.writestr(name, content)
+    return buffer.getvalue()
+
+
+def single_points(client, csv_file, tiff_name, tiff_bytes):
+    response = client.post(
+        URL,
+        files={
+            "csv_file": csv_file,
+            "tiff_file": (tiff_name, tiff_bytes, "image/tiff"),
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_batch_lines_match_single_requests(client, upload, other_scene):
+    scene_bytes = upload["tiff_file"][1]
+    with open(other_scene, "rb") as file:
+        other_bytes = file.read()
+
+    response = client.post(
+        f"{URL}/batch",
+        files=[
+            ("csv_file", upload["csv_file"]),
+            ("tiff_files", ("scene.tiff", scene_bytes, "image/tiff")),
+            (
+                "tiff_files",
+                ("bundle.zip", zipped({"other.tif": other_bytes}), "application/zip"),
+            ),
+        ],
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == NDJSON
+    lines = response.text.splitlines()
+    # Lines come as their tiles finish, every tile exactly once.
+    tiles = sorted((json.loads(line) for line in lines), key=lambda t: t["index"])
+    assert [(tile["index"], tile["filename"]) for tile in tiles] == [
+        (0, "scene.tiff"),
+        (1, "other.tif"),
+    ]
+
+    csv_file = upload["csv_file"]
+    assert tiles[0]["points"] == single_points(
+        client, csv_file, "scene.tiff", scene_bytes
+    )
+    assert tiles[1]["points"] == single_points(
+        client, csv_file, "other.tiff", other_bytes
+    )
+    assert tiles[0]["points"] and tiles[1]["points"]
+
+
+@pytest.mark.parametrize(
+    "tiff_file, detail",
+    [
+        (("broken.tiff", b"not a tiff", "image/tiff"), "Invalid TIFF file."),
+        (
+            ("bundle.zip", zipped({"broken.tif": b"not a tiff"}), "application/zip"),
+            "broken.tif is not a TIFF image",
+        ),
+    ],
+)
+def test_bad_tile_fails_the_batch(client, upload, tiff_file, detail):
+    response = client.post(
+        f"{URL}/batch",
+        files=[
+            ("csv_file", upload["csv_file"]),
+            ("tiff_files", upload["tiff_file"]),
+            ("tiff_files", tiff_file),
+        ],
+    )
+
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_batch_without_tiff_images(client, upload):
+    bundle = ("bundle.zip", zipped({"readme.txt": b"hi"}), "application/zip")
+    response = client.post(
+        f"{URL}/batch",
+        files=[("csv_file", upload["csv_file"]), ("tiff_files", bundle)],
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No TIFF images in the request."
@@ -0,0 +1,98 @@
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from services.cache import ResultCache, hash_uploads
+from services.ml import MlService
+
+
+def upload(content: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename="file")
+
+
+def test_memory_tier_evicts_the_least_recently_used():
+    cache = ResultCache(memory_bytes=10)
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+    cache.get("a")
+    cache.set("c", b"cccc")
+
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"cccc"
+    assert cache.stats()["memory_bytes"] == 8
+
+
+def test_disk_tier_serves_what_left_memory(tmp_path):
+    cache = ResultCache(memory_bytes=4, disk_dir=str(tmp_path), disk_bytes=100)
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+
+    assert cache.get("a") == b"aaaa"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_the_least_recently_used(tmp_path):
+    cache = ResultCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=10)
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+    # "a" was used last, "b" goes when "c" does not fit.
+    past = time.time() - 60
+    os.utime(tmp_path / "b", (past, past))
+    cache.set("c", b"cccc")
+
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+
+
+def upload_key(*contents, kind="fire_points"):
+    return asyncio.run(hash_uploads(*map(upload, contents), extra=(kind,)))
+
+
+def test_hash_uploads_rewinds_and_separates_the_files():
+    first = upload(b"abc")
+    asyncio.run(hash_uploads(first))
+    assert first.file.tell() == 0
+
+    key = upload_key(b"abc", b"def")
+    assert key == upload_key(b"abc", b"def")
+    assert key != upload_key(b"ab", b"cdef")
+    assert key != upload_key(b"abc", b"def", kind="heat_map")
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = MlService()
+    service.cache = ResultCache(
+        memory_bytes=16, disk_dir=str(tmp_path / "cache"), disk_bytes=64
+    )
+    return service
+
+
+def test_streamed_body_beyond_memory_goes_to_disk(service):
+    chunks = [b"x" * 10] * 4
+
+    assert b"".join(service.cache_chunks("key", chunks)) == b"x" * 40
+
+    assert service.cache.stats()["memory_entries"] == 0
+    assert os.listdir(service.cache.disk_dir) == ["key"]
+    assert service.cache.get("key") == b"x" * 40
+
+
+def test_streamed_body_beyond_both_tiers_is_not_stored(service):
+    assert len(b"".join(service.cache_chunks("key", [b"x" * 10] * 8))) == 80
+
+    assert service.cache.get("key") is None
+    assert os.listdir(service.cache.disk_dir) == []
+
+
+def test_interrupted_stream_is_not_stored(service):
+    stream = service.cache_chunks("key", [b"x" * 10] * 4)
+    next(stream), next(stream)
+    stream.close()
+
+    assert service.cache.get("key") is None
+    assert os.listdir(service.cache.disk_dir) == []
@@ -0,0 +1,78 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from affine import Affine
+
+from benchmarks.changes import pixel_set, write_changed_scene
+from benchmarks.synthetic import write_synthetic_tiff
+from ml.changes import EXTINGUISHED, evict_footprints, open_footprint
+from ml.pipeline import detect_fire_changes, generate_fire_detections
+
+
+@pytest.fixture(scope="module")
+def changed_scene(scene, tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("changes")
+    other = write_synthetic_tiff(
+        str(tmp / "other.tiff"), 256, 256, seed=1, fire_fraction=0.01
+    )
+    return write_changed_scene(str(tmp / "changed.tiff"), scene, other, 0.25)
+
+
+def test_zero_tolerance_matches_full_run(csv_info, scene, changed_scene, tmp_path):
+    store = str(tmp_path / "changes")
+    previous, _ = detect_fire_changes(csv_info, scene, store, tolerance=0)
+    detections, stats = detect_fire_changes(csv_info, changed_scene, store, tolerance=0)
+    full = generate_fire_detections(csv_info, changed_scene)
+
+    assert stats["rescored_fraction"] < 1
+    extinguished = detections[:, 3] == EXTINGUISHED
+    current = (pixel_set(previous) | pixel_set(detections[~extinguished])) - (
+        pixel_set(detections[extinguished])
+    )
+    assert current == pixel_set(full)
+
+    # The changed fire pixels carry the probabilities of the full run, up to
+    # the float32 the state stores them in.
+    full_proba = {tuple(row[:2]): row[2] for row in full.tolist()}
+    for x, y, proba, _ in detections[~extinguished].tolist():
+        assert proba == pytest.approx(full_proba[x, y], abs=1e-6)
+
+
+def make_state(root, index, used):
+    # Footprints on different grids, last updated at `used`.
+    transform = Affine.translation(500000.0 + index, 6000000.0)
+    store = os.path.join(root, "model")
+    with open_footprint(store, None, transform, (16, 16), np.float32) as state:
+        state.commit("fingerprint")
+    os.utime(state.meta_path, (used, used))
+    return state.directory
+
+
+def test_evict_footprints_by_age(tmp_path):
+    now = time.time()
+    old = make_state(tmp_path, 0, now - 3600)
+    recent = make_state(tmp_path, 1, now)
+
+    assert evict_footprints(str(tmp_path), max_age_seconds=600) == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(recent)
+
+
+def test_evict_footprints_by_size_keeps_the_most_recent(tmp_path):
+    now = time.time()
+    states = [make_state(tmp_path, i, now - 60 * (3 - i)) for i in range(3)]
+
+    assert evict_footprints(str(tmp_path), max_bytes=1) == 2
+    assert [os.path.exists(state) for state in states] == [False, False, True]
+
+
+def test_evict_footprints_skips_states_in_use(tmp_path):
+    state = make_state(tmp_path, 0, time.time() - 3600)
+
+    store = os.path.join(tmp_path, "model")
+    transform = Affine.translation(500000.0, 6000000.0)
+    with open_footprint(store, None, transform, (16, 16), np.float32):
+        assert evict_footprints(str(tmp_path), max_age_seconds=600) == 0
+    assert os.path.exists(state)
@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.synthetic import CSV_PATH, synthetic_csv, write_synthetic_tiff
+
+# The settings are required, the tests do not reach the database.
+for name, value in {
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "postgres",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "DEBUG": "true",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture(scope="session")
+def scene(tmp_path_factory):
+    path = tmp_path_factory.mktemp("scenes") / "scene.tiff"
+    return write_synthetic_tiff(str(path), 256, 256, fire_fraction=0.01)
+
+
+@pytest.fixture(scope="session")
+def csv_info():
+    return synthetic_csv()
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from app import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def upload(scene):
+    # The multipart files of a /api/v1/ml request with the test scene.
+    with open(CSV_PATH, "rb") as csv_file, open(scene, "rb") as tiff_file:
+        yield {
+            "csv_file": ("test.csv", csv_file.read(), "text/csv"),
+            "tiff_file": ("scene.tiff", tiff_file.read(), "image/tiff"),
+        }
+
+
+@pytest.fixture
+def database(tmp_path):
+    # The tables in a SQLite file instead of Postgres, also used by the
+    # routes; skipped without the aiosqlite driver.
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app import app
+    from configs.Database import get_db_connection
+    from models.BaseModel import EntityMeta
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(EntityMeta.metadata.create_all)
+
+    asyncio.run(create_tables())
+    session = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db_connection():
+        async with session() as db:
+            yield db
+
+    app.dependency_overrides[get_db_connection] = get_test_db_connection
+    yield session
+    del app.dependency_overrides[get_db_connection]
+    asyncio.run(engine.dispose())
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from benchmarks.entropy import generic_entropy
+from ml.constants import ENTROPY_BINS
+from ml.utils import local_entropy
+
+
+def levels_band(height, width, seed=0):
+    # Integer values spanning fewer than ENTROPY_BINS steps land in distinct
+    # bins both of the per-window histogram of the original `entropy` and of
+    # the fixed bins of `local_entropy`, so both compute the same feature.
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, ENTROPY_BINS, size=(height, width)).astype("uint16")
+
+
+def test_matches_original_entropy():
+    band = levels_band(48, 40)
+
+    actual = local_entropy(band, value_range=(0, ENTROPY_BINS - 1))
+
+    np.testing.assert_allclose(actual, generic_entropy(band), atol=1e-5)
+
+
+def test_constant_neighbourhoods_have_zero_entropy():
+    band = np.full((16, 16), 7, dtype="uint16")
+    band[8:] = 3
+
+    actual = local_entropy(band, value_range=(0, ENTROPY_BINS - 1))
+
+    np.testing.assert_allclose(actual, generic_entropy(band), atol=1e-5)
+    assert actual[0, 0] == pytest.approx(0, abs=1e-5)
+
+
+def test_strips_match_the_whole_band():
+    band = np.random.default_rng(1).integers(0, 4000, size=(70, 50)).astype("uint16")
+
+    whole = local_entropy(band, value_range=(0, 3999))
+    strips = local_entropy(band, value_range=(0, 3999), strip_rows=16)
+
+    np.testing.assert_array_equal(strips, whole)
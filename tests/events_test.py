@@ -0,0 +1,61 @@
+import numpy as np
+from affine import Affine
+
+from ml.events import fire_events
+
+TRANSFORM = Affine(10.0, 0.0, 500000.0, 0.0, -10.0, 6000000.0)
+
+
+def event_raster():
+    proba = np.zeros((12, 12), dtype=np.float32)
+    proba[0, 9:11] = 0.9  # first event in row-major order
+    proba[1:4, 1] = 0.7
+    proba[3, 2] = 0.6  # an L shape, first pixel (1, 1)
+    proba[6:9, 4:8] = 0.8
+    proba[7, 6] = np.nan
+    proba[10, 2] = 0.55
+    proba[11, 3] = 0.95  # diagonal neighbour of (10, 2)
+    return proba
+
+
+def first_pixel(feature):
+    # The top-left corner of the first pixel is the first outline vertex in
+    # row-major order.
+    ring = feature["geometry"]["coordinates"][0]
+    return min(
+        (round(row), round(col)) for col, row in (~TRANSFORM * tuple(xy) for xy in ring)
+    )
+
+
+def test_events_in_row_major_order_of_their_first_pixel():
+    # GDAL emits the polygons of this raster in another order.
+    fire = np.random.default_rng(0).random((10, 10)) > 0.6
+
+    events = fire_events(fire.astype(np.float32), TRANSFORM, 0.5)["features"]
+
+    first_pixels = [first_pixel(feature) for feature in events]
+    assert first_pixels == sorted(first_pixels)
+    assert len(first_pixels) == 8
+
+
+def test_event_pixels():
+    events = fire_events(event_raster(), TRANSFORM, 0.5)["features"]
+
+    assert [feature["properties"]["pixels"] for feature in events] == [2, 4, 11, 2]
+
+
+def test_connectivity():
+    four = fire_events(event_raster(), TRANSFORM, 0.5, connectivity=4)["features"]
+    eight = fire_events(event_raster(), TRANSFORM, 0.5, connectivity=8)["features"]
+
+    assert len(four) == len(eight) + 1
+    assert sum(f["properties"]["pixels"] for f in four) == 19
+
+
+def test_statistics():
+    events = fire_events(event_raster(), TRANSFORM, 0.5)["features"]
+    first = events[0]["properties"]
+
+    assert first["area"] == 200.0
+    assert first["max_probability"] == 0.9
+    assert first["centroid"] == [TRANSFORM.c + 100.0, TRANSFORM.f - 5.0]
@@ -0,0 +1,145 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from convertors import fire_points
+from convertors.fire_points import (
+    COLUMNAR,
+    COLUMNAR_HEADER,
+    COLUMNAR_MAGIC,
+    GEOJSON,
+    PACKED,
+    encode_columnar,
+    encode_geojson,
+    encode_packed,
+    encode_tile,
+    negotiate,
+)
+
+URL = "/api/v1/ml/fire_points"
+
+
+@pytest.fixture
+def detections(monkeypatch):
+    # Small chunks, so the points cross chunk boundaries.
+    monkeypatch.setattr(fire_points, "CHUNK_POINTS", 7)
+    rng = np.random.default_rng(0)
+    x = rng.uniform(500000, 510000, 50)
+    y = rng.uniform(5990000, 6000000, 50)
+    return np.column_stack([x, y, rng.uniform(0.5, 1, 50)])
+
+
+def decode_packed(body: bytes) -> np.ndarray:
+    return np.frombuffer(body, dtype="<f4").reshape(-1, 3)
+
+
+def decode_columnar(body: bytes) -> np.ndarray:
+    magic, count = COLUMNAR_HEADER.unpack_from(body)
+    assert magic == COLUMNAR_MAGIC
+    offset = COLUMNAR_HEADER.size
+    columns = []
+    for dtype in ("<f8", "<f8", "<f4"):
+        column = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+        offset += column.nbytes
+        columns.append(column)
+    assert offset == len(body)
+    return np.column_stack(columns)
+
+
+def geojson_coords(body: bytes) -> np.ndarray:
+    points = json.loads(body)
+    assert all(point["type"] == "Point" for point in points)
+    return np.array([point["coordinates"] for point in points]).reshape(-1, 2)
+
+
+def test_geojson_round_trip(detections):
+    body = b"".join(encode_geojson(detections))
+
+    # geojson rounds the coordinates to 6 decimals.
+    np.testing.assert_allclose(geojson_coords(body), detections[:, :2], atol=1e-6)
+
+
+def test_packed_round_trip(detections):
+    decoded = decode_packed(b"".join(encode_packed(detections)))
+
+    # float32 keeps projected coordinates to well under a pixel.
+    np.testing.assert_allclose(decoded[:, :2], detections[:, :2], atol=0.5)
+    np.testing.assert_allclose(decoded[:, 2], detections[:, 2], rtol=1e-6)
+
+
+def test_columnar_round_trip(detections):
+    decoded = decode_columnar(b"".join(encode_columnar(detections)))
+
+    np.testing.assert_array_equal(decoded[:, :2], detections[:, :2])
+    np.testing.assert_allclose(decoded[:, 2], detections[:, 2], rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "encode, expected",
+    [
+        (encode_geojson, b"[]"),
+        (encode_packed, b""),
+        (encode_columnar, struct.pack("<4sQ", COLUMNAR_MAGIC, 0)),
+    ],
+)
+def test_no_points(encode, expected):
+    assert b"".join(encode(np.empty((0, 3)))) == expected
+
+
+def test_tile_line(detections):
+    line = encode_tile(3, "scene.tiff", detections)
+
+    assert line.endswith(b"}\n") and line.count(b"\n") == 1
+    tile = json.loads(line)
+    assert (tile["index"], tile["filename"]) == (3, "scene.tiff")
+    assert tile["points"] == json.loads(b"".join(encode_geojson(detections)))
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, GEOJSON),
+        ("", GEOJSON),
+        ("*/*", GEOJSON),
+        ("application/geo+json", GEOJSON),
+        (PACKED, PACKED),
+        (f"{GEOJSON};q=0.5, {COLUMNAR}", COLUMNAR),
+        (f"{PACKED};q=0.8, {COLUMNAR};q=0.9", COLUMNAR),
+        # Equal qualities keep the order of the header.
+        (f"{PACKED};q=0.5, {COLUMNAR};q=0.5", PACKED),
+        (f"{PACKED};q=0, */*;q=0.1", GEOJSON),
+        (f"{PACKED};q=high, {COLUMNAR};q=0.1", COLUMNAR),
+        ("text/html", None),
+        (f"{PACKED};q=0", None),
+    ],
+)
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_formats_carry_the_same_points(client, upload):
+    bodies = {
+        media_type: client.post(URL, files=upload, headers={"Accept": media_type})
+        for media_type in (GEOJSON, PACKED, COLUMNAR)
+    }
+    for media_type, response in bodies.items():
+        assert response.status_code == 200
+        assert response.headers["content-type"] == media_type
+
+    coords = geojson_coords(bodies[GEOJSON].content)
+    assert len(coords)
+    np.testing.assert_allclose(
+        decode_packed(bodies[PACKED].content)[:, :2], coords, atol=0.5
+    )
+    np.testing.assert_allclose(
+        decode_columnar(bodies[COLUMNAR].content)[:, :2], coords, atol=1e-6
+    )
+
+
+def test_unsupported_accept_is_not_acceptable(client, upload):
+    response = client.post(URL, files=upload, headers={"Accept": "text/html"})
+
+    assert response.status_code == 406
+    assert PACKED in response.json()["detail"]
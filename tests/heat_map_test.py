@@ -0,0 +1,34 @@
+import numpy as np
+
+from ml.constants import HEAT_MAP_MAX_CELL_SIZE
+from ml.heatmap import pool_blocks
+
+
+def test_cell_larger_than_raster_is_one_cell():
+    proba = np.random.default_rng(0).random((256, 128), dtype=np.float32)
+
+    grid = pool_blocks(proba, 100000, "max")
+
+    assert grid.shape == (1, 1)
+    assert grid[0, 0] == proba.max()
+
+
+def test_cell_size_out_of_range_is_rejected(client, upload):
+    response = client.post(
+        "/api/v1/ml/heat_map",
+        params={"cell_size": HEAT_MAP_MAX_CELL_SIZE + 1},
+        files=upload,
+    )
+
+    assert response.status_code == 422
+
+
+def test_cell_size_at_the_limit(client, upload):
+    response = client.post(
+        "/api/v1/ml/heat_map",
+        params={"cell_size": HEAT_MAP_MAX_CELL_SIZE},
+        files=upload,
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()["features"]) == 1
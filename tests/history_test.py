@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+import rasterio
+from fastapi import HTTPException
+
+from models.FirePoint import GRID_CELL_DEGREES, grid_cell_ranges, grid_cells
+from models.Scene import Scene
+from repositories.FirePointRepository import FirePointRepository
+from services.history import HistoryService, decode_cursor, encode_cursor
+
+ACQUIRED_AT = datetime(2024, 7, 1, tzinfo=timezone.utc)
+
+
+def new_scene(content_hash, acquired_at):
+    return Scene(
+        content_hash=content_hash,
+        model_version="1",
+        threshold=0.5,
+        crs="EPSG:4326",
+        bounds=[0, 0, 1, 1],
+        acquired_at=acquired_at,
+    )
+
+
+def store_scene(database, content_hash, acquired_at, lonlat):
+    lonlat = np.asarray(lonlat, dtype=np.float64)
+
+    async def create():
+        async with database() as db:
+            return await FirePointRepository(db).create_scene(
+                new_scene(content_hash, acquired_at), lonlat, np.full(len(lonlat), 0.9)
+            )
+
+    return asyncio.run(create())
+
+
+def find_pages(database, bbox, limit, start=None, end=None):
+    # Every page of a bbox query, following `next_cursor`.
+    async def find():
+        pages, cursor = [], None
+        async with database() as db:
+            service = HistoryService(FirePointRepository(db))
+            while True:
+                page = await service.find_points(bbox, start, end, cursor, limit)
+                pages.append(page["items"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    return pages
+
+    return asyncio.run(find())
+
+
+def test_grid_cell_ranges_cover_the_points_of_a_bbox():
+    bbox = (30.03, 59.9, 30.41, 60.07)
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(bbox[0], bbox[2], 1000)
+    lat = rng.uniform(bbox[1], bbox[3], 1000)
+
+    ranges = grid_cell_ranges(*bbox)
+    cells = grid_cells(lon, lat)
+
+    assert len(ranges) == 4
+    assert all(any(first <= c <= last for first, last in ranges) for c in cells)
+    # A point one cell to the east is outside every range.
+    outside = grid_cells(np.array([bbox[2] + GRID_CELL_DEGREES]), np.array([60.0]))
+    assert not any(first <= outside[0] <= last for first, last in ranges)
+
+
+def test_grid_cells_of_the_antimeridian_stay_in_their_row():
+    cells = grid_cells(np.array([-180.0, 180.0]), np.array([0.0, 0.0]))
+
+    assert cells[1] == cells[0] + round(360 / GRID_CELL_DEGREES) - 1
+
+
+def test_cursor_round_trip():
+    class Point:
+        id = 42
+        detected_at = ACQUIRED_AT + timedelta(microseconds=7)
+
+    assert decode_cursor(encode_cursor(Point)) == (Point.detected_at, 42)
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("yesterday")
+
+    assert error.value.status_code == 400
+
+
+def test_pages_follow_detection_time(database):
+    later = ACQUIRED_AT + timedelta(days=1)
+    # The later scene is stored first, so ids do not follow detection time.
+    store_scene(database, "later", later, [[30.1, 60.0], [30.2, 60.0], [30.3, 60.0]])
+    store_scene(database, "earlier", ACQUIRED_AT, [[30.1, 60.0], [30.2, 60.0]])
+    store_scene(database, "away", ACQUIRED_AT, [[40.0, 50.0]])
+
+    pages = find_pages(database, (30.0, 59.9, 30.4, 60.1), limit=2)
+
+    points = [point for page in pages for point in page]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    keys = [(point["detected_at"], point["id"]) for point in points]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == 5
+
+    later_only = find_pages(database, (30.0, 59.9, 30.4, 60.1), limit=10, start=later)
+    assert len(later_only[0]) == 3
+
+
+def test_duplicate_scene_returns_the_stored_one(database):
+    first = store_scene(database, "same", ACQUIRED_AT, [[30.1, 60.0]])
+    second = store_scene(database, "same", ACQUIRED_AT, [[30.1, 60.0]])
+
+    assert second.id == first.id
+    assert len(find_pages(database, (30.0, 59.9, 30.4, 60.1), limit=10)[0]) == 1
+
+
+def test_persist_requires_a_georeferenced_scene(
+    database, client, upload, scene, tmp_path
+):
+    # The test scene without its CRS and transform: pixel coordinates only.
+    with rasterio.open(scene) as src:
+        data, profile = src.read(), src.profile
+    del profile["crs"], profile["transform"]
+    path = tmp_path / "no_crs.tiff"
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+
+    upload["tiff_file"] = ("no_crs.tiff", path.read_bytes(), "image/tiff")
+    response = client.post(
+        "/api/v1/ml/fire_points", params={"persist": "true"}, files=upload
+    )
+
+    assert response.status_code == 400
+    assert "georeferenced" in response.json()["detail"]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from benchmarks.inference import backend_proba, reference_proba
+from benchmarks.synthetic import synthetic_csv
+from ml.constants import MODEL_PATH, THRESHOLD
+from ml.features import assemble_features
+from ml.inference import CatBoostBackend
+from ml.processing import load_and_preprocess_tiff, process_csv
+from ml.registry import get_model
+
+
+@pytest.fixture(scope="module")
+def model():
+    return get_model(MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def features(model, scene):
+    pixel_data = load_and_preprocess_tiff(
+        scene, r_band=1, g_band=2, b_band=3, ik_band=4, mask_band=5
+    )
+    return assemble_features(
+        pixel_data, process_csv(synthetic_csv()), model.feature_names_
+    )
+
+
+@pytest.fixture(scope="module")
+def expected(model, features):
+    # The previous path: predict_proba on a DataFrame of the features.
+    proba = reference_proba(model, features)
+    assert (proba > THRESHOLD).any()
+    return proba
+
+
+def assert_same_decisions(actual, expected, atol):
+    np.testing.assert_allclose(actual, expected, atol=atol)
+    flipped = (actual > THRESHOLD) != (expected > THRESHOLD)
+    assert not flipped.any()
+
+
+@pytest.mark.parametrize("thread_count", [0, 1, 2])
+def test_catboost_backend_matches_dataframe(model, features, expected, thread_count):
+    actual = backend_proba(CatBoostBackend(model, thread_count), features)
+
+    assert_same_decisions(actual, expected, atol=1e-9)
+
+
+def test_onnx_backend_matches_dataframe(model, features, expected, tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from ml.inference import OnnxBackend, export_onnx
+
+    onnx_path = str(tmp_path / "model.onnx")
+    export_onnx(model, onnx_path)
+    actual = backend_proba(OnnxBackend(onnx_path, model.feature_names_), features)
+
+    # The trees are accumulated in float32.
+    assert_same_decisions(actual, expected, atol=1e-5)
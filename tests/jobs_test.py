@@ -0,0 +1,146 @@
+import asyncio
+import io
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from models.Job import JOB_DONE, JOB_QUEUED, JOB_RUNNING, Job
+from repositories.JobRepository import JobRepository
+from services import jobs
+
+
+@pytest.fixture
+def session(database, monkeypatch):
+    # The queue opens its own sessions.
+    monkeypatch.setattr(jobs, "async_session", database)
+    return database
+
+
+async def add_jobs(session, *new_jobs):
+    async with session() as db:
+        for job in new_jobs:
+            await JobRepository(db).create(job)
+
+
+async def statuses(session):
+    async with session() as db:
+        result = await JobRepository(db).list_by_status(
+            [JOB_QUEUED, JOB_RUNNING, JOB_DONE]
+        )
+        return {job.id: job.status for job in result}
+
+
+def new_job(job_id, status=JOB_QUEUED, input_dir="", **values):
+    return Job(
+        id=job_id, kind="test", status=status, params={}, input_dir=input_dir, **values
+    )
+
+
+def test_job_is_claimed_once(session):
+    async def main():
+        await add_jobs(session, new_job("a"))
+
+        async def claim():
+            async with session() as db:
+                return await JobRepository(db).claim("a")
+
+        return await asyncio.gather(claim(), claim()), await statuses(session)
+
+    claims, status = asyncio.run(main())
+
+    assert sorted(claims) == [False, True]
+    assert status == {"a": JOB_RUNNING}
+
+
+def test_start_requeues_unfinished_jobs_and_runs_them_once(session, monkeypatch):
+    runs = []
+
+    async def run_fire_points_job(job, repository):
+        runs.append(job.id)
+        return "result.npy"
+
+    monkeypatch.setattr(jobs, "run_fire_points_job", run_fire_points_job)
+
+    async def main():
+        # "running" was left behind by a stopped process.
+        await add_jobs(session, new_job("running", JOB_RUNNING), new_job("queued"))
+        queue = jobs.JobQueue(concurrency=2, max_queued=10)
+        await queue.start()
+        # Also submitted again, e.g. by a request racing the recovery.
+        queue.submit("queued")
+        await asyncio.wait_for(queue.queue.join(), timeout=5)
+        await queue.stop()
+        return await statuses(session)
+
+    status = asyncio.run(main())
+
+    assert sorted(runs) == ["queued", "running"]
+    assert status == {"queued": JOB_DONE, "running": JOB_DONE}
+
+
+def test_full_queue_removes_the_submitted_job(session, tmp_path, monkeypatch):
+    queue = jobs.JobQueue(concurrency=1, max_queued=1)
+    queue.submit("other")
+    # The queue fills up between the check and the submit.
+    monkeypatch.setattr(queue, "full", lambda: False)
+    monkeypatch.setattr(jobs, "get_job_queue", lambda: queue)
+
+    async def main():
+        async with session() as db:
+            service = jobs.JobService(JobRepository(db))
+            service.env = service.env.model_copy(
+                update={"ML_JOBS_DIR": str(tmp_path / "jobs")}
+            )
+            with pytest.raises(HTTPException) as error:
+                await service.submit_fire_points(
+                    UploadFile(io.BytesIO(b"csv"), filename="weather.csv"),
+                    UploadFile(io.BytesIO(b"tiff"), filename="scene.tiff"),
+                    None,
+                )
+        return error.value, await statuses(session)
+
+    error, status = asyncio.run(main())
+
+    assert error.status_code == 429
+    assert status == {}
+    assert os.listdir(tmp_path / "jobs") == []
+
+
+def test_expired_jobs_are_removed(session, tmp_path):
+    old_dir = tmp_path / "old"
+    old_dir.mkdir()
+    old = datetime.now(timezone.utc) - timedelta(days=2)
+
+    async def main():
+        await add_jobs(
+            session,
+            new_job("old", JOB_DONE, input_dir=str(old_dir), updated_at=old),
+            new_job("recent", JOB_DONE),
+            new_job("waiting", updated_at=old),
+        )
+        queue = jobs.JobQueue(concurrency=1, max_queued=1, retention_seconds=86400)
+        return await queue.remove_expired(), await statuses(session)
+
+    removed, status = asyncio.run(main())
+
+    assert removed == 1
+    assert status == {"recent": JOB_DONE, "waiting": JOB_QUEUED}
+    assert not old_dir.exists()
+
+
+def test_events_end_with_the_finished_job(session, client):
+    asyncio.run(add_jobs(session, new_job("done", JOB_DONE, progress=1.0)))
+
+    response = client.get("/api/v1/ml/jobs/done/events")
+
+    assert response.status_code == 200
+    events = [line for line in response.text.splitlines() if line]
+    assert len(events) == 1
+    assert json.loads(events[0].removeprefix("data: "))["status"] == JOB_DONE
+
+
+def test_events_of_an_unknown_job(session, client):
+    assert client.get("/api/v1/ml/jobs/missing/events").status_code == 404
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import rasterio
+
+from ml.pipeline import generate_fire_detections, stream_fire_detections
+from ml.processing import read_valid_mask
+
+
+@pytest.fixture(scope="module")
+def expected(csv_info, scene):
+    return generate_fire_detections(csv_info, scene)
+
+
+def write_variant(scene, path, edit, **profile):
+    # The test scene with its bands changed by `edit` and its profile updated.
+    with rasterio.open(scene) as src:
+        data, base = src.read(), src.profile
+    data = edit(data)
+    base.update(count=len(data), **profile)
+    with rasterio.open(path, "w", **base) as dst:
+        dst.write(data)
+    return str(path)
+
+
+def pixels(detections, scene):
+    with rasterio.open(scene) as src:
+        cols, rows = ~src.transform * (detections[:, 0], detections[:, 1])
+    return np.floor(rows).astype(int), np.floor(cols).astype(int)
+
+
+def nodata_rows(data):
+    # A nodata border over the bottom rows, where the scene has fires.
+    data = data.copy()
+    data[:, 200:] = 0
+    return data
+
+
+def cloud_band(data):
+    # A mask band with a cloud over the left columns, where the scene has
+    # fires.
+    mask = np.ones(data.shape[1:], dtype=data.dtype)
+    mask[:, :40] = 0
+    return np.concatenate([data, mask[None]])
+
+
+@pytest.mark.parametrize(
+    "edit, profile, invalid",
+    [
+        (nodata_rows, {"nodata": 0}, lambda rows, cols: rows >= 200),
+        (cloud_band, {}, lambda rows, cols: cols < 40),
+    ],
+)
+def test_masked_pixels_are_skipped(
+    csv_info, scene, expected, tmp_path, edit, profile, invalid
+):
+    variant = write_variant(scene, tmp_path / "variant.tiff", edit, **profile)
+    masked = invalid(*pixels(expected, scene))
+    assert masked.any()
+
+    with rasterio.open(variant) as src:
+        valid = read_valid_mask(src, mask_band=5)
+    rows, cols = np.indices(valid.shape)
+    np.testing.assert_array_equal(valid, ~invalid(rows, cols))
+
+    # No points under the mask, the same points and probabilities elsewhere,
+    # whether the scene is read whole or in tiles.
+    np.testing.assert_array_equal(
+        generate_fire_detections(csv_info, variant), expected[~masked]
+    )
+    tiles = np.concatenate(list(stream_fire_detections(csv_info, variant, 100)))
+    assert not invalid(*pixels(tiles, scene)).any()
+    assert len(tiles) == (~masked).sum()
+
+
+def test_unmasked_scene_has_no_mask(scene):
+    with rasterio.open(scene) as src:
+        assert read_valid_mask(src, mask_band=5) is None
@@ -0,0 +1,94 @@
+import re
+
+import pytest
+
+from configs.Environment import get_environment_variables
+from services import ml
+from services.cache import ResultCache
+
+SAMPLE = re.compile(r"^(\w+)(\{.*\})? (\S+)$")
+
+
+@pytest.fixture(autouse=True)
+def uncached(monkeypatch):
+    # Cache hits skip the pipeline stages, every request here runs them.
+    monkeypatch.setattr(ml, "get_result_cache", lambda: ResultCache(memory_bytes=0))
+
+
+@pytest.fixture
+def server_timing(monkeypatch):
+    monkeypatch.setattr(get_environment_variables(), "ML_SERVER_TIMING", True)
+
+
+def parse_timing(header):
+    entries = {}
+    for entry in header.split(", "):
+        name, duration = entry.split(";dur=")
+        entries[name] = float(duration)
+    return entries
+
+
+def parse_metrics(text):
+    # {(name, labels): value} of the samples, HELP and TYPE lines checked.
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) \w+ ", line), line
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        samples[name, labels or ""] = float(value)
+    return samples
+
+
+def test_server_timing_of_a_json_response(client, upload, server_timing):
+    response = client.post("/api/v1/ml/heat_map", files=upload)
+
+    assert response.status_code == 200
+    timing = parse_timing(response.headers["Server-Timing"])
+    assert {"decode", "features", "predict", "serialize", "total"} <= set(timing)
+    assert timing["predict"] <= timing["total"]
+
+
+def test_server_timing_of_a_streamed_response(client, upload, server_timing):
+    response = client.post("/api/v1/ml/fire_points", files=upload)
+
+    assert response.status_code == 200
+    timing = parse_timing(response.headers["Server-Timing"])
+    # The body is encoded after the headers are sent.
+    assert "predict" in timing
+    assert "serialize" not in timing
+
+
+def test_no_server_timing_by_default(client, upload):
+    response = client.post("/api/v1/ml/heat_map", files=upload)
+
+    assert "Server-Timing" not in response.headers
+
+
+def test_prometheus_metrics(client, upload):
+    client.post("/api/v1/ml/fire_points", files=upload)
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = parse_metrics(response.text)
+
+    request = '{method="POST",path="/api/v1/ml/fire_points",status="200"}'
+    assert samples["ml_request_duration_seconds_count", request] >= 1
+    predict = [
+        labels
+        for name, labels in samples
+        if name == "ml_stage_duration_seconds_count" and 'stage="predict"' in labels
+    ]
+    assert predict
+    assert samples["ml_stage_pixels_total", predict[0]] > 0
+    assert any(name == "ml_model_pixels_total" for name, _ in samples)
+    assert samples["ml_peak_rss_bytes", '{process="api"}'] > 0
+
+    # Every histogram ends with its +Inf bucket, equal to the count.
+    for (name, labels), value in samples.items():
+        if name.endswith("_count"):
+            bucket = labels[:-1] + (',le="+Inf"}' if labels else '{le="+Inf"}')
+            assert samples[name.removesuffix("_count") + "_bucket", bucket] == value
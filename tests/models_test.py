@@ -0,0 +1,20 @@
+import json
+
+import app
+
+
+def test_unknown_model_is_a_bad_request(client):
+    response = client.get("/api/v1/ml/models", headers={"X-Model": "missing"})
+
+    assert response.status_code == 400
+    assert "missing" in response.json()["detail"]
+
+
+def test_broken_model_set_is_a_server_error(client, monkeypatch):
+    def load_models():
+        return json.loads("{")
+
+    monkeypatch.setattr(app, "load_models", load_models)
+    response = client.get("/api/v1/ml/models")
+
+    assert response.status_code == 500
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.warp import transform_bounds
+
+from ml.mosaic import aoi_tiles, footprint_index, parse_aoi
+
+UTM = "EPSG:32633"
+ORIGIN = (500000.0, 6650000.0)
+
+
+def write_scene(path, crs, transform, height, width, nodata_cols=0):
+    bands = np.full((4, height, width), 1000, dtype="uint16")
+    bands[:, :, :nodata_cols] = 0
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=4,
+        dtype="uint16",
+        crs=crs,
+        transform=transform,
+        nodata=0,
+    ) as dst:
+        dst.write(bands)
+    return str(path)
+
+
+def aoi_of(path):
+    with rasterio.open(path) as src:
+        return parse_aoi(bbox=transform_bounds(src.crs, "EPSG:4326", *src.bounds))
+
+
+def test_scenes_are_ranked_by_resolution_in_metres(tmp_path):
+    utm = write_scene(tmp_path / "utm.tiff", UTM, from_origin(*ORIGIN, 10, 10), 8, 8)
+    # 2e-4 degrees are about 22 m north-south and 11 m east-west at 60°N.
+    lon, lat = 15.0, 60.0
+    degrees = write_scene(
+        tmp_path / "degrees.tiff", "EPSG:4326", from_origin(lon, lat, 2e-4, 2e-4), 8, 8
+    )
+
+    footprints = footprint_index(str(tmp_path))
+
+    assert [f.path for f in footprints] == [utm, degrees]
+    assert footprints[0].resolution == pytest.approx(10, rel=0.01)
+    assert footprints[1].resolution == pytest.approx(15.6, rel=0.02)
+
+
+def test_nodata_of_an_earlier_scene_is_claimed_by_the_next(tmp_path):
+    # The 10 m scene comes first but has no data in its left half, which the
+    # 20 m scene covering the same ground fills in.
+    fine = write_scene(
+        tmp_path / "fine.tiff",
+        UTM,
+        from_origin(*ORIGIN, 10, 10),
+        20,
+        20,
+        nodata_cols=10,
+    )
+    coarse = write_scene(
+        tmp_path / "coarse.tiff", UTM, from_origin(*ORIGIN, 20, 20), 10, 10
+    )
+
+    tiles = aoi_tiles(footprint_index(str(tmp_path)), aoi_of(fine), 1024)
+    assert [tile.path for tile in tiles] == [fine, coarse]
+
+    with rasterio.open(coarse) as src:
+        tile = tiles[1]
+        claimed = tile.claim_mask(src.window_transform(tile.window))
+
+    expected = np.zeros((10, 10), dtype=bool)
+    expected[:, :5] = True
+    np.testing.assert_array_equal(claimed, expected)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import write_synthetic_tiff
+from ml.constants import SCREEN_THRESHOLD
+from ml.pipeline import generate_fire_detections, screen_fire_detections
+
+
+@pytest.fixture(scope="module", params=[0, 1, 2])
+def sparse_scene(request, tmp_path_factory):
+    # Few fire clusters on a large background, the case screening is for.
+    path = tmp_path_factory.mktemp("scenes") / f"sparse_{request.param}.tiff"
+    return write_synthetic_tiff(
+        str(path), 512, 512, seed=request.param, fire_fraction=0.002
+    )
+
+
+def test_screening_keeps_every_fire(csv_info, sparse_scene):
+    expected = generate_fire_detections(csv_info, sparse_scene)
+    detections, screening = screen_fire_detections(
+        csv_info, sparse_scene, SCREEN_THRESHOLD
+    )
+
+    assert len(expected)
+    assert screening["skipped_fraction"] > 0.5
+    np.testing.assert_array_equal(detections, expected)
+
+
+def test_zero_threshold_keeps_every_block(csv_info, scene):
+    detections, screening = screen_fire_detections(csv_info, scene, 0.0)
+
+    assert screening["skipped_fraction"] == 0
+    np.testing.assert_array_equal(detections, generate_fire_detections(csv_info, scene))
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from benchmarks.spectral import LEGACY_INDICES, synthetic_bands
+from ml.utils import SPECTRAL_INDICES, calculate_additional_features
+
+# EVI denominators close to zero only keep about four significant digits in
+# float32, the other indices stay within 1e-6.
+RTOL = 1e-4
+ATOL = 1e-6
+
+
+# The last two are bright pixels, e.g. fires, whose band sums overflow 16 bits.
+@pytest.mark.parametrize(
+    "dtype, high",
+    [
+        ("uint16", 4000),
+        ("int16", 4000),
+        ("float32", 4000),
+        ("uint16", 65536),
+        ("int16", 32768),
+    ],
+)
+def test_float32_indices_match_float64_formulas(dtype, high):
+    bands = synthetic_bands(128, dtype, high=high)
+    # Integer bands go through the formulas as is, their differences wrap
+    # around like the model was trained with; float bands in float64.
+    reference = bands if bands.dtype.kind in "iu" else bands.astype("f8")
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        indices = calculate_additional_features(*bands)
+
+        for name, value in zip(SPECTRAL_INDICES, indices):
+            assert value.dtype == np.float32
+            np.testing.assert_allclose(
+                value,
+                LEGACY_INDICES[name](*reference),
+                rtol=RTOL,
+                atol=ATOL,
+                err_msg=name,
+            )
+
+
+def test_savi_denominator_wraps_around_for_integer_bands():
+    red, nir = np.array([30000], dtype="uint16"), np.array([40000], dtype="uint16")
+    bands = red, red, red, nir
+
+    savi = calculate_additional_features(*bands)[SPECTRAL_INDICES.index("savi")]
+
+    np.testing.assert_allclose(savi, LEGACY_INDICES["savi"](*bands), rtol=RTOL)
+    assert savi[0] == pytest.approx(3.3598, abs=1e-4)
+
+
+def test_indices_are_written_into_the_buffer():
+    bands = synthetic_bands(64, "uint16")
+    out = np.empty((len(SPECTRAL_INDICES), 64, 64), dtype=np.float32)
+
+    indices = calculate_additional_features(*bands, out=out)
+
+    for index, value in enumerate(indices):
+        assert np.shares_memory(value, out[index])
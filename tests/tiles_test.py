@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.windows import Window
+
+from ml.pipeline import (
+    generate_fire_detections,
+    stream_fire_detections,
+    stream_fire_points,
+    window_fire_detections,
+)
+from ml.processing import (
+    ENTROPY_FEATURES,
+    band_range,
+    iter_row_windows,
+    process_csv,
+    read_pixel_data,
+)
+
+# Does not divide the 256 pixel test scene, so the last tiles are cut short,
+# and the seams cut through fire clusters of the scene.
+TILE_SIZE = 75
+SEAMS = range(TILE_SIZE, 256, TILE_SIZE)
+
+
+@pytest.fixture(scope="module")
+def expected(csv_info, scene):
+    return generate_fire_detections(csv_info, scene)
+
+
+def sorted_rows(detections):
+    return detections[np.lexsort((detections[:, 0], detections[:, 1]))]
+
+
+def pixels(detections, scene):
+    with rasterio.open(scene) as src:
+        cols, rows = ~src.transform * (detections[:, 0], detections[:, 1])
+    return np.floor(rows).astype(int), np.floor(cols).astype(int)
+
+
+def test_fires_lie_across_the_tile_seams(expected, scene):
+    for index in pixels(expected, scene):
+        found = set(index.tolist())
+        assert any({seam - 1, seam} <= found for seam in SEAMS)
+
+
+def test_tiles_match_the_whole_scene(csv_info, scene, expected):
+    tiles = list(stream_fire_detections(csv_info, scene, TILE_SIZE))
+    streamed = np.concatenate(tiles)
+
+    assert len(tiles) == 16
+    np.testing.assert_array_equal(sorted_rows(streamed), sorted_rows(expected))
+
+
+def test_streamed_points_match_the_whole_scene(csv_info, scene, expected):
+    points = list(stream_fire_points(csv_info, scene, TILE_SIZE))
+    coords = np.array([point["coordinates"] for point in points])
+
+    # GeoJSON rounds the coordinates to 6 decimals.
+    np.testing.assert_allclose(
+        sorted_rows(coords), sorted_rows(expected[:, :2]), atol=1e-6
+    )
+
+
+def test_row_strips_keep_the_row_major_order(csv_info, scene, expected):
+    csv_mean_data = process_csv(csv_info)
+    strips = [
+        window_fire_detections(csv_mean_data, scene, window)
+        for window in iter_row_windows(256, 256, TILE_SIZE)
+    ]
+
+    np.testing.assert_array_equal(np.concatenate(strips), expected)
+
+
+def test_entropy_of_tiles_matches_the_whole_scene(scene):
+    bands = dict(r_band=1, g_band=2, b_band=3, ik_band=4, mask_band=5)
+    with rasterio.open(scene) as src:
+        ranges = band_range(src, 1), band_range(src, 4)
+        whole = read_pixel_data(src, **bands, entropy=True, entropy_ranges=ranges)
+        whole = whole[list(ENTROPY_FEATURES)].to_numpy().reshape(256, 256, -1)
+
+        for row in range(0, 256, TILE_SIZE):
+            for col in range(0, 256, TILE_SIZE):
+                window = Window(col, row, TILE_SIZE, TILE_SIZE).intersection(
+                    Window(0, 0, 256, 256)
+                )
+                tile = read_pixel_data(
+                    src, **bands, window=window, entropy=True, entropy_ranges=ranges
+                )
+                # The same histograms, summed in another order in float32.
+                np.testing.assert_allclose(
+                    tile[list(ENTROPY_FEATURES)].to_numpy(),
+                    whole[window.toslices()].reshape(-1, len(ENTROPY_FEATURES)),
+                    atol=1e-6,
+                )
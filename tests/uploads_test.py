@@ -0,0 +1,68 @@
+import httpx
+import pytest
+
+from configs.Environment import get_environment_variables
+
+URL = "/api/v1/ml/fire_points"
+
+
+@pytest.fixture
+def max_upload_bytes(monkeypatch):
+    # Lower limits, so the test scene is over the single scene one.
+    env = get_environment_variables()
+    monkeypatch.setattr(env, "ML_MAX_UPLOAD_BYTES", 64 * 1024)
+    monkeypatch.setattr(env, "ML_MAX_BATCH_UPLOAD_BYTES", 64 * 1024 * 1024)
+    return env.ML_MAX_UPLOAD_BYTES
+
+
+def chunked(files, chunk_size=16 * 1024):
+    # The multipart body of `files` and its content type, as a generator:
+    # the request is sent without Content-Length.
+    request = httpx.Request("POST", "http://test", files=files)
+    body = request.read()
+    chunks = (body[i : i + chunk_size] for i in range(0, len(body), chunk_size))
+    return chunks, request.headers["content-type"]
+
+
+def test_oversized_body_with_content_length(client, upload, max_upload_bytes):
+    response = client.post(URL, files=upload)
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Request body is too large."
+
+
+def test_oversized_body_without_content_length(client, upload, max_upload_bytes):
+    chunks, content_type = chunked(upload)
+    response = client.post(URL, content=chunks, headers={"content-type": content_type})
+
+    assert "content-length" not in response.request.headers
+    # Stopped while receiving, not by the size check of the spooled file.
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Request body is too large."
+
+
+def test_body_without_content_length_within_the_limit(client, upload):
+    chunks, content_type = chunked(upload)
+    response = client.post(URL, content=chunks, headers={"content-type": content_type})
+
+    assert response.status_code == 200
+
+
+def test_batch_bodies_have_their_own_limit(client, upload, max_upload_bytes):
+    files = [
+        ("csv_file", upload["csv_file"]),
+        ("tiff_files", upload["tiff_file"]),
+        ("tiff_files", upload["tiff_file"]),
+    ]
+    response = client.post(f"{URL}/batch", files=files)
+
+    assert response.status_code == 413
+    assert "scene.tiff is larger than" in response.json()["detail"]
+
+
+def test_invalid_tiff_signature(client, upload):
+    upload["tiff_file"] = ("scene.tiff", b"not a tiff at all", "image/tiff")
+    response = client.post(URL, files=upload)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid TIFF file. Please upload a TIFF file."
@@ -0,0 +1,96 @@
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import CSV_PATH
+from ml.processing import process_csv
+from ml.weather import WeatherHistory, weather_features
+from services.weather import WeatherStore, station_key
+
+WINDOWS = (
+    (10, "mean", "{column}"),
+    (3, "max", "{column}_max_3"),
+    ("7d", "trend", "{column}_trend_7d"),
+    ("48h", "sum", "{column}_sum_48h"),
+)
+
+
+@pytest.fixture(scope="module")
+def csv_bytes():
+    with open(CSV_PATH, "rb") as file:
+        return file.read()
+
+
+def split_rows(csv_bytes, rows):
+    # The file with its header and first `rows` data rows, and the rest.
+    lines = csv_bytes.splitlines(keepends=True)
+    return b"".join(lines[: rows + 1]), b"".join(lines[rows + 1 :])
+
+
+def test_default_features_are_the_mean_of_the_last_ten_rows(csv_bytes):
+    frame = pd.read_csv(io.BytesIO(csv_bytes))
+
+    expected = frame.iloc[:, 1:].tail(10).mean()
+
+    pd.testing.assert_series_equal(process_csv(frame), expected, check_names=False)
+
+
+@pytest.mark.parametrize("windows", [None, WINDOWS])
+@pytest.mark.parametrize("rows", [1, 5, 30])
+def test_incremental_update_equals_full_parse(csv_bytes, windows, rows):
+    windows = windows or ((10, "mean", "{column}"),)
+    head, rest = split_rows(csv_bytes, rows)
+
+    history = WeatherHistory(windows)
+    assert not history.update(io.BytesIO(head))
+    assert history.update(io.BytesIO(head + rest))
+
+    full = pd.read_csv(io.BytesIO(csv_bytes))
+    pd.testing.assert_series_equal(
+        weather_features(history.frame, windows), weather_features(full, windows)
+    )
+
+
+def test_changed_rows_are_parsed_again(csv_bytes):
+    head, rest = split_rows(csv_bytes, 30)
+    history = WeatherHistory()
+    history.update(io.BytesIO(head))
+
+    # The previous last row is changed, not only appended to.
+    lines = head.splitlines(keepends=True)
+    edited = b"".join(lines[:-1]) + lines[-1].replace(b"2019", b"2020") + rest
+
+    assert not history.update(io.BytesIO(edited))
+
+
+def test_appended_rows_keep_the_station(csv_bytes):
+    head, rest = split_rows(csv_bytes, 1)
+    # The last row has no line ending yet.
+    first = io.BytesIO(head.rstrip(b"\n"))
+
+    assert station_key(first) == station_key(io.BytesIO(head + rest))
+    assert station_key(first) != station_key(
+        io.BytesIO(csv_bytes.replace(b"2019", b"2020"))
+    )
+
+
+def test_store_parses_appended_rows_only(csv_bytes, monkeypatch):
+    head, rest = split_rows(csv_bytes, 5)
+    store = WeatherStore(max_stations=4)
+    store.history(io.BytesIO(head))
+
+    updates = []
+    update = WeatherHistory.update
+    monkeypatch.setattr(
+        WeatherHistory,
+        "update",
+        lambda self, file: updates.append(update(self, file)) or updates[-1],
+    )
+    frame = store.history(io.BytesIO(head + rest))
+
+    assert updates == [True]
+    full = pd.read_csv(io.BytesIO(csv_bytes))
+    pd.testing.assert_frame_equal(
+        frame, full.tail(len(frame)).reset_index(drop=True), check_dtype=False
+    )